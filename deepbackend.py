@@ -3,12 +3,12 @@ import threading  # For shutting down server
 import os
 import signal
 import json
+import functools
 from pathlib import Path
 from datetime import datetime
 
 import pandas as pd
-from flask import Flask, request, jsonify
-from tabulate import tabulate # for pretty printing dataframes
+from flask import Flask, Response, request, jsonify
 
 # Budget Lib
 from lib import FinCashflow, FinInvestments
@@ -16,7 +16,18 @@ from lib import BudgetPlotter
 from lib import FlaskWrapper
 
 # Helper functions for flask wrapper
-from lib.common import load_config, load_mappings, expand_transfer_templates, get_db_csv_path, determine_month_from_date, validate_data
+from lib.common import load_config, get_db_csv_path, determine_month_from_date, validate_data
+from lib.config_service import get_config, config_service
+from lib.snapshot import get_snapshot_stats
+from lib.quote_cache import get_quote_stats
+from lib.ledger_writer import LEDGER_COLUMNS, append_rows, path_lock, rewrite_rows
+from lib.cashflow_cube import DIMENSIONS
+from lib.query_engine import query_records
+from lib.month_table import MonthTableCache, parse_sort, select_rows, psql_lines, strip_cells
+from lib.screens import dashboard_screen, month_screen, add_form_screen, row_summary, parse_batch
+from lib.server import serve, DEFAULT_SERVER_THREADS
+from lib.ledger_validator import validate_path
+from lib.bulk_import import run_import, detect_format
 
 # Terminal plot
 import plotext as plt
@@ -26,11 +37,63 @@ plt.date_form('d/m/Y')
 app = Flask(__name__)
 deepManager = FlaskWrapper()
 
-DATA_PATH = None # set during initialization
+month_tables = MonthTableCache() # parsed month files of the database views, see month_table.py
 
 import logging
 logging.getLogger('werkzeug').setLevel(logging.WARNING)  # Set flask logging level
 
+# fsync of appended rows: form value 'fsync' overrides app.fsync_writes in config.json
+def fsync_enabled(form_value, config):
+    if form_value is not None:
+        return form_value.strip().lower() not in ["0", "false", "no", "off"]
+    return bool(config.get("app", {}).get("fsync_writes", True))
+
+# Routes take an optional 'session' argument naming an initialized dataset,
+# 'YEAR' (same data path as the active one) or 'data_path:YEAR'. Without it
+# they answer from the active session.
+def session_manager():
+    return deepManager.view(request.values.get('session'))
+
+# The data path comes from the session only: a session never changes it, while
+# /initialize may switch the active one on another thread. None before any initialize
+def session_data_path(manager):
+    return manager.data_path
+
+# Net worth status and account balances, today or as of date (YYYY-MM-DD)
+def dashboard_data(manager, date=None):
+    with manager.reading(): # all from the same version of the dataset
+        manager.calc_global_nw()
+        if date:
+            nw_status = manager.get_nw_status_at(date)
+            if nw_status is None:
+                raise ValueError(f"No data before {date}")
+            return nw_status, manager.get_all_balances_at(date)
+        return manager.get_nw_status(), manager.get_all_balances()
+
+# Month rows selected by the request arguments: any column as a filter, sort, offset and limit
+# Returns (whole month, page, number of matching rows), None if the file does not exist
+def month_page(args):
+    data_path = session_data_path(session_manager())
+    csv_path = get_db_csv_path(args.get('data_type'), int(args.get('year')), int(args.get('month')), data_path)
+
+    # Parsed once, until the file changes
+    df = month_tables.get(csv_path)
+    if df is None:
+        return None
+    filters = {column: args.get(column).split(',') for column in df.columns if args.get(column)}
+    page, total = select_rows(df, filters, parse_sort(args.get('sort')), args.get('offset', 0, type=int), args.get('limit', type=int))
+    return df, page, total
+
+# plotext draws on one global figure, plots are drawn one request at a time
+plot_lock = threading.Lock()
+
+def one_plot_at_a_time(route):
+    @functools.wraps(route)
+    def wrapper(*args, **kwargs):
+        with plot_lock:
+            return route(*args, **kwargs)
+    return wrapper
+
 # ------------ FLASK ROUTES ------------------
 
 @app.route("/", methods=['GET'])
@@ -47,29 +110,55 @@ def shutdown():
 
 @app.route("/initialize", methods=['POST'])
 def initialize():
-    global DATA_PATH
     year = int(request.form.get('year'))
     data_path = request.form.get('data_path')
-    DATA_PATH = data_path
+
+    # an initialized dataset is kept in memory and switched to at once, reload=1 loads it again
+    reload = request.form.get('reload', '0').lower() in ["1", "true", "yes"]
+
+    # background=1 runs the initialization as a job, poll /initialize/status
+    if request.form.get('background', '0').lower() in ["1", "true", "yes"]:
+        job = deepManager.start_initialize(year, data_path, reload)
+        return jsonify(job.to_dict())
 
     try:
-        deepManager.initialize(year, data_path)
+        deepManager.initialize(year, data_path, reload=reload)
     except Exception as e:
         return f"Error initializing: {e}"
 
     return f"Succesfully initialized {year} data from path {data_path}."
 
+@app.route("/initialize/status", methods=['GET'])
+def initialize_status():
+    """Status of an initialization job, the latest one if job_id is not given"""
+    job = deepManager.get_init_job(request.args.get('job_id'))
+    if job is None:
+        return jsonify({"status": "none", "message": "No initialization job found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/initialize/cancel", methods=['POST'])
+def initialize_cancel():
+    job = deepManager.cancel_init_job(request.form.get('job_id'))
+    if job is None:
+        return jsonify({"status": "none", "message": "No initialization job found"}), 404
+    return jsonify(job.to_dict())
+
 @app.route("/investments", methods=["GET"])
 def investments():
-    df_holdings, df_today_holdings = deepManager.get_investments_info()
+    manager = session_manager()
+    df_holdings, df_today_holdings = manager.get_investments_info()
     print(df_holdings)
     print(df_today_holdings)
     return "Done"
 
 @app.route("/plot", methods=["GET"])
+@one_plot_at_a_time
 def plot():
     try:
-        nw_global = deepManager.calc_global_nw()
+        manager = session_manager()
+        with manager.reading():
+            nw_global = manager.calc_global_nw()
+            df_m_cashflow, df_expenses_year, df_incomes_year = manager.get_cashflow_info()
 
         dates = plt.datetimes_to_string(nw_global.index)
         liquidity = list(nw_global.liquidity)
@@ -85,7 +174,6 @@ def plot():
         plt.show()
         plt.clear_figure()  # Clear the previous plot
         print()
-        df_m_cashflow, df_expenses_year, df_incomes_year = deepManager.get_cashflow_info()
         #dates = plt.datetimes_to_string(df_m_cashflow.index)
         #incomes = list(df_m_cashflow.incomes)
         #liabilities = list(df_m_cashflow.liabilities.abs())
@@ -124,25 +212,25 @@ def plot():
 @app.route("/get_expenses_categories", methods=["GET"])
 def get_expenses_categories():
     try:
+        manager = session_manager()
         month = int(request.args.get('month'))
         
         if month < 1 or month > 12:
             return jsonify({"error": f"Invalid month {month}"}), 400
         
-        df_expenses_month = deepManager.finCashflow.calc_expenses(month=month)
+        df_expenses_month = manager.aggregate("expenses", ("Category",), month)
         
-        if df_expenses_month.empty:
-            return jsonify({"categories": []})
-        
-        categories = sorted(df_expenses_month['Category'].unique().tolist())
+        categories = sorted(df_expenses_month['Category'].tolist())
         return jsonify({"categories": categories})
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route("/plot_month", methods=["GET"])
+@one_plot_at_a_time
 def plot_month():
     try:
+        manager = session_manager()
         # Get parameters from query string
         month = int(request.args.get('month'))
         category = request.args.get('category')
@@ -150,11 +238,10 @@ def plot_month():
         if month < 1 or month > 12:
             return f"Error: Invalid month {month}. Must be between 1 and 12"
 
-        # Get monthly expense data using existing method
-        df_expenses_month = deepManager.finCashflow.calc_expenses(month=month)
-
-        df_expenses_month_by_category = df_expenses_month.groupby('Category')['Qty'].sum().reset_index(name='Expenses')
-        df_expenses_month_by_category = df_expenses_month_by_category.sort_values('Expenses', ascending=False)
+        # Monthly expenses by category and subcategories of the selected category, from the cashflow cube
+        with manager.reading():
+            df_expenses_month_by_category = manager.aggregate("expenses", ("Category",), month).rename(columns={"expenses": "Expenses"})
+            df_subcat = manager.aggregate("expenses", ("Subcategory",), month, (("Category", category),)).rename(columns={"expenses": "Total"})
 
         # Prepare data for plotting
         categories = list(df_expenses_month_by_category["Category"])
@@ -166,20 +253,13 @@ def plot_month():
 
         # Create bar chart with orange color
         plt.simple_bar(categories, total_expenses_by_category, width=60,
-                      title=f"{deepManager.finCashflow.YEAR}-{month:02d} Expenses", color="orange")
+                      title=f"{manager.finCashflow.YEAR}-{month:02d} Expenses", color="orange")
         plt.show()
         plt.clear_figure()
 
-        # Filter data for selected category
-        df_filtered = df_expenses_month[df_expenses_month['Category'] == category]
-
-        if df_filtered.empty:
+        if df_subcat.empty:
             return "No data found for category: {category}"
 
-        # Group by subcategory
-        df_subcat = df_filtered.groupby('Subcategory')['Qty'].sum().reset_index(name='Total')
-        df_subcat = df_subcat.sort_values('Total', ascending=False)
-
         if len(df_subcat) == 0:
             return "No subcategories found for {category}"
 
@@ -201,9 +281,9 @@ def plot_month():
 @app.route("/dashboard_status", methods=['GET'])
 def dashboard_status():
     try:
-        deepManager.calc_global_nw()
-        nw_status = deepManager.get_nw_status()
-        all_balances = deepManager.get_all_balances()
+        manager = session_manager()
+        # optional date YYYY-MM-DD, status as of that day
+        nw_status, all_balances = dashboard_data(manager, request.args.get('date'))
 
         liquidity = nw_status['liquidity']
         investments = nw_status['investments']
@@ -226,10 +306,68 @@ def dashboard_status():
             "message": str(e)
         })
 
+@app.route("/monthly_cashflow", methods=['GET'])
+def monthly_cashflow():
+    """Monthly cashflow between start and end (YYYY-MM), across any of the years of the data path"""
+    try:
+        manager = session_manager()
+        start = request.args.get('start')
+        end = request.args.get('end', start)
+        if not start:
+            return jsonify({"status": "error", "message": "start is required"}), 400
+        df_m = manager.get_monthly_cashflow(start, end)
+        df_m = df_m.astype(object).where(df_m.notna(), None)
+        df_m.index = df_m.index.strftime('%Y-%m')
+        return jsonify({"status": "success", "months": df_m.reset_index().to_dict(orient="records")})
+    except AttributeError:
+        return jsonify({"status": "error", "message": "Database not initialized"}), 500
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+@app.route("/aggregate", methods=['GET'])
+def aggregate():
+    """
+    Sums and counts of incomes, expenses or transfers of the loaded year, from the cashflow cube.
+    measure: incomes, expenses or transfers; by: comma separated dimensions among
+    Month, Category, Subcategory, Type, Coin; month: optional; any dimension can be
+    given as a filter, e.g. Category=Groceries
+    """
+    try:
+        manager = session_manager()
+        measure = request.args.get('measure', 'expenses')
+        by = tuple(dimension for dimension in request.args.get('by', '').split(',') if dimension)
+        month = request.args.get('month', type=int)
+        filters = tuple((dimension, request.args.get(dimension)) for dimension in DIMENSIONS if request.args.get(dimension) is not None)
+        df = manager.aggregate(measure, by, month, filters)
+        return jsonify({"status": "success", "rows": df.round(2).to_dict(orient="records")})
+    except AttributeError:
+        return jsonify({"status": "error", "message": "Database not initialized"}), 500
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+@app.route("/query", methods=['GET'])
+def query():
+    """
+    Rows of the ledger filtered, grouped and resampled on the server.
+    start, end: dates (the loaded year by default); any column as a filter, comma
+    separated values (Category=Leisure,Holiday); sign: in or out; search: text in
+    the description; group: comma separated columns; period: D, W, ME, QE or YE;
+    agg: sum, mean, count, min or max of Qty
+    """
+    try:
+        manager = session_manager()
+        result = manager.query(request.args.to_dict(flat=False))
+        return jsonify({"status": "success", "rows": query_records(result)})
+    except AttributeError:
+        return jsonify({"status": "error", "message": "Database not initialized"}), 500
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
 @app.route("/add_data", methods=['POST'])
 def add_data():
     """Add a row to cashflow or investments CSV"""
     try:
+        data_path = session_data_path(session_manager())
         data_type = request.form.get('data_type')  # 'cashflow' or 'investments'
         year = int(request.form.get('year'))
         date = request.form.get('date')
@@ -262,123 +400,149 @@ def add_data():
             return f"Error: {error_msg}"
         
         # Get CSV path
-        csv_path = get_db_csv_path(data_type, year, month, DATA_PATH)
-        csv_file = Path(csv_path)
+        csv_path = get_db_csv_path(data_type, year, month, data_path)
         
-        # Load config to get columns
-        config = load_config()
+        # Parsed config, kept until config.json changes
+        config = get_config().config
         if config is None:
             return "Error: Config file not found"
         
         # Prepare new row
+        columns = LEDGER_COLUMNS[data_type]
+        new_row = {
+            'Date': date.strip(),
+            'Type': type_field,
+            'Qty': qty,
+            'Category': category,
+            'Subcategory': subcategory,
+            'Description': description
+        }
         if data_type == "cashflow":
-            new_row = {
-                'Date': date,
-                'Type': type_field,
-                'Coin': coin,
-                'Qty': qty,
-                'Category': category,
-                'Subcategory': subcategory,
-                'Description': description
-            }
-            columns = ['Date', 'Type', 'Coin', 'Qty', 'Category', 'Subcategory', 'Description']
+            new_row['Coin'] = coin
         else:  # investments
-            new_row = {
-                'Date': date,
-                'Type': type_field,
-                'Symbol': symbol,
-                'Qty': qty,
-                'Category': category,
-                'Subcategory': subcategory,
-                'Description': description
-            }
-            columns = ['Date', 'Type', 'Symbol', 'Qty', 'Category', 'Subcategory', 'Description']
+            new_row['Symbol'] = symbol
         
-        # Load existing data or create new DataFrame
-        if csv_file.exists():
-            df = pd.read_csv(csv_path, skipinitialspace=True, na_filter=False)
-            df.columns = df.columns.str.strip()
-            # Strip whitespace from Date column if it exists
-            if 'Date' in df.columns:
-                df['Date'] = df['Date'].astype(str).str.strip()
-            # Append new row
-            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        else:
-            # Create directory if it doesn't exist
-            csv_file.parent.mkdir(parents=True, exist_ok=True)
-            # For new file, create DataFrame directly with the new row
-            df = pd.DataFrame([new_row])
+        # Append the row at the end of the month file, existing lines are not rewritten
+        append_rows(csv_path, [new_row], columns, fsync=fsync_enabled(request.form.get('fsync'), config))
         
-        # Save to CSV
-        df.to_csv(csv_path, index=False)
+        # Keep the loaded dataset in sync without a full initialize
+        in_sync = deepManager.apply_added_rows(data_type, year, data_path, [new_row])
         
-        return f"Successfully added: {date}, {type_field}, {qty}, {category}, {subcategory}"
+        message = f"Successfully added: {date}, {type_field}, {qty}, {category}, {subcategory}"
+        if not in_sync:
+            message += " (initialize again to refresh the dashboard)"
+        return message
     except Exception as e:
         return f"Error adding data: {str(e)}"
 
+@app.route("/import", methods=['POST'])
+def import_data():
+    """
+    Add many rows in one request. Body: CSV with a header or NDJSON, columns as in the
+    month files plus data_type (names case insensitive). Optional: data_type (default
+    of the rows), format (csv or ndjson, else from the Content-Type), dry_run, fsync.
+    Invalid rows are skipped and every row gets a result.
+    """
+    try:
+        body = request.get_data(as_text=True) # before the form parsing of a curl -d body consumes it
+        data_path = session_data_path(session_manager())
+        if data_path is None:
+            return jsonify({"status": "error", "message": "Database not initialized"}), 500
+        config = get_config().config
+        if config is None:
+            return jsonify({"status": "error", "message": "Config file not found"}), 500
+
+        fmt = request.args.get('format') or detect_format(body, request.content_type)
+        dry_run = request.args.get('dry_run', '0').strip().lower() not in ["0", "false", "no", "off"]
+        try:
+            report, written = run_import(body, fmt, data_path, data_type=request.args.get('data_type'),
+                                         dry_run=dry_run, fsync=fsync_enabled(request.args.get('fsync'), config))
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        # Keep the loaded datasets in sync, one update per data type and year
+        in_sync = True
+        for (data_type, year), rows in written.items():
+            in_sync = deepManager.apply_added_rows(data_type, year, data_path, rows) and in_sync
+
+        status = "success" if not report["rejected"] else ("partial" if report["rows"] > report["rejected"] else "error")
+        return jsonify(dict(status=status, in_sync=in_sync, **report))
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Error importing data: {str(e)}"}), 500
+
 @app.route("/delete_row", methods=['POST'])
 def delete_row():
     """Delete a row from cashflow or investments CSV"""
     try:
+        data_path = session_data_path(session_manager())
         data_type = request.form.get('data_type')
         year = int(request.form.get('year'))
         month = int(request.form.get('month'))
         line_number = int(request.form.get('line_number'))
         
         # Get CSV path
-        csv_path = get_db_csv_path(data_type, year, month, DATA_PATH)
-        
-        if not Path(csv_path).exists():
-            return "Error: CSV file does not exist"
-        
-        # Load CSV
-        df = pd.read_csv(csv_path, skipinitialspace=True, na_filter=False)
-        df.columns = df.columns.str.strip()
-        # Strip whitespace from Date column if it exists
-        if 'Date' in df.columns:
-            df['Date'] = df['Date'].astype(str).str.strip()
-        
-        if line_number < 0 or line_number >= len(df):
-            return "Error: Invalid line number"
+        csv_path = get_db_csv_path(data_type, year, month, data_path)
+        
+        # No other write to the file between reading its rows and replacing it
+        with path_lock(csv_path):
+            # Parsed once, until the file changes
+            df = month_tables.get(csv_path)
+            if df is None:
+                return "Error: CSV file does not exist"
+            
+            if line_number < 0 or line_number >= len(df):
+                return "Error: Invalid line number"
+                
+            # Get row data before deleting for confirmation
+            row_data = df.iloc[line_number]
             
-        # Get row data before deleting for confirmation
-        row_data = df.iloc[line_number]
+            # Delete the row, the file is replaced at once
+            df = df.drop(df.index[line_number])
+            rewrite_rows(csv_path, df, fsync=fsync_enabled(request.form.get('fsync'), get_config().config or {}))
         
-        # Delete the row
-        df = df.drop(df.index[line_number])
-        df.to_csv(csv_path, index=False)
+        # Keep the loaded dataset in sync without a full initialize
+        in_sync = deepManager.apply_deleted_row(data_type, year, data_path, row_data.to_dict())
         
-        return f"Successfully deleted row: {line_number}"
+        message = f"Successfully deleted row: {line_number}"
+        if not in_sync:
+            message += " (initialize again to refresh the dashboard)"
+        return message
     except Exception as e:
         return f"Error deleting row: {str(e)}"
 
 @app.route("/view_database", methods=['GET'])
 def view_database():
-    """View cashflow or investments data"""
+    """
+    View cashflow or investments data of a month.
+    Optional: any column as a filter (Category=Groceries,Leisure), sort (Qty,-Date),
+    offset and limit for a page, format=json for rows instead of a table.
+    Rows keep their line number in the file.
+    """
     try:
-        data_type = request.args.get('data_type')
-        year = int(request.args.get('year'))
-        month = int(request.args.get('month'))
-        
-        # Get CSV path
-        csv_path = get_db_csv_path(data_type, year, month, DATA_PATH)
-        
-        if not Path(csv_path).exists():
+        offset = request.args.get('offset', 0, type=int)
+        limit = request.args.get('limit', type=int)
+
+        selection = month_page(request.args)
+        if selection is None:
             return "Error: CSV file does not exist"
-        
-        # Load CSV
-        df = pd.read_csv(csv_path, skipinitialspace=True, na_filter=False)
-        df.columns = df.columns.str.strip()
-        # Strip whitespace from Date column if it exists
-        if 'Date' in df.columns:
-            df['Date'] = df['Date'].astype(str).str.strip()
+        df, page, total = selection
         
         if df.empty:
             return "Database is empty"
-        
-        # Format table
-        table = tabulate(df, headers='keys', tablefmt='psql', showindex=True)
-        return f"{table}"
+
+        if request.args.get('format') == 'json':
+            rows = strip_cells(page).reset_index(names='line').to_dict(orient="records")
+            return jsonify({"total": total, "offset": offset, "limit": limit, "rows": rows})
+
+        if page.empty:
+            return "No rows match"
+
+        # Format table, streamed a chunk of rows at a time
+        def table():
+            yield from psql_lines(page)
+            if offset or limit is not None:
+                yield f"\nRows {offset}-{offset + len(page) - 1} of {total}"
+        return Response(table(), mimetype='text/plain')
     except Exception as e:
         return f"Error viewing database: {str(e)}"
 
@@ -386,34 +550,25 @@ def view_database():
 def get_row_data():
     """Get specific row data for confirmation"""
     try:
+        data_path = session_data_path(session_manager())
         data_type = request.args.get('data_type')
         year = int(request.args.get('year'))
         month = int(request.args.get('month'))
         line_number = int(request.args.get('line_number'))
         
         # Get CSV path
-        csv_path = get_db_csv_path(data_type, year, month, DATA_PATH)
+        csv_path = get_db_csv_path(data_type, year, month, data_path)
         
-        if not Path(csv_path).exists():
+        # Parsed once, until the file changes
+        df = month_tables.get(csv_path)
+        if df is None:
             return "Error: CSV file does not exist"
         
-        # Load CSV
-        df = pd.read_csv(csv_path, skipinitialspace=True, na_filter=False)
-        df.columns = df.columns.str.strip()
-        # Strip whitespace from Date column if it exists
-        if 'Date' in df.columns:
-            df['Date'] = df['Date'].astype(str).str.strip()
-        
         if line_number < 0 or line_number >= len(df):
             return "Error: Invalid line number"
         
-        row_data = df.iloc[line_number]
-        
         # Format row data as string
-        if data_type == "cashflow":
-            return f"{row_data['Date']}, {row_data['Type']}, {row_data['Coin']}, {row_data['Qty']}, {row_data['Category']}, {row_data['Subcategory']}"
-        else:  # investments
-            return f"{row_data['Date']}, {row_data['Type']}, {row_data['Symbol']}, {row_data['Qty']}, {row_data['Category']}, {row_data['Subcategory']}"
+        return row_summary(df.iloc[line_number], data_type)
     except Exception as e:
         return f"Error getting row data: {str(e)}"
 
@@ -421,19 +576,19 @@ def get_row_data():
 def get_row_count():
     """Get number of rows in CSV"""
     try:
+        data_path = session_data_path(session_manager())
         data_type = request.args.get('data_type')
         year = int(request.args.get('year'))
         month = int(request.args.get('month'))
         
         # Get CSV path
-        csv_path = get_db_csv_path(data_type, year, month, DATA_PATH)
+        csv_path = get_db_csv_path(data_type, year, month, data_path)
         
-        if not Path(csv_path).exists():
+        # Parsed once, until the file changes
+        df = month_tables.get(csv_path)
+        if df is None:
             return "0"
         
-        # Load CSV
-        df = pd.read_csv(csv_path, skipinitialspace=True, na_filter=False)
-        
         return str(len(df))
     except Exception as e:
         return f"Error getting row count: {str(e)}"
@@ -442,21 +597,20 @@ def get_row_count():
 def get_categories_for_month():
     """Get list of categories with expenses for a specific month"""
     try:
+        manager = session_manager()
         month = int(request.args.get('month'))
 
         # Validate month
         if month < 1 or month > 12:
             return jsonify({"error": "Invalid month"}), 400
 
-        # Get monthly expense data
-        df_expenses_month = deepManager.finCashflow.calc_expenses(month=month)
+        # Categories with expenses in the month, from the cashflow cube
+        categories = manager.aggregate("expenses", ("Category",), month)['Category'].tolist()
 
         # Check if there's data
-        if df_expenses_month.empty:
+        if not categories:
             return jsonify({"categories": []})
 
-        # Get unique categories and sort
-        categories = df_expenses_month['Category'].unique().tolist()
         categories.sort()
 
         # Add "All Categories" as first option
@@ -478,14 +632,12 @@ def get_subcategories():
         category = request.args.get('category')
         data_type = request.args.get('data_type', 'cashflow')  # Default to cashflow for backward compatibility
 
-        config = load_config()
+        # Transfer templates already expanded, see config_service.py
+        config = get_config().expanded
 
         if config is None:
             return ""
 
-        # Expand Transfer templates
-        config = expand_transfer_templates(config)
-
         # Get the appropriate section based on data_type
         if data_type not in ["cashflow", "investments"]:
             return ""
@@ -500,6 +652,109 @@ def get_subcategories():
     except Exception as e:
         return f"Error getting subcategories: {str(e)}"
 
+# ------------ SCREENS OF THE SHELL CLIENT ------------------
+# One call per screen, see screens.py
+
+@app.route("/screen/dashboard", methods=['GET'])
+def screen_dashboard():
+    """Summary and account cards of the dashboard, formatted. Optional date YYYY-MM-DD"""
+    try:
+        nw_status, all_balances = dashboard_data(session_manager(), request.args.get('date'))
+        return jsonify(dashboard_screen(nw_status, all_balances))
+    except AttributeError:
+        return jsonify({"status": "error", "message": "Database not initialized"})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
+@app.route("/screen/month", methods=['GET'])
+def screen_month():
+    """
+    Table of a month for the view and delete screens, with the line number and the
+    confirmation summary of each row. Same arguments as /view_database
+    """
+    try:
+        selection = month_page(request.args)
+        if selection is None:
+            return jsonify({"status": "error", "message": "CSV file does not exist", "count": 0, "total": 0, "lines": []})
+        df, page, total = selection
+        return jsonify(month_screen(page, request.args.get('data_type'), total, len(df)))
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e), "count": 0, "total": 0, "lines": []})
+
+@app.route("/screen/add_form", methods=['GET'])
+def screen_add_form():
+    """Categories, subcategories and coins of the add form for data_type"""
+    data_type = request.args.get('data_type', 'cashflow')
+    if data_type not in ["cashflow", "investments"]:
+        return jsonify({"status": "error", "message": f"Invalid data_type: {data_type}"})
+    config = get_config().expanded
+    if config is None:
+        return jsonify({"status": "error", "message": "Config file not found"})
+    return jsonify(add_form_screen(config, data_type))
+
+@app.route("/batch", methods=['POST'])
+def batch():
+    """
+    Several requests in one call, run in order. JSON body:
+    {"session": optional, "requests": [{"method": "GET", "path": "/dashboard_status", "args": {...}}, ...]}
+    Answers {"status", "responses": [{"code", "body"}, ...]}, body is JSON or text like the route's own
+    """
+    try:
+        sub_requests = parse_batch(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    responses = list()
+    for method, path, args in sub_requests:
+        fields = {"query_string": args} if method == "GET" else {"data": args}
+        try:
+            with app.test_request_context(path, method=method, **fields):
+                response = app.full_dispatch_request()
+                body = response.get_json() if response.is_json else response.get_data(as_text=True)
+            responses.append({"code": response.status_code, "body": body})
+        except Exception as e: # one failing sub-request does not fail the others
+            responses.append({"code": 500, "body": {"status": "error", "message": str(e)}})
+    return jsonify({"status": "success", "responses": responses})
+
+@app.route("/load_errors", methods=['GET'])
+def load_errors():
+    """Per-file errors collected while loading the month files"""
+    try:
+        manager = session_manager()
+        return jsonify(manager.get_load_errors())
+    except AttributeError:
+        return jsonify({"error": "Database not initialized"}), 500
+
+@app.route("/validate", methods=['GET'])
+def validate():
+    """
+    Check every month file of the data path against config.json: categories, subcategories,
+    coins, dates (format and month of the file) and Qty. Optional: data_path, year.
+    Answers {"status", "files", "rows", "issues": [{"file", "line", "field", "value", "message"}]}
+    """
+    try:
+        data_path = request.args.get('data_path') or session_data_path(session_manager())
+        if data_path is None:
+            return jsonify({"status": "error", "message": "Database not initialized"}), 500
+        if not Path(data_path).is_dir():
+            return jsonify({"status": "error", "message": f"Data path not found: {data_path}"}), 404
+        year = request.args.get('year', type=int)
+        report = validate_path(data_path, years=[year] if year is not None else None, read=month_tables.get)
+        return jsonify(dict(status="success" if not report["issues"] else "invalid", **report))
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route("/cache_stats", methods=['GET'])
+def cache_stats():
+    """Hit/miss counters of the backend caches"""
+    return jsonify({"snapshots": get_snapshot_stats(), "quotes": get_quote_stats(), "sessions": deepManager.get_sessions(),
+                    "month_tables": month_tables.get_stats(), "config": config_service.get_stats()})
+
+@app.route("/sessions", methods=['GET'])
+def sessions():
+    """Initialized datasets kept in memory, in least recently used order"""
+    return jsonify(deepManager.get_sessions())
+
 #$ curl -X GET _routes to view all routes
 @app.route("/_routes")
 def routes():
@@ -512,5 +767,12 @@ def routes():
     return "\n".join(lines)
 
 
+# $ python3 deepbackend.py PORT, on a pool of app.server_threads threads (config.json)
+# $ python3 deepbackend.py PORT --dev, on the flask development server with debug and reloader
 if __name__ == "__main__":
-    app.run(debug=True, port=sys.argv[1])
\ No newline at end of file
+    port = int(sys.argv[1])
+    if "--dev" in sys.argv[2:]:
+        app.run(debug=True, port=port)
+    else:
+        config = load_config() or {}
+        serve(app, port, threads=config.get("app", {}).get("server_threads", DEFAULT_SERVER_THREADS))
\ No newline at end of file
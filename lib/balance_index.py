@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+# Point in time balances of the cashflow accounts.
+# Every account keeps its transaction dates (sorted) with the running balance
+# after each of them, so the balance at any date is a binary search. Month end
+# checkpoints hold the balances of all the accounts at once, for the monthly
+# views. Rows added after the build update both in place.
+#
+#   Hype     dates  [01-03, 01-04, 01-10]     checkpoints   Hype   Revolut
+#            cum    [1500,  1450,  1150 ]     2025-01-31    1150   0
+#                                             2025-02-28    1150   20
+
+class AccountSeries:
+    def __init__(self, dates : np.ndarray, qty : np.ndarray, opening : float = 0.0):
+        order = np.argsort(dates, kind="stable")
+        self.dates = dates[order].astype("datetime64[ns]")
+        self.cum = opening + np.cumsum(qty[order].astype("float64"))
+        self.opening = opening
+
+    def balance_at(self, date : np.datetime64):
+        position = np.searchsorted(self.dates, date, side="right") - 1
+        return self.opening if position < 0 else float(self.cum[position])
+
+    def balance(self):
+        return float(self.cum[-1]) if len(self.cum) else self.opening
+
+    def add(self, date : np.datetime64, qty : float):
+        """Insert a transaction after the ones of the same date, back dated rows also shift the later sums"""
+        position = np.searchsorted(self.dates, date, side="right")
+        previous = self.opening if position == 0 else self.cum[position - 1]
+        self.dates = np.insert(self.dates, position, date)
+        self.cum = np.insert(self.cum, position, previous + qty)
+        self.cum[position + 1:] += qty
+
+    def remove(self, date : np.datetime64, qty : float):
+        """Remove a transaction of qty at date, False if there is none"""
+        lo = np.searchsorted(self.dates, date, side="left")
+        hi = np.searchsorted(self.dates, date, side="right")
+        for position in range(lo, hi):
+            previous = self.opening if position == 0 else self.cum[position - 1]
+            if np.isclose(self.cum[position] - previous, qty):
+                self.dates = np.delete(self.dates, position)
+                self.cum = np.delete(self.cum, position)
+                self.cum[position:] -= qty
+                return True
+        return False
+
+    def is_empty(self):
+        return len(self.dates) == 0 and self.opening == 0.0
+
+class BalanceIndex:
+    def __init__(self, df_cashflow : pd.DataFrame, opening_balances : dict = None):
+        """
+        Args:
+            df_cashflow: cashflow rows indexed by Date with Type (account) and Qty columns
+            opening_balances: balance of each account before the first row
+        """
+        opening_balances = dict(opening_balances or {})
+        dates = df_cashflow.index.values.astype("datetime64[ns]")
+        accounts = df_cashflow["Type"].astype(str).to_numpy()
+        qty = df_cashflow["Qty"].to_numpy(dtype="float64")
+
+        self.accounts = dict()
+        for account in pd.unique(accounts):
+            mask = accounts == account
+            self.accounts[account] = AccountSeries(dates[mask], qty[mask], opening_balances.pop(account, 0.0))
+        for account, opening in opening_balances.items(): # accounts without rows yet
+            self.accounts[account] = AccountSeries(np.array([], dtype="datetime64[ns]"), np.array([]), opening)
+
+        self.build_checkpoints(dates)
+
+    def build_checkpoints(self, dates):
+        if len(dates):
+            month_ends = pd.date_range(pd.Timestamp(dates.min()) + pd.offsets.MonthEnd(0), pd.Timestamp(dates.max()) + pd.offsets.MonthEnd(0), freq='ME')
+        else:
+            month_ends = pd.DatetimeIndex([])
+        self.checkpoint_dates = month_ends.values.astype("datetime64[ns]")
+        self.checkpoint_columns = list(self.accounts.keys())
+        # balances at the end of each checkpoint day
+        self.checkpoints = np.array([
+            [self.accounts[account].balance_at(day + np.timedelta64(1, 'D') - np.timedelta64(1, 'ns')) for account in self.checkpoint_columns]
+            for day in self.checkpoint_dates
+        ]).reshape(len(self.checkpoint_dates), len(self.checkpoint_columns))
+
+    def balance_at(self, account : str, date):
+        """Balance of account at the end of date"""
+        end_of_day = np.datetime64(pd.Timestamp(date).normalize() + pd.Timedelta(days=1) - pd.Timedelta(1, 'ns'))
+        return self.accounts[account].balance_at(end_of_day)
+
+    def balances(self, date=None):
+        """All the balances at the end of date, the latest ones without date"""
+        if date is None:
+            return {account: series.balance() for account, series in self.accounts.items()}
+        return {account: self.balance_at(account, date) for account in self.accounts}
+
+    def month_end_balances(self, month_end):
+        """All the balances at a month end, read from the checkpoints"""
+        position = np.searchsorted(self.checkpoint_dates, np.datetime64(pd.Timestamp(month_end) + pd.offsets.MonthEnd(0)))
+        if position == len(self.checkpoint_dates) or self.checkpoint_dates[position] != np.datetime64(pd.Timestamp(month_end) + pd.offsets.MonthEnd(0)):
+            return self.balances(month_end) # out of the checkpointed range
+        checkpoint = dict(zip(self.checkpoint_columns, self.checkpoints[position].tolist()))
+        row = dict()
+        for account in self.accounts:
+            if account in checkpoint:
+                row[account] = checkpoint[account]
+            else: # opened after the checkpoints were built
+                row[account] = self.balance_at(account, month_end)
+        return row
+
+    def add(self, account : str, date, qty : float):
+        """Apply a written row"""
+        date = np.datetime64(pd.Timestamp(date), 'ns')
+        if account not in self.accounts:
+            self.accounts[account] = AccountSeries(np.array([], dtype="datetime64[ns]"), np.array([]))
+        self.accounts[account].add(date, qty)
+        self.shift_checkpoints(account, date, qty)
+
+    def remove(self, account : str, date, qty : float):
+        """Apply a deleted row, returns False if the index has no such row"""
+        date = np.datetime64(pd.Timestamp(date), 'ns')
+        if account not in self.accounts or not self.accounts[account].remove(date, qty):
+            return False
+        if self.accounts[account].is_empty():
+            del self.accounts[account] # its only row was deleted
+        self.shift_checkpoints(account, date, -qty)
+        return True
+
+    def shift_checkpoints(self, account, date, qty):
+        if len(self.checkpoint_dates) and date >= self.checkpoint_dates[-1] + np.timedelta64(1, 'D'):
+            # new months after the last checkpoint carry the last balances
+            month_ends = pd.date_range(pd.Timestamp(self.checkpoint_dates[-1]) + pd.offsets.MonthEnd(1), pd.Timestamp(date) + pd.offsets.MonthEnd(0), freq='ME')
+            self.checkpoint_dates = np.concatenate([self.checkpoint_dates, month_ends.values.astype("datetime64[ns]")])
+            self.checkpoints = np.vstack([self.checkpoints, np.repeat(self.checkpoints[-1:], len(month_ends), axis=0)])
+        if account in self.checkpoint_columns:
+            first = np.searchsorted(self.checkpoint_dates + np.timedelta64(1, 'D'), date, side="right")
+            self.checkpoints[first:, self.checkpoint_columns.index(account)] += qty
@@ -0,0 +1,168 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+from .config_service import get_config, DATA_TYPES
+from .ledger_writer import LEDGER_COLUMNS, append_rows
+from .ledger_validator import validate_rows, DATE_FORMAT
+
+# Bulk import of ledger rows, e.g. a year of bank history in one request.
+# The body is CSV (a header, then one row per line) or NDJSON (one JSON object
+# per line) with the month file columns, names case insensitive, plus an
+# optional data_type column. All the rows are validated together (see
+# ledger_validator.py), then the valid ones are grouped by target month file and
+# each file gets a single append, so the cost is one write per month instead of
+# one request, config check and write per row.
+
+IMPORT_FORMATS = ["csv", "ndjson"]
+MAX_IMPORT_ROWS = 50000
+IMPORT_COLUMNS = ["data_type", "Date", "Type", "Coin", "Symbol", "Qty", "Category", "Subcategory", "Description"]
+
+def detect_format(body : str, content_type : str = None):
+    """csv or ndjson, from the content type or else from the first character of the body"""
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type or "json" in content_type:
+        return "ndjson"
+    return "ndjson" if body.lstrip().startswith("{") else "csv"
+
+def normalize_columns(df : pd.DataFrame):
+    """Rename the columns matching an import column whatever their case, drop the others"""
+    names = {column.lower(): column for column in IMPORT_COLUMNS}
+    df = df.rename(columns=lambda column: names.get(str(column).strip().lower(), None))
+    return df.loc[:, [column is not None for column in df.columns]]
+
+def parse_import(body : str, fmt : str, data_type : str = None):
+    """
+    Rows of an import body as a frame of stripped strings with the IMPORT_COLUMNS,
+    indexed by row number (0 for the first row after a csv header), and a dict
+    row -> error of the NDJSON lines which are not JSON objects.
+    data_type is the default of the rows without one.
+    Raises ValueError on a body which cannot be read at all.
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Invalid format: {fmt}. Must be one of {IMPORT_FORMATS}")
+
+    bad_lines = dict()
+    if fmt == "csv":
+        try:
+            df = pd.read_csv(io.StringIO(body), dtype=str, skipinitialspace=True, na_filter=False)
+        except (pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+            raise ValueError(f"Could not read the csv body: {e}")
+    else:
+        records = list()
+        for row, line in enumerate(line for line in body.splitlines() if line.strip()):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            if not isinstance(record, dict):
+                bad_lines[row] = "Not a JSON object"
+                record = {}
+            records.append(record)
+        df = pd.DataFrame.from_records(records)
+
+    if len(df) > MAX_IMPORT_ROWS:
+        raise ValueError(f"Too many rows: {len(df)}, at most {MAX_IMPORT_ROWS} per import")
+
+    df = normalize_columns(df)
+    rows = pd.DataFrame(index=pd.RangeIndex(len(df), name="row"))
+    for column in IMPORT_COLUMNS:
+        if column in df.columns:
+            rows[column] = df[column].fillna("").astype(str).str.strip().to_numpy()
+        else:
+            rows[column] = ""
+    if data_type:
+        rows.loc[rows["data_type"] == "", "data_type"] = data_type
+    return rows, bad_lines
+
+def validate_import(rows : pd.DataFrame, data_path, compiled=None):
+    """
+    Check all the rows at once. Returns the rows with their target year, month and
+    file (None when the date is invalid) and a dict row -> list of errors.
+    """
+    compiled = compiled if compiled is not None else get_config()
+    rows = rows.copy()
+    dates = pd.to_datetime(rows["Date"], format=DATE_FORMAT, errors="coerce")
+    rows["year"] = dates.dt.year.astype("Int64")
+    rows["month"] = dates.dt.month.astype("Int64")
+    rows["file"] = [None if pd.isna(year) else f"{data_path}/{year}/{data_type}/{year}-{month:0=2}_{data_type}.csv"
+                    for data_type, year, month in zip(rows["data_type"], rows["year"], rows["month"])]
+
+    errors = dict()
+    def reject(mask, message):
+        mask = np.asarray(mask, dtype=bool)
+        messages = message[mask] if isinstance(message, pd.Series) else [message] * int(mask.sum())
+        for row, text in zip(rows.index[mask], messages):
+            errors.setdefault(int(row), []).append(text)
+
+    reject(~rows["data_type"].isin(DATA_TYPES), "Invalid data_type: " + rows["data_type"] + ". Must be 'cashflow' or 'investments'")
+    reject(rows["Type"] == "", "Type is required")
+    reject((rows["data_type"] == "investments") & (rows["Symbol"] == ""), "Symbol is required for investments data")
+    reject((rows["data_type"] == "cashflow") & (rows["Coin"] == ""), "Coin is required for cashflow data")
+
+    for data_type in DATA_TYPES:
+        of_type = rows[rows["data_type"] == data_type]
+        if of_type.empty:
+            continue
+        # the target file is chosen from the date, only its format can be wrong
+        stacked = of_type[LEDGER_COLUMNS[data_type]].copy()
+        stacked["file"] = of_type["file"].fillna("")
+        stacked["year"] = of_type["year"].fillna(0).astype(int)
+        stacked["month"] = of_type["month"].fillna(0).astype(int)
+        stacked["line"] = of_type.index
+        issues = validate_rows(data_type, stacked.reset_index(drop=True), compiled)
+        for line, field, value, message in issues[["line", "field", "value", "message"]].itertuples(index=False):
+            if field == "Coin" and value == "":
+                continue # already reported as required
+            errors.setdefault(int(line), []).append(f"{message}: {field} '{value}'")
+    return rows, errors
+
+def import_rows(rows : pd.DataFrame, fsync : bool = True):
+    """
+    Append valid rows (see validate_import) to their month files, one write per file.
+    Returns {(data_type, year): [row dicts]} of the written rows, in file order.
+    """
+    written = dict()
+    for (data_type, year, month, file), group in rows.groupby(["data_type", "year", "month", "file"], sort=True):
+        columns = LEDGER_COLUMNS[data_type]
+        records = group[columns].to_dict(orient="records")
+        for record in records:
+            record["Qty"] = float(record["Qty"])
+        append_rows(file, records, columns, fsync=fsync)
+        written.setdefault((data_type, int(year)), []).extend(records)
+    return written
+
+def run_import(body : str, fmt : str, data_path, data_type : str = None, dry_run : bool = False, fsync : bool = True):
+    """
+    Parse, validate and write an import body. Invalid rows are reported and skipped,
+    the others are written unless dry_run.
+    Returns the report {"rows", "added", "rejected", "files": [{"file", "rows"}], "results": [{"row", "status", ...}]}
+    and the written rows as import_rows does.
+    """
+    rows, bad_lines = parse_import(body, fmt, data_type)
+    rows, errors = validate_import(rows, data_path)
+    for row, error in bad_lines.items():
+        errors[row] = [error] # the other errors only say the row is empty
+
+    valid = ~rows.index.isin(list(errors.keys()))
+    written = dict() if dry_run else import_rows(rows[valid], fsync=fsync)
+
+    results = list()
+    for row, file in zip(rows.index, rows["file"]):
+        if row in errors:
+            results.append({"row": int(row), "status": "rejected", "errors": errors[row]})
+        else:
+            results.append({"row": int(row), "status": "valid" if dry_run else "added", "file": file})
+    files = rows[valid].groupby("file", sort=True).size()
+    report = {
+        "rows": len(rows),
+        "added": 0 if dry_run else int(valid.sum()),
+        "rejected": len(errors),
+        "files": [{"file": file, "rows": int(count)} for file, count in files.items()],
+        "results": results,
+    }
+    return report, written
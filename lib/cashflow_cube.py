@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+# Aggregate cube of the cashflow.
+# Sums and counts of the rows per (Month, Category, Subcategory, Type, Coin),
+# split in three measures: incomes (Qty > 0), expenses (Qty < 0, as positive
+# amounts) and transfers (Category Transfer, any sign). Breakdowns by month,
+# category or account are group-bys over the cells of the cube, a few hundred
+# rows, instead of filters over the raw transactions.
+#
+#                                              incomes  incomes_count  expenses  expenses_count ...
+#   Month Category   Subcategory  Type  Coin
+#   1     Employment Salary       Hype  EUR     2119.0              1      0.00               0
+#   1     Groceries  Diet         Hype  EUR        0.0              0     41.18               1
+
+DIMENSIONS = ["Month", "Category", "Subcategory", "Type", "Coin"]
+MEASURES = ["incomes", "expenses", "transfers"]
+COLUMNS = [column for measure in MEASURES for column in (measure, f"{measure}_count")]
+
+def row_measures(category, qty):
+    """Cube values of rows (arrays of Category and Qty), one column per COLUMNS"""
+    transfer = category == "Transfer"
+    incomes = ~transfer & (qty > 0)
+    expenses = ~transfer & (qty < 0)
+    return np.column_stack([
+        np.where(incomes, qty, 0.0), incomes.astype("float64"),
+        np.where(expenses, -qty, 0.0), expenses.astype("float64"),
+        np.where(transfer, qty, 0.0), transfer.astype("float64"),
+    ])
+
+def cube_keys(df_cashflow : pd.DataFrame):
+    keys = pd.DataFrame({"Month": df_cashflow.index.month.to_numpy()})
+    for dimension in DIMENSIONS[1:]:
+        keys[dimension] = df_cashflow[dimension].astype(str).str.strip().to_numpy()
+    return keys
+
+class CashflowCube:
+    def __init__(self, df_cashflow : pd.DataFrame):
+        keys = cube_keys(df_cashflow)
+        values = row_measures(keys["Category"].to_numpy(), df_cashflow["Qty"].to_numpy(dtype="float64"))
+        cells = pd.concat([keys, pd.DataFrame(values, columns=COLUMNS)], axis=1)
+        self.cells = cells.groupby(DIMENSIONS, sort=True).sum()
+
+    def apply(self, df_rows : pd.DataFrame, sign : float):
+        keys = cube_keys(df_rows)
+        values = sign * row_measures(keys["Category"].to_numpy(), df_rows["Qty"].to_numpy(dtype="float64"))
+        delta = pd.concat([keys, pd.DataFrame(values, columns=COLUMNS)], axis=1).groupby(DIMENSIONS).sum()
+        cells = self.cells.add(delta, fill_value=0.0)
+        # cells whose rows were all removed
+        self.cells = cells.loc[cells[[f"{measure}_count" for measure in MEASURES]].sum(axis=1) > 0.5]
+
+    def add(self, df_rows : pd.DataFrame):
+        """Count written rows (Date index, cashflow columns)"""
+        self.apply(df_rows, 1.0)
+
+    def remove(self, df_rows : pd.DataFrame):
+        """Uncount deleted rows"""
+        self.apply(df_rows, -1.0)
+
+    def aggregate(self, measure : str, by : list, month : int = None, filters : dict = None):
+        """
+        Sum and count of measure grouped by the dimensions in by.
+
+        Args:
+            measure: one of MEASURES
+            by: dimensions of the result, [] for the grand total
+            month: only the cells of this month
+            filters: {dimension: value} the cells must match
+        Returns:
+            DataFrame with the by columns, measure and count, sorted by measure
+            (largest first). Groups without any row of measure are left out.
+        """
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown measure {measure}, expected one of {MEASURES}")
+        unknown = [dimension for dimension in list(by) + list((filters or {}).keys()) if dimension not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown dimensions {unknown}, expected some of {DIMENSIONS}")
+
+        cells = self.cells.reset_index()
+        mask = cells[f"{measure}_count"] > 0
+        if month is not None:
+            mask &= cells["Month"] == int(month)
+        for dimension, value in (filters or {}).items():
+            mask &= cells[dimension] == (int(value) if dimension == "Month" else value)
+        cells = cells.loc[mask, list(by) + [measure, f"{measure}_count"]]
+
+        if by:
+            result = cells.groupby(list(by), sort=True).sum().reset_index()
+        else:
+            result = pd.DataFrame([cells[[measure, f"{measure}_count"]].sum()])
+        result = result.rename(columns={f"{measure}_count": "count"})
+        result["count"] = result["count"].astype("int64")
+        return result.sort_values(measure, ascending=False, kind="stable").reset_index(drop=True)
@@ -1,7 +1,21 @@
+import os
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import json
+import copy
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from .errors import TypeDataError, LoadDataError
+from .logger import Logger
+from .ledger_writer import LEDGER_COLUMNS
+from .snapshot import snapshot_path, read_snapshot, write_snapshot, get_snapshot_stats
+from .config_service import get_config, expand_templates
+from .month_table import read_month_table
+from .ledger_validator import validate_months, load_errors
+
+DEFAULT_LOAD_WORKERS = 4 # threads used to parse month files
 
 def last_day_of_previous_month(date):
     first_day_of_current_month = date.replace(day=1)
@@ -43,38 +57,235 @@ def load_init_holdings(path : Path, YEAR : int):
         #print(e)
         return None
 
-def load_data(typedata : str, path : Path, YEAR : int):
+def parse_month_csv(typedata : str, filepath : str):
+    """Parse a month csv and normalize it: stripped names and values, parsed dates"""
+    df = pd.read_csv(filepath, skipinitialspace=True, na_filter=False)
+    df.columns = df.columns.str.strip() # remove whitespaces from columns
+    # Strip whitespace from Date column
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'].astype(str).str.strip())
+    df.Category = df.Category.str.strip()
+    df.Subcategory = df.Subcategory.str.strip()
+    df.Type = df.Type.str.strip()
+    if typedata == "cashflow":
+        df.Coin = df.Coin.str.strip()
+    elif typedata == "investments":
+        df.Symbol = df.Symbol.str.strip()
+    return df
+
+def load_month(typedata : str, path : Path, YEAR : int, month : int, use_snapshot : bool = True):
+    """Load one month file, from its binary snapshot when the csv did not change"""
+    filepath = f"{path}/{YEAR}/{typedata}/{YEAR}-{month:0=2}_{typedata}.csv"
+    if not use_snapshot:
+        return parse_month_csv(typedata, filepath)
+
+    snap_path = snapshot_path(path, filepath)
+    df = read_snapshot(filepath, snap_path)
+    if df is None:
+        stat = os.stat(filepath) # before parsing, see snapshot.py
+        df = parse_month_csv(typedata, filepath)
+        write_snapshot(filepath, snap_path, df, stat)
+    return df
+
+# Low cardinality columns stored as pandas Categorical, so masks and groupbys
+# compare small integer codes instead of python strings
+INTERNED_COLUMNS = {
+    "cashflow": ["Type", "Coin", "Category", "Subcategory"],
+    "investments": ["Type", "Symbol", "Category", "Subcategory"],
+}
+
+def build_vocabularies(typedata : str, config = None):
+    """Known values of the interned columns, taken from config.json and mappings.json"""
+    compiled = get_config()
+    if config is None:
+        config = compiled.expanded
+    vocabularies = dict()
+    if config is None or typedata not in config:
+        return vocabularies
+
+    data_config = config[typedata]
+    vocabularies["Category"] = list(data_config.get("Category", []))
+    subcategories = list()
+    for values in data_config.get("Subcategory", {}).values():
+        subcategories = merge_lists_unique_into_set(subcategories, values)
+    vocabularies["Subcategory"] = subcategories
+    if typedata == "cashflow":
+        vocabularies["Coin"] = list(data_config.get("Coin", []))
+        if compiled.mappings is not None:
+            vocabularies["Type"] = list(dict.fromkeys(compiled.mappings.values()))
+    return vocabularies
+
+def intern_columns(df : pd.DataFrame, typedata : str, vocabularies = None):
+    """Convert the interned columns of df to Categorical, categories are the vocabulary plus observed values"""
+    if vocabularies is None:
+        vocabularies = build_vocabularies(typedata)
+    for col in INTERNED_COLUMNS[typedata]:
+        if col not in df.columns:
+            continue
+        known = vocabularies.get(col, [])
+        observed = df[col].astype(object).unique().tolist()
+        known_set = set(known)
+        categories = known + [v for v in observed if v not in known_set]
+        df[col] = df[col].astype(pd.CategoricalDtype(categories))
+    return df
+
+def concat_interned(dfl, typedata : str):
+    """
+    Concatenate frames interned separately (e.g. one per year). pandas falls back to
+    object dtype when the categories differ, so they are unioned first. Empty frames,
+    e.g. empty partitions, take the union too.
+    """
+    dfl = list(dfl)
+    for col in INTERNED_COLUMNS[typedata]:
+        dtypes = [df[col].dtype for df in dfl if col in df.columns and not df.empty]
+        if not dtypes or not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            continue
+        union = pd.CategoricalDtype(list(dict.fromkeys(v for dtype in dtypes for v in dtype.categories)))
+        dfl = [df.assign(**{col: df[col].astype(union)}) for df in dfl]
+    return pd.concat(dfl)
+
+def saving_rate(savings, incomes):
+    """savings / incomes of months (floats or Series), NaN for a month without incomes"""
+    if isinstance(incomes, pd.Series):
+        return savings / incomes.replace(0.0, np.nan)
+    return savings / incomes if incomes != 0 else np.nan
+
+# ------------------ IN-MEMORY ROW UPDATES -------------------------
+def rows_to_frame(rows, typedata : str):
+    """Build a Date indexed frame, shaped like load_data output, from a list of row dicts"""
+    df = pd.DataFrame(rows, columns=LEDGER_COLUMNS[typedata])
+    df['Date'] = pd.to_datetime(df['Date'].astype(str).str.strip())
+    df['Qty'] = df['Qty'].astype('float64')
+    df['Description'] = df['Description'].fillna('').astype(str)
+    df.set_index('Date', inplace=True)
+    return df
+
+# boolean mask of a month, also safe on indexes which are not sorted
+def month_mask(index : pd.DatetimeIndex, year : int, month : int):
+    return (index.year == year) & (index.month == month)
+
+def _month_keys(index : pd.DatetimeIndex):
+    return index.year * 12 + index.month
+
+def insert_rows(df_year : pd.DataFrame, df_rows : pd.DataFrame, typedata : str):
+    """
+    Insert df_rows into df_year keeping categorical columns interned.
+    New rows go after the last row of their month, where a reload of the
+    appended month file would put them.
+    """
+    df_rows = df_rows[df_year.columns].copy()
+    for col in INTERNED_COLUMNS[typedata]:
+        if isinstance(df_year[col].dtype, pd.CategoricalDtype):
+            known = df_year[col].cat.categories
+            new = [v for v in df_rows[col].astype(object).unique() if v not in known]
+            if new:
+                df_year[col] = df_year[col].cat.add_categories(new)
+            df_rows[col] = df_rows[col].astype(df_year[col].dtype)
+
+    year_keys = _month_keys(df_year.index)
+    row_keys = _month_keys(df_rows.index)
+    pieces = list()
+    start = 0
+    for key in sorted(set(row_keys)):
+        end = int((year_keys <= key).sum())
+        pieces.append(df_year.iloc[start:end])
+        pieces.append(df_rows[row_keys == key])
+        start = end
+    pieces.append(df_year.iloc[start:])
+    return pd.concat(pieces)
+
+def find_row(df_year : pd.DataFrame, row, typedata : str):
+    """Position in df_year of the first row matching the row dict, None if not found"""
+    date = pd.to_datetime(str(row['Date']).strip())
+    mask = (df_year.index == date) & np.isclose(df_year['Qty'].values, float(row['Qty']))
+    for col in ["Type", "Category", "Subcategory", "Coin" if typedata == "cashflow" else "Symbol"]:
+        mask &= (df_year[col] == str(row[col]).strip()).values
+    positions = np.flatnonzero(mask)
+    if len(positions) == 0:
+        return None
+    return int(positions[0])
+
+def drop_row_at(df_year : pd.DataFrame, position : int):
+    keep = np.ones(len(df_year), dtype=bool)
+    keep[position] = False
+    return df_year.iloc[keep]
+
+def _load_month_safe(typedata : str, path : Path, YEAR : int, month : int, use_snapshot : bool):
+    filepath = f"{path}/{YEAR}/{typedata}/{YEAR}-{month:0=2}_{typedata}.csv"
+    try:
+        return load_month(typedata, path, YEAR, month, use_snapshot), None
+    except FileNotFoundError as e:
+        return None, {"file": filepath, "month": month, "kind": "missing", "error": str(e)}
+    except Exception as e:
+        return None, {"file": filepath, "month": month, "kind": "parse", "error": str(e)}
+
+def validation_errors(typedata : str, path : Path, YEAR : int, results):
+    """
+    Rows of the month files breaking config.json or the file format, as load errors
+    of kind "invalid". The files which could not be parsed are read again as
+    written to find their offending lines.
+    """
+    months = list()
+    for month, (df, error) in zip(range(1,13), results):
+        filepath = f"{path}/{YEAR}/{typedata}/{YEAR}-{month:0=2}_{typedata}.csv"
+        if error is None:
+            months.append((filepath, YEAR, month, df))
+        elif error["kind"] == "parse":
+            try:
+                months.append((filepath, YEAR, month, read_month_table(filepath)))
+            except Exception:
+                pass # not a csv at all, the parse error says it
+    issues = validate_months(typedata, months)
+    return load_errors(issues, {filepath: month for filepath, _, month, _ in months})
+
+def load_data_report(typedata : str, path : Path, YEAR : int, use_snapshot : bool = True, workers : int = DEFAULT_LOAD_WORKERS):
+    """
+    Load the twelve month files of YEAR, returns the yearly DataFrame and the list of per-file errors.
+    Kinds of errors: "missing" file, "parse" error, "invalid" row (see ledger_validator.py).
+    """
     if typedata not in ["cashflow", "investments"]:
         raise TypeDataError(f"Type data is not either cashflow or investments")
+
+    months = range(1,13)
+    if workers is None or workers <= 1:
+        results = [_load_month_safe(typedata, path, YEAR, i, use_snapshot) for i in months]
     else:
-        basepath = f"{path}/{YEAR}/{typedata}/"
-        dfl = list()
-        for i in range(1,13):
-            try:
-                filepath = f"{path}/{YEAR}/{typedata}/{YEAR}-{i:0=2}_{typedata}.csv"
-                df = pd.read_csv(filepath, skipinitialspace=True, na_filter=False)
-                df.columns = df.columns.str.strip() # remove whitespaces from columns
-                # Strip whitespace from Date column
-                if 'Date' in df.columns:
-                    df['Date'] = df['Date'].astype(str).str.strip()
-                df.Category = df.Category.str.strip()
-                df.Subcategory = df.Subcategory.str.strip()
-                df.Type = df.Type.str.strip()
-                if typedata == "cashflow":
-                    df.Coin = df.Coin.str.strip()
-                elif typedata == "investments":
-                    df.Symbol = df.Symbol.str.strip()
-
-                if not(df.empty):
-                    dfl.append(df)
-            except Exception as e:
-                print(e)
-                continue
-
-        df_year = pd.concat(dfl)
-        df_year['Date'] = pd.to_datetime(df_year['Date'])
-        df_year.set_index('Date',inplace=True)
-        return df_year
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map keeps the month order, so concatenation stays chronological
+            results = list(executor.map(lambda i: _load_month_safe(typedata, path, YEAR, i, use_snapshot), months))
+
+    dfl = list()
+    errors = list()
+    for df, error in results:
+        if error is not None:
+            errors.append(error)
+        elif not(df.empty):
+            dfl.append(df)
+    errors += validation_errors(typedata, path, YEAR, results)
+
+    if not dfl:
+        raise LoadDataError(f"No {typedata} data found for {YEAR} in {path}", errors)
+
+    df_year = pd.concat(dfl)
+    df_year['Date'] = pd.to_datetime(df_year['Date'])
+    df_year.set_index('Date',inplace=True)
+    intern_columns(df_year, typedata)
+    Logger.debug(f"Snapshot cache stats after loading {typedata}: {get_snapshot_stats()}")
+    return df_year, errors
+
+def log_load_errors(errors):
+    for error in errors:
+        if error["kind"] == "missing":
+            Logger.debug(f"Month file not found: {error['file']}")
+        elif error["kind"] == "invalid":
+            Logger.warning(f"Invalid row in {error['file']} line {error['line']}: {error['error']} {error['field']} '{error['value']}'")
+        else:
+            Logger.warning(f"Could not load {error['file']}: {error['error']}")
+
+def load_data(typedata : str, path : Path, YEAR : int, use_snapshot : bool = True, workers : int = DEFAULT_LOAD_WORKERS):
+    df_year, errors = load_data_report(typedata, path, YEAR, use_snapshot, workers)
+    log_load_errors(errors)
+    return df_year
 
 def found_cache_files(cache_dir : str, symbol, currency):
     try:
@@ -93,56 +304,28 @@ def found_cache_files(cache_dir : str, symbol, currency):
         return False
 
 # ------------------ HELPER FUNCTIONS FOR FLASK WRAPPER -------------
+# config.json and mappings.json are parsed once and kept until they change, see config_service.py
+# These return copies the caller is free to modify
 def load_config():
     """Load and return config.json"""
-    try:
-        with open('config.json', 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        return None
+    config = get_config().config
+    return copy.deepcopy(config) if config is not None else None
 
 def load_mappings():
     """Load and return mappings.json"""
-    try:
-        with open('mappings.json', 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        return None
+    mappings = get_config().mappings
+    return dict(mappings) if mappings is not None else None
 
 def expand_transfer_templates(config):
     """Expand Transfer subcategories templates with actual provider names from mappings.json"""
     try:
-        mappings = load_mappings()
+        mappings = get_config().mappings
         if mappings is None:
             return config
 
         # Expand for cashflow
         if 'cashflow' in config and 'Subcategory' in config['cashflow'] and 'Transfer' in config['cashflow']['Subcategory']:
-            transfer_templates = config['cashflow']['Subcategory']['Transfer']
-            expanded = []
-
-            for template in transfer_templates:
-                # Check if template contains placeholder
-                if '{' in template and '}' in template:
-                    # Extract placeholder: "To{Acc1}" -> "Acc1"
-                    start = template.index('{')
-                    end = template.index('}')
-                    placeholder = template[start+1:end]
-
-                    # Get mapped value
-                    if placeholder in mappings:
-                        # Replace placeholder with actual value
-                        expanded_value = template[:start] + mappings[placeholder] + template[end+1:]
-                        expanded.append(expanded_value)
-                    else:
-                        # Placeholder not found in mappings, keep as-is
-                        expanded.append(template)
-                else:
-                    # No placeholder (e.g., "Invest"), keep as-is
-                    expanded.append(template)
-
-            # Update config with expanded values
-            config['cashflow']['Subcategory']['Transfer'] = expanded
+            config['cashflow']['Subcategory']['Transfer'] = expand_templates(config['cashflow']['Subcategory']['Transfer'], mappings)
 
         return config
     except Exception as e:
@@ -172,40 +355,8 @@ def determine_month_from_date(date_str):
         raise ValueError(f"Invalid date format: {date_str}. Expected YYYY-MM-DD")
 
 def validate_data(data_type, category, subcategory, coin=None, symbol=None):
-    """Validate category and subcategory against config.json"""
-    config = load_config()
-    if config is None:
-        return False, "Config file not found"
-
-    # Expand Transfer templates
-    config = expand_transfer_templates(config)
-
-    # Get the appropriate section based on data_type
-    if data_type not in ["cashflow", "investments"]:
-        return False, f"Invalid data_type: {data_type}. Must be 'cashflow' or 'investments'"
-
-    data_config = config.get(data_type, {})
-    if not data_config:
-        return False, f"Config section for {data_type} not found"
-
-    # Validate category
-    valid_categories = data_config.get("Category", [])
-    if category not in valid_categories:
-        return False, f"Invalid category. Must be one of {valid_categories}"
-
-    # Validate subcategory
-    subcategories = data_config.get("Subcategory", {})
-    if category in subcategories:
-        if subcategory not in subcategories[category]:
-            return False, f"Invalid subcategory for {category}. Must be one of {subcategories[category]}"
-
-    # Validate coin (for cashflow)
-    if data_type == "cashflow" and coin is not None:
-        valid_coins = data_config.get("Coin", [])
-        if coin not in valid_coins:
-            return False, f"Invalid coin. Must be one of {valid_coins}"
-
-    return True, "Valid"
+    """Validate category and subcategory against config.json, set lookups in the compiled config"""
+    return get_config().validate(data_type, category, subcategory, coin, symbol)
 
 # preserves stable order of lists a and b to merge
 def merge_lists_unique_into_set(a, b):
@@ -0,0 +1,136 @@
+import copy
+import json
+import os
+import threading
+import time
+
+from .logger import Logger
+
+# config.json and mappings.json, parsed once.
+# Both files (read from the working directory) are compiled together into a
+# CompiledConfig: the Transfer templates expanded with the mapped providers and
+# the valid categories, subcategories and coins of each data type as frozensets,
+# so validating a row is a few set lookups without any disk access. The files
+# are stat-ed at most every CHECK_INTERVAL seconds and parsed again only when
+# their mtime or size changed.
+
+CONFIG_FILE = "config.json"
+MAPPINGS_FILE = "mappings.json"
+CHECK_INTERVAL = 1.0 # seconds between two checks of the files
+DATA_TYPES = ["cashflow", "investments"]
+
+def read_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def expand_templates(templates : list, mappings : dict):
+    """'To{Acc1}' -> 'ToHype', a template whose placeholder is not mapped is kept as it is"""
+    expanded = list()
+    for template in templates:
+        if '{' in template and '}' in template:
+            start = template.index('{')
+            end = template.index('}')
+            placeholder = template[start+1:end]
+            if placeholder in mappings:
+                expanded.append(template[:start] + mappings[placeholder] + template[end+1:])
+                continue
+        expanded.append(template)
+    return expanded
+
+def expand_config(config : dict, mappings : dict):
+    """Copy of config with the Transfer subcategories of cashflow expanded"""
+    expanded = copy.deepcopy(config)
+    transfer = expanded.get('cashflow', {}).get('Subcategory', {}).get('Transfer')
+    if transfer is not None and mappings:
+        expanded['cashflow']['Subcategory']['Transfer'] = expand_templates(transfer, mappings)
+    return expanded
+
+class CompiledConfig:
+    """Parsed config and mappings at one version of the files. Shared: never modify it"""
+    def __init__(self, config : dict, mappings : dict):
+        self.config = config # as in config.json, None if missing or invalid
+        self.mappings = mappings
+        self.expanded = expand_config(config, mappings) if config is not None else None
+        self.categories = dict() # data_type -> frozenset
+        self.subcategories = dict() # data_type -> {category: frozenset}
+        for data_type in DATA_TYPES:
+            section = (self.expanded or {}).get(data_type, {})
+            self.categories[data_type] = frozenset(section.get("Category", []))
+            self.subcategories[data_type] = {category: frozenset(values) for category, values in section.get("Subcategory", {}).items()}
+        self.coins = frozenset((self.expanded or {}).get("cashflow", {}).get("Coin", []))
+
+    def validate(self, data_type, category, subcategory, coin=None, symbol=None):
+        """(valid, message) of a row's category, subcategory and coin"""
+        if self.expanded is None:
+            return False, "Config file not found"
+
+        if data_type not in DATA_TYPES:
+            return False, f"Invalid data_type: {data_type}. Must be 'cashflow' or 'investments'"
+
+        data_config = self.expanded.get(data_type, {})
+        if not data_config:
+            return False, f"Config section for {data_type} not found"
+
+        # lists of the config only for the messages
+        if category not in self.categories[data_type]:
+            return False, f"Invalid category. Must be one of {data_config.get('Category', [])}"
+
+        subcategories = self.subcategories[data_type]
+        if category in subcategories and subcategory not in subcategories[category]:
+            return False, f"Invalid subcategory for {category}. Must be one of {data_config['Subcategory'][category]}"
+
+        if data_type == "cashflow" and coin is not None and coin not in self.coins:
+            return False, f"Invalid coin. Must be one of {data_config.get('Coin', [])}"
+
+        return True, "Valid"
+
+class ConfigService:
+    def __init__(self, config_path : str = CONFIG_FILE, mappings_path : str = MAPPINGS_FILE, check_interval : float = CHECK_INTERVAL):
+        self.config_path = config_path
+        self.mappings_path = mappings_path
+        self.check_interval = check_interval
+        self.compiled : CompiledConfig = None
+        self.signature = None
+        self.checked_at : float = 0.0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "checks": 0, "loads": 0}
+
+    def file_signature(self):
+        """(absolute path, mtime, size) of both files, None for a missing one"""
+        signature = list()
+        for path in [self.config_path, self.mappings_path]:
+            try:
+                stat = os.stat(path)
+                signature.append((os.path.abspath(path), stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def get(self):
+        """Current CompiledConfig, parsed again if one of the files changed"""
+        now = time.monotonic()
+        with self.lock:
+            if self.compiled is not None and now - self.checked_at < self.check_interval:
+                self.stats["hits"] += 1
+                return self.compiled
+            self.checked_at = now
+            self.stats["checks"] += 1
+            signature = self.file_signature()
+            if self.compiled is None or signature != self.signature:
+                self.compiled = CompiledConfig(read_json(self.config_path), read_json(self.mappings_path))
+                self.signature = signature
+                self.stats["loads"] += 1
+                Logger.debug(f"Loaded {self.config_path} and {self.mappings_path}")
+            return self.compiled
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
+
+config_service = ConfigService()
+
+def get_config():
+    return config_service.get()
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+from .holdings_engine import quantity_matrix
+
+# Daily net worth.
+# Cashflow and quantities are accumulated over every calendar day, prices are
+# joined as-of (last known close at or before each day, so weekend and holiday
+# gaps carry the previous close forward). Only business days, month ends and
+# the last day are kept, which is what the dashboards slice.
+#
+#               liquidity  investments  networth
+#   2025-01-02   12000.00      8123.40  20123.40
+#   2025-01-03   11950.00      8190.10  20140.10
+#   ...
+
+def daily_calendar(start, end):
+    """Business days between start and end, plus the month ends, start and end themselves"""
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    days = pd.bdate_range(start, end)
+    month_ends = pd.date_range(start, end, freq='ME')
+    return days.union(month_ends).union(pd.DatetimeIndex([start, end]))
+
+def asof_prices(prices : dict, columns : pd.MultiIndex, days : pd.DatetimeIndex):
+    """(days x columns) matrix of the last close at or before each day, NaN before the first one"""
+    close = np.full((len(days), len(columns)), np.nan)
+    for j, pair in enumerate(columns):
+        series = prices.get(pair)
+        if series is None or series.empty:
+            continue
+        series = series[~series.index.duplicated(keep="last")].sort_index()
+        positions = np.searchsorted(series.index.values, days.values, side="right") - 1
+        valid = positions >= 0
+        close[valid, j] = series.to_numpy(dtype="float64")[positions[valid]]
+    return close
+
+def daily_liquidity(df_cashflow : pd.DataFrame, opening : float, days : pd.DatetimeIndex, first_day):
+    """
+    Total liquidity at each day: opening plus the rows from first_day on.
+    It follows calc_monthly_cashflow: savings - invested transfers.
+    """
+    first_day = pd.Timestamp(first_day)
+    dates = df_cashflow.index.normalize()
+    in_range = (dates >= first_day) & (dates <= days[-1])
+    df = df_cashflow.loc[in_range]
+    dates = dates[in_range]
+
+    not_transfer = (df["Category"] != "Transfer").to_numpy()
+    invest = ((df["Category"] == "Transfer") & (df["Subcategory"] == "Invest")).to_numpy()
+    qty = df["Qty"].to_numpy(dtype="float64")
+    savings = pd.Series(np.where(not_transfer, qty, 0.0), index=dates).groupby(level=0).sum()
+    invested = pd.Series(np.where(invest, qty, 0.0), index=dates).groupby(level=0).sum().abs()
+
+    all_days = pd.date_range(first_day, days[-1], freq='D')
+    liquidity = opening + savings.reindex(all_days, fill_value=0.0).cumsum() - invested.reindex(all_days, fill_value=0.0).cumsum()
+    return liquidity.reindex(days)
+
+def daily_networth(df_cashflow, init_liquidity, df_investments, prices, start, end, previous=None, since=None):
+    """
+    Args:
+        df_cashflow: cashflow transactions of the year (Date index)
+        init_liquidity: opening balance per account
+        df_investments: investments transactions, init holdings included
+        prices: {(asset_class, symbol): Series of Close indexed by Date}, any resolution
+        start, end: first and last day
+        previous, since: an earlier result over the same days and the first day
+            changed since, e.g. by a write. Its rows before since are kept and
+            only the following days are computed again.
+    Returns:
+        nw_daily DataFrame indexed by daily_calendar(start, end)
+    """
+    days = daily_calendar(start, end)
+    all_days = pd.date_range(days[0], days[-1], freq='D')
+    opening, first_day = float(sum(init_liquidity.values())), days[0]
+    kept = None
+    if previous is not None and since is not None:
+        kept = previous.loc[previous.index < pd.Timestamp(since).normalize()]
+        if kept.empty:
+            kept = None
+        else:
+            # carry on from the last kept day
+            opening = float(kept["liquidity"].iloc[-1])
+            first_day = kept.index[-1] + pd.Timedelta(days=1)
+            days = days[days >= first_day]
+            if days.empty:
+                return previous
+
+    # quantities on every day, so that weekend transactions are counted
+    cumqty = quantity_matrix(df_investments, all_days, 'D').cumsum().reindex(days)
+    holdings = asof_prices(prices, cumqty.columns, days) * cumqty.to_numpy()
+
+    nw_daily = pd.DataFrame({
+        "liquidity": daily_liquidity(df_cashflow, opening, days, first_day).to_numpy(),
+        "investments": np.nansum(holdings, axis=1),
+    }, index=days)
+    nw_daily["networth"] = nw_daily.liquidity + nw_daily.investments
+    if kept is not None:
+        nw_daily = pd.concat([kept, nw_daily])
+    return nw_daily
+
+def slice_asof(df : pd.DataFrame, date):
+    """Last row at or before date, None if date precedes the data"""
+    position = df.index.searchsorted(pd.Timestamp(date), side="right") - 1
+    if position < 0:
+        return None
+    return df.iloc[position]
@@ -2,4 +2,26 @@ class PathError(Exception):
     pass
 
 class TypeDataError(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class LoadDataError(Exception):
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors if errors is not None else []
+
+class InitCancelled(Exception):
+    pass
+
+
+class FetchError(Exception):
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status # None for network errors
+        self.retry_after = retry_after # seconds, from the Retry-After header
+
+    @property
+    def retryable(self):
+        return self.status is None or self.status == 429 or self.status >= 500
+
+class SessionError(Exception):
+    pass
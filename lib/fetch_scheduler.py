@@ -0,0 +1,157 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from .logger import Logger
+from .errors import FetchError
+from .common import load_config
+
+# Scheduler for market data requests.
+# Every host has its own token bucket, so Yahoo and justETF are paced
+# independently and fetched in parallel, while requests to the same host keep
+# the spacing which avoids the ip based 429/500 answers.
+# Retryable failures (429, 5xx, network errors) are retried with exponential backoff.
+
+DEFAULT_HOST_LIMITS = {
+    # host: (requests per second, burst)
+    "query1.finance.yahoo.com": (1/6, 1),
+    "www.justetf.com": (1/6, 1),
+}
+DEFAULT_LIMIT = (1/6, 1)
+
+# Buckets and slots are shared by the schedulers with the same limits, so the
+# fetches of a new run and the background quote refreshes (quote_cache.py)
+# pace together instead of each scheduler starting with a full bucket
+_host_states = dict()
+_host_states_lock = threading.Lock()
+
+class TokenBucket:
+    def __init__(self, rate : float, capacity : int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, stop_event : threading.Event = None):
+        """Block until a token is available, returns False if stop_event was set meanwhile"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+class FetchTask:
+    def __init__(self, key, url_or_host, fn, *args, **kwargs):
+        self.key = key # e.g. (asset_class, symbol)
+        self.host = urlparse(url_or_host).netloc or url_or_host
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+class FetchScheduler:
+    def __init__(self, max_workers : int = 4, host_limits = None, max_retries : int = 4,
+                 backoff_base : float = 2.0, backoff_max : float = 60.0, per_host_concurrency : int = 1):
+        self.max_workers = max_workers
+        self.host_limits = dict(DEFAULT_HOST_LIMITS)
+        if host_limits:
+            self.host_limits.update(host_limits)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.per_host_concurrency = per_host_concurrency
+
+        self.stop_event = threading.Event()
+
+    def _host_state(self, host):
+        rate, burst = self.host_limits.get(host, DEFAULT_LIMIT)
+        key = (host, rate, burst, self.per_host_concurrency)
+        with _host_states_lock:
+            if key not in _host_states:
+                _host_states[key] = (TokenBucket(rate, burst), threading.Semaphore(self.per_host_concurrency))
+            return _host_states[key]
+
+    def backoff_delay(self, attempt : int, error : FetchError):
+        if error.retry_after is not None:
+            return min(self.backoff_max, float(error.retry_after))
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0) # jitter, retries of different symbols do not align
+
+    def _execute(self, task : FetchTask):
+        bucket, slots = self._host_state(task.host)
+        attempt = 0
+        while True:
+            with slots:
+                if not bucket.acquire(self.stop_event):
+                    raise FetchError(f"Fetch of {task.key} stopped")
+                try:
+                    return task.fn(*task.args, **task.kwargs)
+                except FetchError as e:
+                    error = e
+            if not error.retryable or attempt >= self.max_retries:
+                raise error
+            delay = self.backoff_delay(attempt, error)
+            Logger.info(f"{task.key} on {task.host} failed ({error}), retry in {delay:.1f}s")
+            attempt += 1
+            if self.stop_event.wait(delay):
+                raise FetchError(f"Fetch of {task.key} stopped")
+
+    def execute(self, task : FetchTask):
+        """Run one task in the calling thread, paced and retried like the tasks of run"""
+        return self._execute(task)
+
+    def run(self, tasks, on_done=None):
+        """
+        Run the tasks concurrently.
+
+        Args:
+            tasks: list of FetchTask
+            on_done: optional callback(key, done, total) called from the calling
+                thread, an exception raised by it stops the pending fetches
+        Returns:
+            (results, errors) dictionaries keyed by task key
+        """
+        results = dict()
+        errors = dict()
+        if not tasks:
+            return results, errors
+
+        self.stop_event.clear()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fetch")
+        try:
+            futures = {executor.submit(self._execute, task): task for task in tasks}
+            for done, future in enumerate(as_completed(futures), start=1):
+                task = futures[future]
+                try:
+                    results[task.key] = future.result()
+                except Exception as e:
+                    Logger.error(f"Fetch of {task.key} failed: {e}")
+                    errors[task.key] = e
+                if on_done is not None:
+                    on_done(task.key, done, len(tasks))
+        finally:
+            self.stop_event.set() # wakes up workers waiting on tokens or backoff
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results, errors
+
+def build_scheduler():
+    """FetchScheduler configured from the 'fetch' section of config.json"""
+    config = load_config() or {}
+    fetch_config = config.get("fetch", {})
+    host_limits = {host: (limit["rate"], limit.get("burst", 1)) for host, limit in fetch_config.get("hosts", {}).items()}
+    return FetchScheduler(
+        max_workers=fetch_config.get("workers", 4),
+        host_limits=host_limits,
+        max_retries=fetch_config.get("max_retries", 4),
+    )
@@ -3,6 +3,8 @@ from pathlib import Path
 import pandas as pd
 
 from .logger import Logger
+from .balance_index import BalanceIndex
+from .cashflow_cube import CashflowCube
 
 from .common import *
 from .errors import *
@@ -15,8 +17,11 @@ class FinCashflow:
         init_holdings (dict): A dictionary to store initial holdings.
         df_year_cashflow (pd.DataFrame): DataFrame to track yearly cash flow.
         df_m_cashflow (pd.DataFrame) : Table which resumes monthly data
+        load_errors (list): Per-file errors collected while loading month files
+        balance_index (BalanceIndex): Point in time balances of the accounts
+        cube (CashflowCube): Incomes, expenses and transfers per month, category and account
     """
-    def __init__(self, path: str, YEAR: int):
+    def __init__(self, path: str, YEAR: int, workers: int = DEFAULT_LOAD_WORKERS):
         Logger.info("Initializing FinCashflow class.")
         path_o = Path(path)
         if path_o.exists():
@@ -27,22 +32,22 @@ class FinCashflow:
 
         self.YEAR : int = YEAR
         self.init_holdings : Dict[str, float] = load_init_holdings(self.path, self.YEAR)
-        self.df_year_cashflow : pd.DataFrame = load_data("cashflow", self.path, self.YEAR)
+        self.df_year_cashflow, self.load_errors = load_data_report("cashflow", self.path, self.YEAR, workers=workers)
+        log_load_errors(self.load_errors)
+        self.balance_index = BalanceIndex(self.df_year_cashflow, self.init_holdings['liquidity_eur'])
+        self.cube = CashflowCube(self.df_year_cashflow)
         self.df_m_cashflow : pd.DataFrame = pd.DataFrame()
         self.df_last_month_cashflow : pd.DataFrame = pd.DataFrame()
         pass
 
-    def get_all_balances(self):
+    # Balances of all the accounts, the latest ones or at the end of date
+    def get_all_balances(self, date=None):
+        values = self.balance_index.balances(date)
         balances = dict()
-        accounts = self.df_year_cashflow['Type'].unique().tolist()
+        accounts = [account for account in values if account not in self.init_holdings['liquidity_eur']]
         merged = merge_lists_unique_into_set(accounts, list(self.init_holdings['liquidity_eur'].keys()))
         for cc in merged:
-            if cc in self.init_holdings['liquidity_eur'].keys():
-                val = self.df_year_cashflow.loc[self.df_year_cashflow["Type"] == cc]['Qty'].sum() + self.init_holdings['liquidity_eur'][cc]
-                balances[cc] = round(float(val), 2)
-            else:
-                val = self.df_year_cashflow.loc[self.df_year_cashflow["Type"] == cc]['Qty'].sum()
-                balances[cc] = round(float(val), 2)
+            balances[cc] = round(float(values.get(cc, 0.0)), 2)
 
         return balances
     
@@ -83,11 +88,14 @@ class FinCashflow:
         liabilities = df_year_cashflow.loc[(df_year_cashflow["Category"] != "Transfer") & (df_year_cashflow["Qty"] <= 0)]
         investments = df_year_cashflow.loc[ (df_year_cashflow["Category"] == "Transfer") & (df_year_cashflow["Subcategory"] == "Invest")]
         
-        m_incomes = incomes.resample(rule='ME')['Qty'].sum()
-        m_liab = liabilities.resample(rule='ME')['Qty'].sum()
-        m_savings = incomes.resample(rule='ME')['Qty'].sum() + liabilities.resample(rule='ME')['Qty'].sum()
+        # every month of the year, so that incomes and liabilities stay aligned
+        # when one of them has no rows in the first or last months
+        complete_index = pd.date_range(start=f"{self.YEAR}-01-01", end=end_date, freq='ME') # End of month
+        m_incomes = incomes.resample(rule='ME')['Qty'].sum().reindex(complete_index, fill_value=0.0)
+        m_liab = liabilities.resample(rule='ME')['Qty'].sum().reindex(complete_index, fill_value=0.0)
+        m_savings = m_incomes + m_liab
         m_investments = investments.resample(rule='ME')['Qty'].sum()
-        m_savingrate = m_savings / m_incomes
+        m_savingrate = saving_rate(m_savings, m_incomes) # same as update_month
 
         Logger.debug("\n m_incomes:\n%s", m_incomes.to_string())
         Logger.debug("\n m_liab:\n%s", m_liab.to_string())
@@ -97,7 +105,6 @@ class FinCashflow:
 
 
         # Add fill values to m_investments otherwise shifted data
-        complete_index = pd.date_range(start=f"{self.YEAR}-01-01", end=end_date, freq='ME') # End of month
         df_month_fill = pd.DataFrame(index=complete_index, data=0.0, columns=["Qty"], dtype='float64')
         temp_fill = df_month_fill.Qty.copy()
         temp_fill.update(m_investments)
@@ -133,7 +140,7 @@ class FinCashflow:
     def calc_curr_month_cashflow(self):
         today_date_str, today_month_str, today = define_today_date()
         prev_month_liquidity, prev_month_investments = define_prev_month_holdings(self.df_m_cashflow)
-        df_curr_month_cashflow = self.df_year_cashflow.loc[today_month_str]
+        df_curr_month_cashflow = self.df_year_cashflow.loc[month_mask(self.df_year_cashflow.index, today.year, today.month)]
 
         incomes = df_curr_month_cashflow.loc[(df_curr_month_cashflow["Category"] != "Transfer") & (df_curr_month_cashflow["Qty"] > 0)]
         liabilities = df_curr_month_cashflow.loc[(df_curr_month_cashflow["Category"] != "Transfer") & (df_curr_month_cashflow["Qty"] <= 0)]
@@ -161,4 +168,46 @@ class FinCashflow:
 
     def run(self):
         self.df_m_cashflow = self.calc_monthly_cashflow()
-        self.df_last_month_cashflow = self.calc_curr_month_cashflow()
\ No newline at end of file
+        self.df_last_month_cashflow = self.calc_curr_month_cashflow()
+
+    # ---------------- INCREMENTAL UPDATES ---------------------------
+    # Applied after writes on the month files, so that the state stays in sync
+    # without reloading the whole year.
+    def add_rows(self, df_rows):
+        self.df_year_cashflow = insert_rows(self.df_year_cashflow, df_rows, "cashflow")
+        for date, row in df_rows.iterrows():
+            self.balance_index.add(str(row["Type"]), date, float(row["Qty"]))
+        self.cube.add(df_rows)
+        for month_end in sorted(set(df_rows.index + pd.offsets.MonthEnd(0))):
+            self.update_month(month_end)
+        self.df_last_month_cashflow = self.calc_curr_month_cashflow()
+        return True
+
+    def remove_row(self, row):
+        position = find_row(self.df_year_cashflow, row, "cashflow")
+        if position is None:
+            Logger.warning(f"Deleted row not found in memory: {row}")
+            return False
+        month_end = self.df_year_cashflow.index[position] + pd.offsets.MonthEnd(0)
+        removed = self.df_year_cashflow.iloc[position]
+        self.balance_index.remove(str(removed["Type"]), self.df_year_cashflow.index[position], float(removed["Qty"]))
+        self.cube.remove(self.df_year_cashflow.iloc[[position]])
+        self.df_year_cashflow = drop_row_at(self.df_year_cashflow, position)
+        self.update_month(month_end)
+        self.df_last_month_cashflow = self.calc_curr_month_cashflow()
+        return True
+
+    # Recompute the df_m_cashflow row of one month, then the liquidity running sum
+    def update_month(self, month_end):
+        if month_end not in self.df_m_cashflow.index:
+            return # current month, covered by df_last_month_cashflow
+        df_month = self.df_year_cashflow.loc[month_mask(self.df_year_cashflow.index, month_end.year, month_end.month)]
+        not_transfer = df_month["Category"] != "Transfer"
+        m_incomes = float(df_month.loc[not_transfer & (df_month["Qty"] > 0), 'Qty'].sum())
+        m_liab = float(df_month.loc[not_transfer & (df_month["Qty"] <= 0), 'Qty'].sum())
+        m_investments = float(df_month.loc[(df_month["Category"] == "Transfer") & (df_month["Subcategory"] == "Invest"), 'Qty'].sum())
+        m_savings = m_incomes + m_liab
+        m_savingrate = saving_rate(m_savings, m_incomes)
+
+        self.df_m_cashflow.loc[month_end, ["incomes", "liabilities", "savings", "saving_rate", "investments"]] = [m_incomes, m_liab, m_savings, m_savingrate, m_investments]
+        self.df_m_cashflow['liquidity'] = self.df_m_cashflow['savings'].values.cumsum() - self.df_m_cashflow['investments'].abs().values.cumsum()
\ No newline at end of file
@@ -3,11 +3,14 @@ import requests
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import json
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
 import pandas as pd
-import time
-import random
+from requests.adapters import HTTPAdapter
 
-from .common import found_cache_files
+from .config_service import get_config
+from .errors import FetchError
 
 user_agents = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -16,146 +19,209 @@ user_agents = [
     'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/121.0',
 ]
 
+YAHOO_URL = "https://query1.finance.yahoo.com"
+JUSTETF_URL = "https://www.justetf.com"
+
+DEFAULT_TIMEOUTS = (5.0, 30.0) # (connect, read) seconds, a hung socket must not stall /initialize
+
+# One keep-alive requests.Session per host, shared by all the fetch threads
+# (the connection pool of the adapter is thread safe), so the TCP+TLS handshake
+# is paid once per provider instead of once per symbol.
+_sessions = dict()
+_sessions_lock = threading.Lock()
+
+# Validators of the last 200 answer per url, for conditional requests.
+# Least recently used first: the justETF urls change every day (dateTo), so
+# the entries of the past days are dropped instead of piling up
+MAX_VALIDATORS = 128
+_validators = OrderedDict() # url -> (etag, last_modified, decoded json)
+_validators_lock = threading.Lock()
+
+def http_settings():
+    """Timeouts and pool size from the 'fetch' section of config.json"""
+    config = get_config().config or {} # shared, read only: no copy per request
+    fetch_config = config.get("fetch", {})
+    timeouts = (
+        fetch_config.get("connect_timeout", DEFAULT_TIMEOUTS[0]),
+        fetch_config.get("read_timeout", DEFAULT_TIMEOUTS[1]),
+    )
+    return timeouts, fetch_config.get("workers", 4)
+
+def get_session(url):
+    parsed = urlparse(url)
+    host = f"{parsed.scheme}://{parsed.netloc}"
+    with _sessions_lock:
+        if host not in _sessions:
+            _, pool_size = http_settings()
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount(f"{parsed.scheme}://", adapter)
+            session.headers.update({
+                'User-Agent': user_agents[0], # mimic a web browser, otherwise error 429 too many requests
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection': 'keep-alive',
+            })
+            _sessions[host] = session
+        return _sessions[host]
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+    with _validators_lock:
+        _validators.clear()
+
+# Pacing between requests is done by the fetch scheduler (fetch_scheduler.py),
+# failures are raised as FetchError so that it can retry 429/5xx with backoff
+def _get_json(url):
+    """GET url on the pooled session of its host and return the decoded json body"""
+    with _validators_lock:
+        cached = _validators.get(url)
+        if cached is not None:
+            _validators.move_to_end(url)
+    headers = dict()
+    if cached is not None:
+        etag, last_modified, _ = cached
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+    timeouts, _ = http_settings()
+    try:
+        response = get_session(url).get(url, headers=headers, timeout=timeouts)
+    except requests.RequestException as e:
+        raise FetchError(f"Error fetching data: {e} {url}")
+
+    if response.status_code == 304 and cached is not None:
+        return cached[2] # unchanged since the last answer
+    if response.status_code != 200:
+        retry_after = response.headers.get("Retry-After")
+        raise FetchError(
+            f"Error fetching data: {response.status_code} {url}",
+            status=response.status_code,
+            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+        )
+
+    try:
+        data = response.json()
+    except ValueError as e:
+        raise FetchError(f"Invalid json from {url}: {e}", status=response.status_code)
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if etag or last_modified:
+        with _validators_lock:
+            _validators[url] = (etag, last_modified, data)
+            _validators.move_to_end(url)
+            while len(_validators) > MAX_VALIDATORS:
+                _validators.popitem(last=False)
+    return data
+
+# The fetchers return (closes, daily): the closes asked for and the daily closes
+# the same answer carried (None when it has none) for the daily price store
 class FinFetch:
+    # Provider of each asset class, the fetch scheduler paces requests per host
+    def base_url(asset_class):
+        if asset_class == "Cryptocurrencies":
+            return YAHOO_URL
+        return JUSTETF_URL
+
     def fetch_crypto_data(symbol, currency="EUR", years_watchback=3):
-        url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}-{currency}?range={years_watchback}y&interval=1mo"
-        headers = {'User-Agent': user_agents[0]} # Set the user agent to mimic a web browser, otherwise error 429 too many requests
-        response = requests.get(url, headers=headers)
-
-        if response.status_code == 200:
-            data = response.json()
-            
-            # Extract the relevant data
-            timestamps = data['chart']['result'][0]['timestamp']
-            open_prices = data['chart']['result'][0]['indicators']['quote'][0]['open']
-            close_prices = data['chart']['result'][0]['indicators']['quote'][0]['close']
-            
-            asset_history = pd.DataFrame({
-                'Date': pd.to_datetime(timestamps, unit='s').strftime('%Y-%m-%d'),
-                'Close': close_prices
-            })
+        url = f"{YAHOO_URL}/v8/finance/chart/{symbol}-{currency}?range={years_watchback}y&interval=1mo"
+        data = _get_json(url)
+
+        # Extract the relevant data
+        timestamps = data['chart']['result'][0]['timestamp']
+        open_prices = data['chart']['result'][0]['indicators']['quote'][0]['open']
+        close_prices = data['chart']['result'][0]['indicators']['quote'][0]['close']
+
+        asset_history = pd.DataFrame({
+            'Date': pd.to_datetime(timestamps, unit='s').strftime('%Y-%m-%d'),
+            'Close': close_prices
+        })
 
-            asset_history['Close'] = asset_history['Close'].round(2)
-            asset_history['Date'] = pd.to_datetime(asset_history['Date'])
-            asset_history.set_index('Date',inplace=True)
+        asset_history['Close'] = asset_history['Close'].round(2)
+        asset_history['Date'] = pd.to_datetime(asset_history['Date'])
+        asset_history.set_index('Date',inplace=True)
 
-            # Change dates with end of month instead of start for coherence
-            asset_history.index = asset_history.index + pd.offsets.MonthEnd(0)
+        # Change dates with end of month instead of start for coherence
+        asset_history.index = asset_history.index + pd.offsets.MonthEnd(0)
 
-            return asset_history
-        else:
-            print(f"Error fetching data: {response.status_code}")
-            print(url)
-            return None
+        return asset_history, None # monthly closes only
 
     def fetch_etf_data(isin, currency="EUR", years_watchback=3):
         today = datetime.now()
         query_end_date = today.strftime('%Y-%m-%d')
         query_start_date = ( today - relativedelta(years=years_watchback) ).strftime('%Y-%m-%d')
 
-        url = f"https://www.justetf.com/api/etfs/{isin}/performance-chart?locale=en&currency={currency}&valuesType=MARKET_VALUE&reduceData=true&includeDividends=false&features=DIVIDENDS&dateFrom={query_start_date}&dateTo={query_end_date}"
-        headers = {'User-Agent': user_agents[0]} # User agent to mimic a web browser, otherwise error 429 too many requests
+        url = f"{JUSTETF_URL}/api/etfs/{isin}/performance-chart?locale=en&currency={currency}&valuesType=MARKET_VALUE&reduceData=true&includeDividends=false&features=DIVIDENDS&dateFrom={query_start_date}&dateTo={query_end_date}"
+        data = _get_json(url)
 
-        response = requests.get(url, headers=headers)
+        dates = list()
+        close_prices = list()
+        for row in data['series']:
+            dates.append(row['date'])
+            close_prices.append(row['value']['raw'])
 
-        if response.status_code == 200:
-            data = response.json()
-            
-            dates = list()
-            close_prices = list()
-            for row in data['series']:
-                dates.append(row['date'])
-                close_prices.append(row['value']['raw'])
+        j_asset_history = pd.DataFrame({
+            'Date': pd.to_datetime(dates).strftime('%Y-%m-%d'),
+            'Close': close_prices
+        })
 
-            j_asset_history = pd.DataFrame({
-                'Date': pd.to_datetime(dates).strftime('%Y-%m-%d'),
-                'Close': close_prices
-            })
+        j_asset_history['Close'] = j_asset_history['Close'].round(2)
+        j_asset_history['Date'] = pd.to_datetime(j_asset_history['Date'])
+        j_asset_history.set_index('Date',inplace=True)
+
+        # Sample from daily to monthly and take end of month for coherence,
+        # the daily closes are returned too for the daily price store
+        daily = j_asset_history.copy()
+        j_asset_history = j_asset_history.resample(rule='ME').last()
+
+        return j_asset_history, daily
+
+    # Quotes of today, caching is done by QuoteCache (quote_cache.py)
+    def fetch_crypto_data_today(symbol, currency="EUR", years_watchback=1):
+        # Now get real time market data
+        url = f"{YAHOO_URL}/v8/finance/chart/{symbol}-{currency}?range={years_watchback}y&interval=1d"
+        data = _get_json(url)
+
+        timestamp = data['chart']['result'][0]['meta']['regularMarketTime']
+        close_price = data['chart']['result'][0]['meta']['regularMarketPrice']
+
+        asset_today = pd.DataFrame({
+            'Date': [pd.to_datetime(timestamp, unit='s').strftime('%Y-%m-%d')],
+            'Close': [close_price]
+        })
+
+        asset_today['Close'] = asset_today['Close'].round(2)
+        asset_today['Date'] = pd.to_datetime(asset_today['Date'])
+        asset_today.set_index('Date',inplace=True)
+
+        # The same answer carries the daily closes of the range, for the daily price store
+        daily = pd.DataFrame({
+            'Close': data['chart']['result'][0]['indicators']['quote'][0]['close']
+        }, index=pd.to_datetime(data['chart']['result'][0]['timestamp'], unit='s').normalize().rename('Date'))
+        return asset_today, daily.dropna().round(2) # one row dataframe of current asset value
+
+    def fetch_etf_data_today(isin, currency="EUR"):
+        today = datetime.now()
+        query_end_date = today.strftime('%Y-%m-%d')
+        query_start_date = ( today - relativedelta(months=1) ).strftime('%Y-%m-%d')
+
+        url = f"{JUSTETF_URL}/api/etfs/{isin}/performance-chart?locale=en&currency={currency}&valuesType=MARKET_VALUE&reduceData=true&includeDividends=false&features=DIVIDENDS&dateFrom={query_start_date}&dateTo={query_end_date}"
+        data = _get_json(url)
+
+        close_price = data['latestQuote']['raw']
+        date = data['latestQuoteDate']
+
+        asset_today = pd.DataFrame({
+            'Date': [date],
+            'Close': [close_price]
+        })
+
+        asset_today['Close'] = asset_today['Close'].round(2)
+        asset_today['Date'] = pd.to_datetime(asset_today['Date'])
+        asset_today.set_index('Date',inplace=True)
 
-            j_asset_history['Close'] = j_asset_history['Close'].round(2)
-            j_asset_history['Date'] = pd.to_datetime(j_asset_history['Date'])
-            j_asset_history.set_index('Date',inplace=True)
-
-            # Sample from daily to monthly and take end of month for coherence
-            j_asset_history = j_asset_history.resample(rule='ME').last()
-
-            return j_asset_history
-        else:
-            print(f"Error fetching data: {response.status_code}")
-            return None
-
-    def fetch_crypto_data_today(cache_dir, symbol, currency="EUR", years_watchback=1):
-        if found_cache_files(cache_dir, symbol, currency):
-            asset_today =  pd.read_csv(f"{cache_dir}/cache_{symbol}-{currency}.csv")
-            asset_today['Date'] = pd.to_datetime(asset_today['Date'])
-            asset_today.set_index('Date',inplace=True)
-            return asset_today
-        else:
-            # Now get real time market data
-            url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}-{currency}?range={years_watchback}y&interval=1d"
-            headers = {'User-Agent': user_agents[0]} # Set the user agent to mimic a web browser, otherwise error 429 too many requests
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                data = response.json()
-
-                timestamp = data['chart']['result'][0]['meta']['regularMarketTime']
-                close_price = data['chart']['result'][0]['meta']['regularMarketPrice']
-
-                asset_today = pd.DataFrame({
-                    'Date': [pd.to_datetime(timestamp, unit='s').strftime('%Y-%m-%d')],
-                    'Close': [close_price]
-                })
-
-                asset_today['Close'] = asset_today['Close'].round(2)
-                asset_today['Date'] = pd.to_datetime(asset_today['Date'])
-                asset_today.set_index('Date',inplace=True)
-                print(asset_today)
-
-                asset_today.to_csv(f"{cache_dir}/cache_{symbol}-{currency}.csv")
-                
-                time.sleep(random.uniform(5,7)) # sleep for preventing status resp 500 (ip addres based limitation)
-
-                return asset_today # one row dataframe of current asset value
-            else:
-                print(f"Error fetching data: {response.status_code}")
-                print(url)
-                return None
-
-    def fetch_etf_data_today(cache_dir, isin, currency="EUR"):
-        if found_cache_files(cache_dir, isin, currency):
-            asset_today = pd.read_csv(f"{cache_dir}/cache_{isin}-{currency}.csv")
-            asset_today['Date'] = pd.to_datetime(asset_today['Date'])
-            asset_today.set_index('Date',inplace=True)
-            return asset_today
-        else:
-            today = datetime.now()
-            query_end_date = today.strftime('%Y-%m-%d')
-            query_start_date = ( today - relativedelta(months=1) ).strftime('%Y-%m-%d')
-
-            url = f"https://www.justetf.com/api/etfs/{isin}/performance-chart?locale=en&currency={currency}&valuesType=MARKET_VALUE&reduceData=true&includeDividends=false&features=DIVIDENDS&dateFrom={query_start_date}&dateTo={query_end_date}"
-            headers = {'User-Agent': user_agents[0]} # User agent to mimic a web browser, otherwise error 429 too many requests
-
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                data = response.json()
-
-                close_price = data['latestQuote']['raw']
-                date = data['latestQuoteDate']
-
-                asset_today = pd.DataFrame({
-                    'Date': [date],
-                    'Close': [close_price]
-                })
-
-                asset_today['Close'] = asset_today['Close'].round(2)
-                asset_today['Date'] = pd.to_datetime(asset_today['Date'])
-                asset_today.set_index('Date',inplace=True)
-
-                asset_today.to_csv(f"{cache_dir}/cache_{isin}-{currency}.csv")
-
-                time.sleep(random.uniform(5,7)) # sleep for preventing status resp 500 (ip addres based limitation)
-
-                return asset_today
-            else:
-                print(f"Error fetching data: {response.status_code}")
-                return None
+        return asset_today, None
@@ -1,16 +1,18 @@
 from pathlib import Path
+from dateutil.relativedelta import relativedelta
 import pandas as pd
 import os 
 
-import time
-import random # for random time sleeps to prevent 429
-
 from .logger import Logger
 
 from .common import *
 from .errors import *
 
 from .fin_fetch import FinFetch
+from .fetch_scheduler import FetchTask, build_scheduler
+from .price_store import PriceStore
+from .quote_cache import get_quote_cache, MISSING, STALE
+from .holdings_engine import quantity_matrix, per_symbol_views, HoldingsArrays
 
 class FinInvestments:
     """
@@ -19,8 +21,9 @@ class FinInvestments:
     Attributes:
         init_holdings (dict): A dictionary to store initial holdings.
         df_year_investments (pd.DataFrame): DataFrame to track yearly investments.
+        load_errors (list): Per-file errors collected while loading month files
     """
-    def __init__(self, path: str, YEAR: int):
+    def __init__(self, path: str, YEAR: int, workers: int = DEFAULT_LOAD_WORKERS):
         Logger.info("Initializing FinInvestmeents class.")
         path_o = Path(path)
         if path_o.exists():
@@ -31,15 +34,22 @@ class FinInvestments:
 
         self.YEAR : int = YEAR
         self.init_holdings : Dict[str, float] = load_init_holdings(self.path, self.YEAR)
-        self.df_year_investments : pd.DataFrame = load_data("investments", self.path, self.YEAR)
-        self.assets : Dict[str, Dict[str, pd.DataFrame]]
+        self.df_year_investments, self.load_errors = load_data_report("investments", self.path, self.YEAR, workers=workers)
+        log_load_errors(self.load_errors)
+        self.holdings : HoldingsArrays = None # month end Qty, CumQty, Close, Holdings per symbol
         self.df_year_holdings : pd.DataFrame = pd.DataFrame()
         self.df_today_holdings : pd.DataFrame = pd.DataFrame()
 
         self.df_year_holdings_class : pd.DataFrame = pd.DataFrame()
         self.df_today_holdings_class : pd.DataFrame = pd.DataFrame()
+
+        self.progress = None # optional callback(stage, done, total, message), see init_job.py
         pass
 
+    def report_progress(self, stage, done=None, total=None, message=None):
+        if self.progress is not None:
+            self.progress(stage, done, total, message)
+
     def get_init_holdings_to_df(self):
         rows = list()
         for asset_class in self.init_holdings['assets'].keys():
@@ -63,111 +73,128 @@ class FinInvestments:
         df_init_investments = pd.concat(rows)
         return df_init_investments
 
-    # For each symbol of each asset class, initializes the date index series
-    # as dates from january till december with zero values, and then updates it
-    # with imported values from df_year_investments
+    # Quantities of every symbol of each asset class at the end of each month,
+    # from december of last year (init holdings) till define_end_date, computed
+    # with one groupby over df_year_investments and kept as HoldingsArrays
+    # (see holdings_engine.py)
     def get_holdings_monthlyized(self):
-        df_year_investments = self.df_year_investments
         start_date = f"{self.YEAR-1}-12-31" # for init_holdings
         end_date = define_end_date(self.YEAR)
         complete_index = pd.date_range(start=start_date, end=end_date, freq='ME') # End of month
-        df_month_fill = pd.DataFrame(index=complete_index, data=0.0, columns=["Qty"], dtype='float64')
 
-        holdings_monthlyized = dict()
-        asset_classes = df_year_investments["Type"].unique()
-        for asset_class in asset_classes:
-            holdings_monthlyized_per_symbol = dict()
-            symbols = df_year_investments.loc[df_year_investments["Type"]==asset_class]["Symbol"].unique()
-            for symbol in symbols:
-                df_year_investments_query_asset_class = df_year_investments.loc[ df_year_investments.Type == asset_class ]
-                df_symbol_transactions = df_year_investments_query_asset_class.loc[ df_year_investments_query_asset_class.Symbol == symbol ]
-                
-                # Monthlyized quantities to end of month
-                df_month_invest = df_symbol_transactions.resample(rule='ME')['Qty'].sum().to_frame(name='Qty')
-                
-                temp_fill = df_month_fill.copy()
-                temp_fill.update(df_month_invest)
-                temp_fill['CumQty'] = temp_fill.values.cumsum()
-                holdings_monthlyized_per_symbol[symbol] = temp_fill
-            
-            holdings_monthlyized[asset_class] = holdings_monthlyized_per_symbol
-        
-        self.holdings_monthlyized = holdings_monthlyized
-        return holdings_monthlyized
+        qty = quantity_matrix(self.df_year_investments, complete_index, 'ME')
+        self.holdings = HoldingsArrays.from_quantities(qty)
+        return self.holdings
 
     # For each symbol of each asset class, load historical data
-    # with monthly resolution
-    def get_assets_monthlyized(self, holdings_monthlyized):
+    # with monthly resolution from the price store. Missing or outdated histories
+    # are downloaded concurrently through the fetch scheduler, one token bucket
+    # per provider, and appended to the store.
+    def get_assets_monthlyized(self, holdings):
         currency = 'EUR'
         years_watchback = 5
+        start_date = f"{self.YEAR-1}-12-31"
         end_date = define_end_date(self.YEAR)
-
-        assets_monthlyized = dict()
-        for asset_class in holdings_monthlyized.keys():
-            assets_per_class = dict()
-            for symbol in holdings_monthlyized[asset_class].keys():
-                maket_data_path = Path(f"{self.path}/{self.YEAR}/investments/exchange/{symbol}-{currency}.csv")
-
-                if not os.path.exists(maket_data_path):
-                    if asset_class == "Cryptocurrencies":
-                        asset_history = FinFetch.fetch_crypto_data(symbol, currency, years_watchback)
-                    elif asset_class == "ETFs":
-                        asset_history = FinFetch.fetch_etf_data(symbol, currency, years_watchback)
-                    time.sleep(random.uniform(5,7)) # sleep for preventing status resp 500 (ip addres based limitation)
-                    
-                    asset_history = asset_history.loc[f'{self.YEAR-1}-12-31':end_date]
-                    asset_history.to_csv(maket_data_path)
-                    Logger.info(f"Data saved in local to {maket_data_path}")
+        store = PriceStore(self.path)
+
+        # 1. Decide what has to be downloaded, keyed by (asset_class, symbol)
+        tasks = list()
+        for asset_class, symbol in holdings.columns:
+            key = f"{symbol}-{currency}"
+            legacy_path = Path(f"{self.path}/{self.YEAR}/investments/exchange/{key}.csv")
+            if not store.has(key) and legacy_path.exists():
+                store.import_legacy_csv(key, legacy_path)
+
+            first_date, last_date = store.date_range(key)
+            covered_from = store.covered_from(key)
+            if first_date is None or covered_from.strftime("%Y-%m-%d") > start_date:
+                tasks.append(self.history_task(asset_class, symbol, currency, years_watchback))
+            elif last_date.strftime("%Y-%m-%d") < end_date:
+                Logger.info(f"New data must be downloaded for {asset_class}/{symbol}")
+                years = max(1, datetime.now().year - last_date.year + 1)
+                tasks.append(self.history_task(asset_class, symbol, currency, years))
+            else:
+                Logger.info(f"{key} loaded from the price store, no need for update.")
+
+        # 2. Download
+        fetched_years = {task.key: task.args[-1] for task in tasks}
+        def on_done(key, done, total):
+            self.report_progress("prices", done, total, f"{key[0]}/{key[1]} history")
+        self.report_progress("prices", 0, len(tasks), None)
+        fetched, errors = build_scheduler().run(tasks, on_done=on_done)
+
+        # 3. Store the complete months, then read the rows of this year
+        last_complete_month = define_end_date(datetime.now().year)
+        closes = dict()
+        for asset_class, symbol in holdings.columns:
+            key = f"{symbol}-{currency}"
+            if (asset_class, symbol) in fetched:
+                history, daily = fetched[(asset_class, symbol)]
+                history = history.loc[:last_complete_month]
+                first_date, _ = store.date_range(key)
+                if first_date is not None and not history.empty and history.index[0] < first_date:
+                    store.merge(key, history) # older history than the stored one
                 else:
-                    asset_history = pd.read_csv(maket_data_path, index_col=0, parse_dates=True)
-                    last_date_str = asset_history.index[-1].strftime("%Y-%m-%d")
-                    if last_date_str < define_end_date(self.YEAR):
-                        Logger.info("New data must be downloaded")
-                        if asset_class == "Cryptocurrencies":
-                            update = FinFetch.fetch_crypto_data(symbol, currency, years_watchback=1)
-                        elif asset_class == "ETFs":
-                            update = FinFetch.fetch_etf_data(symbol, currency, years_watchback=1)
-                        time.sleep(random.uniform(5,7)) # sleep for preventing status resp 500 (ip addres based limitation)
-                        
-                        df_update_red = update.loc[last_date_str:define_end_date(self.YEAR)]
-                        # always exclude first row which is redundant for pd.concat
-                        df_update = df_update_red.loc[ df_update_red.index != df_update_red.index[0] ]
-                        
-                        # New updated asset_history
-                        asset_history = pd.concat([asset_history, df_update])
-                        asset_history.to_csv(maket_data_path)
-                        Logger.info(f"Updated asset data saved in local to {maket_data_path}")
-                    else:
-                        Logger.info(f"{maket_data_path} already exists. Data Loaded from local.")
-                        Logger.info(f"No need for update.")
-                
-                asset_history["Returns"] = (asset_history["Close"] - asset_history.shift(1)["Close"] )/ asset_history["Close"]
-                assets_per_class[symbol] = asset_history
-            assets_monthlyized[asset_class] = assets_per_class
-        
-        self.assets_monthlyized = assets_monthlyized
-        return assets_monthlyized
-
-    # JOIN ASSETS AND HOLDINGS TO GET PERSONAL HOLDINGS IN EUR
-    #          A  B             C  D                                             A  B  C  D
-    # month1   x  y     month1  u  v      pd.concat([df1, df2], axis=1)  month1  x  y  u  v  
-    # month2   x  y     month2  u  v                ------>              month2  x  y  u  v
-    def get_assets_global(self, assets_monthlyized, holdings_monthlyized):
-        assets : Dict[str, Dict[str, pd.DataFrame]] = {}
-        for asset_class in assets_monthlyized.keys():
-            assets_symb = dict()
-            for symbol in assets_monthlyized[asset_class].keys():
-                df_joined = pd.concat([assets_monthlyized[asset_class][symbol], holdings_monthlyized[asset_class][symbol]], axis=1)
-                df_joined["Holdings"] = df_joined["Close"]*df_joined["CumQty"]
-
-                assets_symb[symbol] = df_joined
-            assets[asset_class] = assets_symb
-        
-        return assets
+                    store.append(key, history)
+                if fetched_years[(asset_class, symbol)] == years_watchback:
+                    store.mark_covered_from(key, datetime.now() - relativedelta(years=years_watchback))
+                self.store_daily_closes(store, key, daily)
+                Logger.info(f"{asset_class}/{symbol} saved in the price store")
+
+            asset_history = store.read(key, start_date, end_date)
+            if asset_history.empty:
+                raise FetchError(f"No market data available for {asset_class}/{symbol}: {errors.get((asset_class, symbol))}")
+            if (asset_class, symbol) in errors:
+                Logger.warning(f"Using outdated stored data for {asset_class}/{symbol}")
+            closes[(asset_class, symbol)] = asset_history["Close"]
+
+        # Close prices as a (Date x (Type, Symbol)) matrix
+        return pd.concat(closes, axis=1).reindex(columns=holdings.columns)
+
+    # Daily closes returned by a fetcher along with the asked ones, the
+    # complete days go to the daily price store used by daily_nw.py
+    def store_daily_closes(self, store, key, daily):
+        if daily is None or daily.empty:
+            return
+        yesterday = pd.Timestamp.now().normalize() - pd.Timedelta(days=1)
+        store.append(key, daily.loc[:yesterday], resolution="1d")
+
+    # Closes of every known resolution for the daily valuation: month ends,
+    # daily closes and today quotes, joined as-of by daily_nw.py
+    def get_daily_prices(self, start, end, columns=None):
+        currency = 'EUR'
+        store = PriceStore(self.path)
+        prices = dict()
+        for asset_class, symbol in (self.holdings.columns if columns is None else columns):
+            key = f"{symbol}-{currency}"
+            observations = [store.read(key, start, end), store.read(key, start, end, resolution="1d")]
+            today = self.assets_current_day.get(asset_class, {}).get(symbol)
+            if today is not None:
+                observations.append(today[["Close"]].loc[:end])
+            prices[(asset_class, symbol)] = pd.concat(observations)["Close"] # later observations win on equal dates
+        return prices
+
+    def history_task(self, asset_class, symbol, currency, years_watchback):
+        if asset_class == "Cryptocurrencies":
+            fetch = FinFetch.fetch_crypto_data
+        elif asset_class == "ETFs":
+            fetch = FinFetch.fetch_etf_data
+        return FetchTask((asset_class, symbol), FinFetch.base_url(asset_class), fetch, symbol, currency, years_watchback)
+
+    # VALUE THE HOLDINGS IN EUR
+    # Close prices and cumulative quantities are aligned (date x symbol) arrays,
+    # the valuation is an elementwise multiply
+    #            SOL  ETH            SOL  ETH                  SOL    ETH
+    # month1     x    y     *        u    v       ->   month1  x*u    y*v
+    # month2     x    y              u    v            month2  x*u    y*v
+    def get_assets_global(self, close, holdings):
+        holdings.set_close(close)
+        return holdings
 
     # The final nice front end table
     # returns in symbols format: SOL, ETH, USDT, IE00BK5BQT80,...
     # and asset class format: Cryptocurrencies, ETFs, ...
+    # Used for the today holdings, the monthly ones are HoldingsArrays.totals
     def get_total_holdings(self, assets):
         dfl_class = list()
         column_names_class = list()
@@ -196,61 +223,74 @@ class FinInvestments:
         return df_year_holdings, df_year_holdings_class
 
     def run(self):
+        self.report_progress("holdings")
         df_init_investments = self.get_init_holdings_to_df()
-        self.df_year_investments = pd.concat([df_init_investments, self.df_year_investments])
-        holdings_monthlyized = self.get_holdings_monthlyized()
-        assets_monthlyized = self.get_assets_monthlyized(holdings_monthlyized)
-        assets = self.get_assets_global(assets_monthlyized, holdings_monthlyized)
-        self.df_year_holdings, self.df_year_holdings_class = self.get_total_holdings(assets)
+        self.df_year_investments = intern_columns(pd.concat([df_init_investments, self.df_year_investments]), "investments")
+        holdings = self.get_holdings_monthlyized()
+        close = self.get_assets_monthlyized(holdings)
+        self.report_progress("valuation")
+        self.get_assets_global(close, holdings)
+        self.df_year_holdings, self.df_year_holdings_class = holdings.totals()
         self.df_today_holdings, self.df_today_holdings_class = self.last_update_run()
         pass
 
     # ---------------- REAL TIME UPDATES ---------------------------
     def get_current_holdings(self):
-        df_year_investments = self.df_year_investments
-        holdings_monthlyized = self.holdings_monthlyized
         today_date_str, today_month_str, today = define_today_date()
-        #df_year_investments.loc[today_month_str]
 
-        complete_index = pd.date_range(start=today_month_str, end=today_date_str, freq='D') # End of month
-        df_month_fill = pd.DataFrame(index=complete_index, data=0.0, columns=["Qty"], dtype='float64')
-
-        current_holdings = dict()
-        asset_classes = df_year_investments["Type"].unique()
-        for asset_class in asset_classes:
-            holdings_daily_per_symbol = dict()
-            symbols = df_year_investments.loc[df_year_investments["Type"]==asset_class]["Symbol"].unique()
-            for symbol in symbols:
-                print(symbol)
-                df_year_investments_query_asset_class = df_year_investments.loc[ df_year_investments.Type == asset_class ]
-                df_symbol_transactions = df_year_investments_query_asset_class.loc[ df_year_investments_query_asset_class.Symbol == symbol ]
-                df_daily_invest = df_symbol_transactions.resample(rule='D')['Qty'].sum().to_frame(name='Qty')
+        complete_index = pd.date_range(start=today_month_str, end=today_date_str, freq='D')
+        qty = quantity_matrix(self.df_year_investments, complete_index, 'D').reindex(columns=self.holdings.columns)
 
-                prev_month_cumqty = float(holdings_monthlyized[asset_class][symbol].iloc[-1].CumQty)
-                temp_fill = df_month_fill.copy()
-                temp_fill.update(df_daily_invest)
-                temp_fill['CumQty'] = prev_month_cumqty + temp_fill.values.cumsum()
-                holdings_daily_per_symbol[symbol] = temp_fill
-
-            current_holdings[asset_class] = holdings_daily_per_symbol
-        return current_holdings
+        # Start from the quantities held at the end of the previous month
+        prev_month_cumqty = self.holdings.arrays["CumQty"][-1]
+        return per_symbol_views(qty, qty.cumsum() + prev_month_cumqty)
 
     def get_current_assets_price(self, current_holdings):
-        assets_monthlyized = self.assets_monthlyized
+        holdings = self.holdings
 
         currency = "EUR"
-        assets_current_day = dict()
-        cache_dir = f"{self.path}/cache"
+        quotes = get_quote_cache(f"{self.path}/cache")
+
+        # Fresh quotes come from the cache, stale ones are served and refreshed
+        # in background, only the missing ones go through the scheduler
+        prices = dict()
+        tasks = list()
+        refresh_scheduler = None # not the one of run below, which stops its fetches when done
         for asset_class in current_holdings.keys():
-            assets_per_class = dict()
             for symbol in current_holdings[asset_class].keys():
-                print(f"Getting {symbol} today {currency} price...")
                 if asset_class == "Cryptocurrencies":
-                    asset_today = FinFetch.fetch_crypto_data_today(cache_dir, symbol, currency)
+                    fetch = FinFetch.fetch_crypto_data_today
                 elif asset_class == "ETFs":
-                    asset_today = FinFetch.fetch_etf_data_today(cache_dir, symbol, currency)
-                
-                prev_month_close = float(assets_monthlyized[asset_class][symbol].iloc[-1].Close)
+                    fetch = FinFetch.fetch_etf_data_today
+                asset_today, state = quotes.lookup(asset_class, symbol, currency)
+                task = FetchTask((asset_class, symbol), FinFetch.base_url(asset_class), fetch, symbol, currency)
+                if state == MISSING:
+                    tasks.append(task)
+                    continue
+                if state == STALE:
+                    refresh_scheduler = refresh_scheduler or build_scheduler()
+                    quotes.revalidate(symbol, currency, refresh_scheduler, task)
+                prices[(asset_class, symbol)] = asset_today
+
+        def on_done(key, done, total):
+            self.report_progress("valuation", done, total, f"{key[0]}/{key[1]} today price")
+        self.report_progress("valuation", 0, len(tasks), None)
+        fetched, errors = build_scheduler().run(tasks, on_done=on_done)
+        store = PriceStore(self.path)
+        for (asset_class, symbol), (asset_today, daily) in fetched.items():
+            quotes.put(symbol, currency, asset_today)
+            self.store_daily_closes(store, f"{symbol}-{currency}", daily)
+            prices[(asset_class, symbol)] = asset_today
+
+        assets_current_day = dict()
+        for asset_class in current_holdings.keys():
+            assets_per_class = dict()
+            for symbol in current_holdings[asset_class].keys():
+                key = (asset_class, symbol)
+                if key in errors:
+                    raise FetchError(f"No current price available for {asset_class}/{symbol}: {errors[key]}")
+                asset_today = prices[key]
+                prev_month_close = float(holdings.arrays["Close"][-1, holdings.symbol_index[key]])
                 asset_today["Returns"] = (asset_today["Close"] - prev_month_close )/ asset_today["Close"]
                 assets_per_class[symbol] = asset_today
             assets_current_day[asset_class] = assets_per_class
@@ -274,6 +314,7 @@ class FinInvestments:
     def last_update_run(self):
         current_holdings = self.get_current_holdings()
         assets_current_day = self.get_current_assets_price(current_holdings)
+        self.assets_current_day = assets_current_day
         assets_global_current_day = self.get_current_assets_holdings(assets_current_day, current_holdings)
         df_today_holdings, df_today_holdings_class = self.get_total_holdings(assets_global_current_day)
 
@@ -296,4 +337,46 @@ class FinInvestments:
         Logger.debug("\n assets_global_current_day:\n%s", assets_global_current_day)
         Logger.debug("\n df_today_holdings:\n%s", df_today_holdings.to_string())
 
-        return df_today_holdings, df_today_holdings_class
\ No newline at end of file
+        return df_today_holdings, df_today_holdings_class
+
+    # ---------------- INCREMENTAL UPDATES ---------------------------
+    # Applied after writes on the month files. Quantities change, prices do not,
+    # so holdings are updated as delta_qty * Close on the rows from the affected
+    # month onwards. Returns False when a row needs market data which is not loaded
+    # yet (a new symbol), in that case a new initialize is required.
+    def add_rows(self, df_rows):
+        self.df_year_investments = insert_rows(self.df_year_investments, df_rows, "investments")
+        applied = True
+        for date, row in df_rows.iterrows():
+            applied = self.apply_qty_delta(row["Type"], row["Symbol"], date, float(row["Qty"])) and applied
+        return applied
+
+    def remove_row(self, row):
+        position = find_row(self.df_year_investments, row, "investments")
+        if position is None:
+            Logger.warning(f"Deleted row not found in memory: {row}")
+            return False
+        date = self.df_year_investments.index[position]
+        removed = self.df_year_investments.iloc[position]
+        self.df_year_investments = drop_row_at(self.df_year_investments, position)
+        return self.apply_qty_delta(removed["Type"], removed["Symbol"], date, -float(removed["Qty"]))
+
+    def apply_qty_delta(self, asset_class, symbol, date, qty):
+        j = self.holdings.symbol_index.get((asset_class, symbol))
+        if j is None:
+            Logger.info(f"{asset_class}/{symbol} has no market data loaded, initialize again to value it")
+            return False
+
+        # Month end rows, from the month of the transaction onwards
+        month_end = date + pd.offsets.MonthEnd(0)
+        row = self.holdings.dates.searchsorted(month_end)
+        if row < len(self.holdings.dates) and self.holdings.dates[row] == month_end:
+            self.holdings.apply_qty_delta(j, row, qty)
+            self.df_year_holdings, self.df_year_holdings_class = self.holdings.totals()
+
+        # Today holdings carry the cumulative quantity, every delta reaches them
+        today_close = float(self.assets_current_day[asset_class][symbol]["Close"].iloc[-1])
+        for df_today, column in [(self.df_today_holdings, symbol), (self.df_today_holdings_class, asset_class)]:
+            df_today.iloc[-1, df_today.columns.get_loc(column)] += qty * today_close
+            df_today.iloc[-1, df_today.columns.get_loc("Total")] += qty * today_close
+        return True
@@ -1,45 +1,162 @@
+import functools
+from contextlib import nullcontext
+from pathlib import Path
 import pandas as pd
 from .fin_cashflow import FinCashflow
 from .fin_investments import FinInvestments
+from .common import load_config, rows_to_frame, DEFAULT_LOAD_WORKERS
+from .logger import Logger
+from .init_job import InitJobManager
+from .daily_nw import daily_networth, slice_asof
+from .ledger import Ledger
+from .query_engine import Query, parse_query, run_query
+from .session_cache import Session, SessionCache, session_key, parse_session_key, DEFAULT_MAX_SESSIONS, DEFAULT_MAX_SESSION_MEMORY_MB
+from .errors import SessionError
+
+def session_attribute(name):
+    """Attribute stored in the session the wrapper is bound to"""
+    def getter(self):
+        session = self.session
+        return getattr(session, name) if session is not None else None
+    def setter(self, value):
+        setattr(self.session, name, value)
+    return property(getter, setter)
+
+def memoized_view(method):
+    """Keep the result of method in the session until the dataset version changes, see session_cache.py"""
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        session = self.session
+        if session is None:
+            raise SessionError("No session initialized")
+        with session.lock.read():
+            return session.memo((method.__name__,) + args, lambda: method(self, *args))
+    return wrapper
 
 # Class to manage the budgetbash backend
+# The computed state of every initialized (data_path, year) lives in a Session
+# of self.sessions, see session_cache.py. The wrapper reads the active session,
+# view(key) returns a wrapper bound to another one.
 class FlaskWrapper:
-    def __init__(self):
-        self.finCashflow : FinCashflow = None
-        self.finInvestments : FinInvestments = None
+    finCashflow : FinCashflow = session_attribute("finCashflow")
+    finInvestments : FinInvestments = session_attribute("finInvestments")
+    nw_global : pd.DataFrame = session_attribute("nw_global")
+    nw_daily : pd.DataFrame = session_attribute("nw_daily") # liquidity, investments, networth per business day, see daily_nw.py
+    daily_prices : dict = session_attribute("daily_prices") # (asset_class, symbol) -> closes valued by nw_daily
+    data_path : Path = session_attribute("data_path")
+    ledger : Ledger = session_attribute("ledger") # every year of data_path, see ledger.py
+
+    def __init__(self, sessions : SessionCache = None, session : Session = None):
+        if sessions is None:
+            config = load_config() or {}
+            sessions = SessionCache(
+                config.get("app", {}).get("max_sessions", DEFAULT_MAX_SESSIONS),
+                config.get("app", {}).get("max_session_memory_mb", DEFAULT_MAX_SESSION_MEMORY_MB),
+            )
+        self.sessions = sessions
+        self.bound : Session = session # None follows the active session
+        self.init_jobs = InitJobManager(self.initialize)
+
+    @property
+    def session(self):
+        return self.bound if self.bound is not None else self.sessions.get()
+
+    def view(self, key : str = None):
+        """Wrapper bound to the session key ('YEAR', 'data_path:YEAR'), the active session when key is None"""
+        if not key:
+            return FlaskWrapper(self.sessions, self.sessions.get())
+        active = self.sessions.get()
+        key = parse_session_key(key, active.data_path if active is not None else None)
+        session = self.sessions.get(key)
+        if session is None:
+            raise SessionError(f"Session {key} is not initialized")
+        return FlaskWrapper(self.sessions, session)
+
+    def get_sessions(self):
+        return self.sessions.get_stats()
+
+    def reading(self):
+        """Read lock of the session, held by routes whose views must come from the same version"""
+        session = self.session
+        return session.lock.read() if session is not None else nullcontext()
+
+    def initialize(self, year, data_path, progress=None, reload=False):
+        """Load (data_path, year) in a new session, a cached session is only activated unless reload"""
+        report = progress if progress is not None else (lambda *args, **kwargs: None)
+        if progress is None:
+            self.init_jobs.supersede() # a running job must not switch back once it finishes
+        key = session_key(data_path, year)
+        if not reload and self.sessions.get(key) is not None:
+            if self.init_jobs.finish(report, lambda: self.sessions.activate(key)) is not None:
+                Logger.info(f"Switched to the session of {year} in {data_path}")
+                return
+
+        config = load_config() or {}
+        workers = config.get("app", {}).get("load_workers", DEFAULT_LOAD_WORKERS)
+
+        # Build the new session aside and swap it in at the end, a failed or
+        # cancelled initialization leaves the current dataset untouched
+        report("loading")
+        session = Session(year, data_path)
+        session.finCashflow = FinCashflow(data_path, year, workers)
+        session.finInvestments = FinInvestments(data_path, year, workers)
+        session.finInvestments.progress = progress
+
+        report("cashflow")
+        session.finCashflow.run()
+        session.finInvestments.run()
+
+        # The loaded year is already parsed, the ledger parses the other ones on demand
+        session.ledger = Ledger(data_path, workers)
+        session.ledger.seed("cashflow", year, session.finCashflow.df_year_cashflow)
+        session.ledger.on_load = lambda: self.sessions.remeasure(session)
+
+        FlaskWrapper(self.sessions, session).calc_daily_nw()
+        # a job cancelled or superseded during the last stage stops here
+        self.init_jobs.finish(report, lambda: self.sessions.put(session))
+
+    # Runs initialize on a background thread, see init_job.py
+    def start_initialize(self, year, data_path, reload=False):
+        return self.init_jobs.start(year, data_path, reload)
 
-        self.nw_global : pd.DataFrame = None
+    def get_init_job(self, job_id=None):
+        return self.init_jobs.get(job_id)
 
-    def initialize(self, year, data_path):
-        self.finCashflow = FinCashflow(data_path, year)
-        self.finInvestments = FinInvestments(data_path, year)
-        
-        self.finCashflow.run()
-        self.finInvestments.run()
-        pass
+    def cancel_init_job(self, job_id=None):
+        return self.init_jobs.cancel(job_id)
 
+    @memoized_view
     def get_cashflow_info(self):
         df = self.finCashflow.df_m_cashflow
         df_m_cashflow = df.iloc[1:] # Exclude the first row which has '-' in some columns
 
-        df_expenses_year = self.finCashflow.calc_expenses()
-        df_expenses_year_by_category = df_expenses_year.groupby('Category')['Qty'].sum().reset_index(name='Expenses')
-        df_expenses_year_by_category = df_expenses_year_by_category.sort_values('Expenses', ascending=False)
+        df_expenses_year_by_category = self.aggregate("expenses", ("Category",))[["Category", "expenses"]].rename(columns={"expenses": "Expenses"})
         df_expenses_year_by_category['Percentage'] = ((df_expenses_year_by_category['Expenses'] / df_expenses_year_by_category['Expenses'].sum()) * 100).round(2)
 
-        df_incomes_year = self.finCashflow.calc_incomes()
-        df_incomes_year_by_category = df_incomes_year.groupby('Category')['Qty'].sum().reset_index(name="Incomes")
-        df_incomes_year_by_category = df_incomes_year_by_category.sort_values('Incomes', ascending=False)
+        df_incomes_year_by_category = self.aggregate("incomes", ("Category",))[["Category", "incomes"]].rename(columns={"incomes": "Incomes"})
         df_incomes_year_by_category['Percentage'] = ((df_incomes_year_by_category['Incomes'] / df_incomes_year_by_category['Incomes'].sum()) * 100).round(2)
 
         return df_m_cashflow, df_expenses_year_by_category, df_incomes_year_by_category
 
+    # Sums and counts from the cashflow cube, see cashflow_cube.py
+    # filters is a tuple of (dimension, value) pairs so that the view can be memoized
+    @memoized_view
+    def aggregate(self, measure, by=(), month=None, filters=()):
+        return self.finCashflow.cube.aggregate(measure, list(by), month, dict(filters))
+
     def get_investments_info(self):
         df_year_holdings_class = self.finInvestments.df_year_holdings_class
         df_today_holdings_class = self.finInvestments.df_today_holdings_class
 
         return df_year_holdings_class, df_today_holdings_class
 
+    def get_load_errors(self):
+        return {
+            "cashflow": self.finCashflow.load_errors,
+            "investments": self.finInvestments.load_errors
+        }
+
+    @memoized_view
     def calc_global_nw(self):
         # Retrieve data from classes
         row_today_cashflow = self.finCashflow.df_last_month_cashflow
@@ -60,12 +177,130 @@ class FlaskWrapper:
         self.nw_global = nw_global
         return nw_global
 
+    # since: first day changed by a write, the days before it and the price
+    # series read at initialize are kept
+    def calc_daily_nw(self, since=None):
+        year = self.finCashflow.YEAR
+        today = pd.Timestamp.now().normalize()
+        end = today if year >= today.year else pd.Timestamp(f"{year}-12-31")
+        start = pd.Timestamp(f"{year-1}-12-31")
+
+        if since is None or self.daily_prices is None or self.nw_daily is None:
+            self.daily_prices = self.finInvestments.get_daily_prices(start, end)
+            since = None
+        else:
+            missing = [pair for pair in self.finInvestments.holdings.columns if pair not in self.daily_prices]
+            if missing: # symbol first bought by the write
+                self.daily_prices = dict(self.daily_prices, **self.finInvestments.get_daily_prices(start, end, missing))
+        self.nw_daily = daily_networth(
+            self.finCashflow.df_year_cashflow, self.finCashflow.init_holdings['liquidity_eur'],
+            self.finInvestments.df_year_investments, self.daily_prices, start, end,
+            previous=self.nw_daily, since=since
+        )
+        return self.nw_daily
+
     # Today Networth status
+    @memoized_view
     def get_nw_status(self):
         last_row = self.nw_global.iloc[-1]
         last_row = last_row.astype('float64')
         return last_row.round(2)
+
+    # Networth status at any date of the loaded year, changes are against the
+    # end of the previous month like the today status
+    @memoized_view
+    def get_nw_status_at(self, date):
+        row = slice_asof(self.nw_daily, date)
+        if row is None:
+            return None
+        prev_month_end = pd.Timestamp(date).normalize().replace(day=1) - pd.Timedelta(days=1)
+        prev_row = slice_asof(self.nw_daily, prev_month_end)
+        status = row.astype('float64').copy()
+        if prev_row is None:
+            status["nwch"], status["ch%"] = 0.0, 0.0
+        else:
+            status["nwch"] = status.networth - prev_row.networth
+            status["ch%"] = status.nwch / status.networth
+        return status.round(2)
+
+    # Monthly cashflow over any range of years, from the ledger
+    @memoized_view
+    def get_monthly_cashflow(self, start, end):
+        return self.ledger.monthly_cashflow(start, end)
+
+    # Generic query over the ledger rows, see query_engine.py
+    # Without start and end it covers the loaded year
+    def query(self, args):
+        query = parse_query(args, f"{self.finCashflow.YEAR}-01-01", f"{self.finCashflow.YEAR}-12-31")
+        return self.run_query(query)
+
+    @memoized_view
+    def run_query(self, query : Query):
+        return run_query(self.ledger.frame(query.data_type, query.start, query.end), query)
+
+    @memoized_view
+    def get_all_balances_at(self, date):
+        return self.finCashflow.get_all_balances(date)
     
+    @memoized_view
     def get_all_balances(self):
         all_balances = self.finCashflow.get_all_balances()
-        return all_balances
\ No newline at end of file
+        return all_balances
+
+    # ---------------- INCREMENTAL UPDATES AFTER WRITES ---------------------------
+    def is_loaded(self, year, data_path):
+        return self.sessions.get(session_key(data_path, year)) is not None
+
+    # A write can change the views of every session of the data path (multi-year ones)
+    def invalidate_ledgers(self, data_type, year, data_path):
+        for session in self.sessions.of_path(data_path):
+            session.ledger.invalidate(data_type, year)
+            session.bump()
+
+    # Writes are applied to the cached session of the written year, whether it
+    # is active or not. Both return False when the in-memory state could not
+    # follow the write and a new initialize is needed
+    def apply_added_rows(self, data_type, year, data_path, rows):
+        self.invalidate_ledgers(data_type, year, data_path)
+        session = self.sessions.get(session_key(data_path, year))
+        if session is None:
+            return True # the written year is not loaded, nothing went stale
+        view = FlaskWrapper(self.sessions, session)
+        try:
+            with session.lock.write(): # readers wait until the session is consistent again
+                df_rows = rows_to_frame(rows, data_type)
+                if data_type == "cashflow":
+                    applied = view.finCashflow.add_rows(df_rows)
+                    view.ledger.seed("cashflow", year, view.finCashflow.df_year_cashflow)
+                else:
+                    applied = view.finInvestments.add_rows(df_rows)
+                session.bump() # views computed while the rows were applied are stale too
+                view.calc_global_nw()
+                view.calc_daily_nw(since=df_rows.index.min())
+            self.sessions.remeasure(session)
+            return applied
+        except Exception as e:
+            Logger.warning(f"Could not apply added rows in memory: {e}")
+            return False
+
+    def apply_deleted_row(self, data_type, year, data_path, row):
+        self.invalidate_ledgers(data_type, year, data_path)
+        session = self.sessions.get(session_key(data_path, year))
+        if session is None:
+            return True
+        view = FlaskWrapper(self.sessions, session)
+        try:
+            with session.lock.write():
+                if data_type == "cashflow":
+                    applied = view.finCashflow.remove_row(row)
+                    view.ledger.seed("cashflow", year, view.finCashflow.df_year_cashflow)
+                else:
+                    applied = view.finInvestments.remove_row(row)
+                session.bump() # views computed while the rows were applied are stale too
+                view.calc_global_nw()
+                view.calc_daily_nw(since=pd.Timestamp(str(row['Date']).strip()))
+            self.sessions.remeasure(session)
+            return applied
+        except Exception as e:
+            Logger.warning(f"Could not apply deleted row in memory: {e}")
+            return False
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+# Vectorized holdings.
+# Quantities of all the symbols are computed with one groupby over the
+# transactions, as a dense (date x (Type, Symbol)) matrix, instead of
+# filtering and resampling the transactions once per symbol.
+#
+#                 Cryptocurrencies       ETFs
+#                 SOL    ETH   ...       IE00BK5BQT80  ...
+#   2024-12-31    10.0   1.5             20.0
+#   2025-01-31     0.0   0.0              2.0
+#   ...
+
+def symbol_pairs(df_investments : pd.DataFrame):
+    """(Type, Symbol) pairs grouped by asset class, both in order of appearance"""
+    pairs = df_investments[["Type", "Symbol"]].astype(str).drop_duplicates()
+    class_order = {asset_class: i for i, asset_class in enumerate(pairs["Type"].unique())}
+    pairs = pairs.assign(_rank=pairs["Type"].map(class_order)).sort_values("_rank", kind="stable")
+    return pd.MultiIndex.from_frame(pairs[["Type", "Symbol"]])
+
+def quantity_matrix(df_investments : pd.DataFrame, complete_index : pd.DatetimeIndex, rule : str = 'ME'):
+    """
+    Quantities traded per period and symbol.
+
+    Args:
+        df_investments: transactions indexed by Date with Type, Symbol and Qty columns
+        complete_index: rows of the matrix, month ends ('ME') or days ('D')
+        rule: 'ME' sums the transactions to the end of their month, 'D' to their day
+    Returns:
+        DataFrame indexed by complete_index with (Type, Symbol) columns, zero filled.
+        Transactions out of complete_index are ignored.
+    """
+    columns = symbol_pairs(df_investments)
+    periods = df_investments.index.normalize()
+    if rule == 'ME':
+        periods = periods + pd.offsets.MonthEnd(0)
+    keys = [periods, df_investments["Type"].astype(str), df_investments["Symbol"].astype(str)]
+    qty = df_investments["Qty"].astype('float64').groupby(keys).sum().unstack([1, 2])
+    return qty.reindex(index=complete_index, columns=columns).fillna(0.0)
+
+def per_symbol_views(qty : pd.DataFrame, cumqty : pd.DataFrame):
+    """Split the matrices in the {asset_class: {symbol: DataFrame[Qty, CumQty]}} layout"""
+    views = dict()
+    for asset_class, symbol in qty.columns:
+        views.setdefault(asset_class, dict())[symbol] = pd.DataFrame(
+            {"Qty": qty[(asset_class, symbol)].to_numpy(), "CumQty": cumqty[(asset_class, symbol)].to_numpy()},
+            index=qty.index,
+        )
+    return views
+
+# Aligned (date x symbol) arrays of quantities, prices and valuations.
+# Column j of every array is the symbol columns[j], rows are dates. The arrays
+# are the storage, DataFrames handed to pandas callers are views on them.
+class HoldingsArrays:
+    FIELDS = ("Close", "Qty", "CumQty", "Holdings")
+
+    def __init__(self, dates : pd.DatetimeIndex, columns : pd.MultiIndex, qty : np.ndarray, close : np.ndarray = None):
+        self.dates = dates
+        self.columns = columns
+        self.symbol_index = {pair: j for j, pair in enumerate(columns)}
+        self.class_index = dict() # asset_class -> column positions, in order of appearance
+        for j, (asset_class, _) in enumerate(columns):
+            self.class_index.setdefault(asset_class, list()).append(j)
+        self.class_index = {asset_class: np.array(positions) for asset_class, positions in self.class_index.items()}
+
+        self.arrays = dict()
+        self.arrays["Qty"] = np.ascontiguousarray(qty, dtype="float64")
+        self.arrays["CumQty"] = self.arrays["Qty"].cumsum(axis=0)
+        self.arrays["Close"] = np.full(self.arrays["Qty"].shape, np.nan) if close is None else np.ascontiguousarray(close, dtype="float64")
+        self.arrays["Holdings"] = self.arrays["Close"] * self.arrays["CumQty"]
+
+    @classmethod
+    def from_quantities(cls, qty : pd.DataFrame):
+        """Build from a quantity_matrix, prices still unknown (NaN)"""
+        return cls(qty.index, qty.columns, qty.to_numpy())
+
+    def set_close(self, close : pd.DataFrame):
+        """Align close prices (Date index, (Type, Symbol) columns) on the arrays and value the holdings"""
+        close = close.reindex(index=self.dates, columns=self.columns)
+        self.arrays["Close"][:] = close.to_numpy(dtype="float64")
+        np.multiply(self.arrays["Close"], self.arrays["CumQty"], out=self.arrays["Holdings"])
+
+    def apply_qty_delta(self, j : int, row : int, qty : float):
+        """Add qty to symbol j at date row, cumulative quantities and valuations follow"""
+        self.arrays["Qty"][row, j] += qty
+        self.arrays["CumQty"][row:, j] += qty
+        self.arrays["Holdings"][row:, j] = self.arrays["Close"][row:, j] * self.arrays["CumQty"][row:, j]
+
+    def frame(self, field : str):
+        """Zero-copy (Date x (Type, Symbol)) DataFrame view of one of the arrays"""
+        return pd.DataFrame(self.arrays[field], index=self.dates, columns=self.columns, copy=False)
+
+    def symbol_frame(self, asset_class : str, symbol : str):
+        """Close, Qty, CumQty and Holdings of one symbol"""
+        j = self.symbol_index[(asset_class, symbol)]
+        return pd.DataFrame({field: self.arrays[field][:, j] for field in self.FIELDS}, index=self.dates)
+
+    def returns(self):
+        close = self.arrays["Close"]
+        returns = np.full(close.shape, np.nan)
+        returns[1:] = (close[1:] - close[:-1]) / close[1:]
+        return pd.DataFrame(returns, index=self.dates, columns=self.columns, copy=False)
+
+    def totals(self):
+        """
+        Holdings per symbol and per asset class, each with a 'Total' column.
+        A class total is NaN at the dates where one of its symbols has no price.
+        """
+        holdings = self.arrays["Holdings"]
+        symbols = self.columns.get_level_values(1).rename(None)
+        df_holdings = pd.DataFrame(holdings.copy(), index=self.dates, columns=symbols)
+        df_holdings['Total'] = np.nansum(holdings, axis=1)
+
+        by_class = {asset_class: holdings[:, positions].sum(axis=1) for asset_class, positions in self.class_index.items()}
+        df_holdings_class = pd.DataFrame(by_class, index=self.dates)
+        df_holdings_class['Total'] = np.nansum(df_holdings_class.to_numpy(), axis=1)
+        return df_holdings, df_holdings_class
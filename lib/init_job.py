@@ -0,0 +1,142 @@
+import threading
+import uuid
+from datetime import datetime
+
+from .logger import Logger
+from .errors import InitCancelled
+
+# Background initialization of the backend.
+# A job runs FlaskWrapper.initialize on its own thread and records the stage it
+# is in, so that the frontend can poll /initialize/status instead of waiting on
+# a request which can last minutes while market data is fetched.
+
+STAGES = ["pending", "loading", "cashflow", "holdings", "prices", "valuation", "done"]
+MAX_KEPT_JOBS = 10
+
+class InitJob:
+    def __init__(self, year, data_path, reload=False, manager=None):
+        self.job_id : str = uuid.uuid4().hex[:8]
+        self.year : int = year
+        self.data_path : str = data_path
+        self.reload : bool = reload # load again even if the session is cached
+        self.status : str = "pending" # pending, running, done, error, cancelled
+        self.stage : str = "pending"
+        self.done : int = None
+        self.total : int = None
+        self.message : str = ""
+        self.error : str = None
+        self.started_at : datetime = None
+        self.finished_at : datetime = None
+        self.cancel_event = threading.Event()
+        self.thread : threading.Thread = None
+        self.manager : "InitJobManager" = manager
+
+    def superseded(self):
+        return self.manager is not None and self.manager.latest_id != self.job_id
+
+    # Progress callback handed down to FlaskWrapper and FinInvestments.
+    # Raising here is how a cancellation reaches the initializing thread.
+    def report(self, stage, done=None, total=None, message=None):
+        if self.cancel_event.is_set() or self.superseded():
+            raise InitCancelled(f"Initialization {self.job_id} cancelled")
+        self.stage = stage
+        self.done = done
+        self.total = total
+        if message is not None:
+            self.message = message
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def is_active(self):
+        return self.status in ["pending", "running"]
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "year": self.year,
+            "data_path": str(self.data_path),
+            "status": self.status,
+            "stage": self.stage,
+            "stage_index": STAGES.index(self.stage),
+            "stage_count": len(STAGES) - 1,
+            "done": self.done,
+            "total": self.total,
+            "message": self.message,
+            "error": self.error,
+            "started_at": self.started_at.isoformat(timespec="seconds") if self.started_at else None,
+            "finished_at": self.finished_at.isoformat(timespec="seconds") if self.finished_at else None,
+        }
+
+class InitJobManager:
+    def __init__(self, initialize):
+        self.initialize = initialize # callable(year, data_path, progress, reload)
+        self.jobs = dict()
+        self.latest_id : str = None
+        self.lock = threading.Lock()
+
+    def start(self, year, data_path, reload=False):
+        """Start a background initialization, an active job for the same dataset is returned as is"""
+        with self.lock:
+            latest = self.jobs.get(self.latest_id)
+            if latest is not None and latest.is_active():
+                if latest.year == year and str(latest.data_path) == str(data_path):
+                    return latest
+                latest.cancel() # a newer request supersedes it
+
+            job = InitJob(year, data_path, reload, self)
+            self.jobs[job.job_id] = job
+            self.latest_id = job.job_id
+            while len(self.jobs) > MAX_KEPT_JOBS:
+                del self.jobs[next(iter(self.jobs))]
+
+            job.thread = threading.Thread(target=self._run, args=(job,), name=f"init-{job.job_id}", daemon=True)
+            job.thread.start()
+            return job
+
+    def _run(self, job):
+        job.status = "running"
+        job.started_at = datetime.now()
+        try:
+            self.initialize(job.year, job.data_path, job.report, job.reload)
+            job.stage = "done"
+            job.done = job.total
+            job.status = "done"
+            job.message = f"Succesfully initialized {job.year} data from path {job.data_path}."
+        except InitCancelled as e:
+            job.status = "cancelled"
+            job.message = str(e)
+        except Exception as e:
+            Logger.error(f"Initialization {job.job_id} failed: {e}")
+            job.status = "error"
+            job.error = str(e)
+        job.finished_at = datetime.now()
+
+    def supersede(self):
+        """Cancel the active job, called by a synchronous initialization"""
+        with self.lock:
+            latest = self.jobs.get(self.latest_id)
+            if latest is not None and latest.is_active():
+                latest.cancel()
+
+    def finish(self, progress, activate):
+        """
+        Run activate, which makes the initialized session the active one, unless the
+        job reporting to progress was cancelled or superseded meanwhile. Under the
+        lock of start, so a newer job cannot slip in between the check and activate.
+        """
+        with self.lock:
+            progress("done")
+            return activate()
+
+    def get(self, job_id=None):
+        """Job by id, the most recent one when job_id is None"""
+        if job_id is None:
+            job_id = self.latest_id
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id=None):
+        job = self.get(job_id)
+        if job is not None and job.is_active():
+            job.cancel()
+        return job
@@ -0,0 +1,175 @@
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .logger import Logger
+from .common import load_data_report, load_init_holdings, log_load_errors, rows_to_frame, concat_interned, saving_rate, DEFAULT_LOAD_WORKERS
+from .errors import LoadDataError, PathError
+
+# Multi-year view of a data folder.
+# Year directories ({path}/2024, {path}/2025, ...) are discovered up front but a
+# year partition (its cashflow or investments DataFrame) is parsed only the
+# first time a query touches it. Opening balances of a year come from its
+# {YEAR}_init.json when present, otherwise they are chained from the latest
+# earlier year: its opening balances plus its transactions, carried unchanged
+# through the years in between which have no folder (no transactions).
+
+YEAR_DIR = re.compile(r"^\d{4}$")
+
+def discover_years(path):
+    return sorted(int(p.name) for p in Path(path).iterdir() if p.is_dir() and YEAR_DIR.match(p.name))
+
+def empty_partition(typedata):
+    return rows_to_frame([], typedata)
+
+class Ledger:
+    def __init__(self, path, workers : int = DEFAULT_LOAD_WORKERS):
+        path_o = Path(path)
+        if not path_o.exists():
+            raise PathError(f"Entered path {path_o} does not exist! Cannot load files.")
+        self.path = path_o
+        self.workers = workers
+        self.years = discover_years(path_o)
+        self.partitions = dict() # (typedata, year) -> DataFrame
+        self.load_errors = dict() # (typedata, year) -> list of per-file errors
+        self.openings = dict() # year -> (liquidity_eur, assets)
+        self.init_years = set() # years whose opening comes from {YEAR}_init.json
+        self.on_load = None # called after a partition was parsed, e.g. to measure the session again
+        self.lock = threading.RLock()
+
+    # ---------------- PARTITIONS ---------------------------
+    def partition(self, typedata : str, year : int):
+        """Transactions of one year, parsed on first access"""
+        key = (typedata, year)
+        with self.lock:
+            if key in self.partitions:
+                return self.partitions[key]
+            try:
+                df, errors = load_data_report(typedata, self.path, year, workers=self.workers)
+            except LoadDataError as e:
+                df, errors = empty_partition(typedata), e.errors
+            log_load_errors(errors)
+            self.partitions[key] = df
+            self.load_errors[key] = errors
+        if self.on_load is not None:
+            self.on_load()
+        return df
+
+    def seed(self, typedata : str, year : int, df : pd.DataFrame):
+        """Reuse a year already loaded elsewhere (FinCashflow) instead of parsing it again"""
+        with self.lock:
+            self.partitions[(typedata, year)] = df
+            self.openings = {y: opening for y, opening in self.openings.items() if y <= year}
+
+    def invalidate(self, typedata : str, year : int):
+        """Drop a partition after its files were written, the next access parses it again"""
+        with self.lock:
+            self.partitions.pop((typedata, year), None)
+            if year not in self.years and (self.path / str(year)).is_dir(): # first write of a new year
+                self.years = sorted(self.years + [year])
+            self.openings = {y: opening for y, opening in self.openings.items() if y <= year}
+
+    def loaded_years(self, typedata : str):
+        with self.lock:
+            return sorted(year for t, year in self.partitions if t == typedata)
+
+    def frame(self, typedata : str, start=None, end=None):
+        """Transactions between start and end (both included), parsing only the years in between"""
+        start = pd.Timestamp(start) if start is not None else pd.Timestamp(f"{self.years[0]}-01-01")
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp(f"{self.years[-1]}-12-31")
+        dfl = list()
+        for year in self.years:
+            if start.year <= year <= end.year:
+                df = self.partition(typedata, year)
+                dfl.append(df.loc[(df.index >= start) & (df.index < end.normalize() + pd.Timedelta(days=1))])
+        if not dfl:
+            return empty_partition(typedata)
+        return concat_interned(dfl, typedata)
+
+    # ---------------- OPENING BALANCES ---------------------------
+    def opening(self, year : int):
+        """(liquidity_eur, assets) at the start of year"""
+        with self.lock:
+            if year in self.openings:
+                return self.openings[year]
+            init = load_init_holdings(self.path, year)
+            if init is not None:
+                opening = (dict(init.get("liquidity_eur", {})), {k: dict(v) for k, v in init.get("assets", {}).items()})
+                self.init_years.add(year)
+            elif any(y < year for y in self.years):
+                opening = self.chain(max(y for y in self.years if y < year))
+            else:
+                Logger.warning(f"No opening balances for {year}, starting from zero")
+                opening = (dict(), dict())
+            self.openings[year] = opening
+            return opening
+
+    def chain(self, year : int):
+        """Opening balances of the years after year up to the next discovered one: the ones of year plus its transactions"""
+        liquidity, assets = self.opening(year)
+        liquidity = dict(liquidity)
+        assets = {asset_class: dict(symbols) for asset_class, symbols in assets.items()}
+
+        df_cashflow = self.partition("cashflow", year)
+        sums = df_cashflow.groupby(df_cashflow["Type"].astype(str))["Qty"].sum()
+        for account, qty in sums.items():
+            liquidity[account] = round(liquidity.get(account, 0.0) + float(qty), 2)
+
+        df_investments = self.partition("investments", year)
+        sums = df_investments.groupby([df_investments["Type"].astype(str), df_investments["Symbol"].astype(str)])["Qty"].sum()
+        for (asset_class, symbol), qty in sums.items():
+            symbols = assets.setdefault(asset_class, dict())
+            symbols[symbol] = round(symbols.get(symbol, 0.0) + float(qty), 10)
+        return liquidity, assets
+
+    def opening_balances(self, year : int):
+        return self.opening(year)[0]
+
+    def opening_holdings(self, year : int):
+        return self.opening(year)[1]
+
+    # ---------------- RANGE QUERIES ---------------------------
+    def monthly_cashflow(self, start, end):
+        """
+        Monthly incomes, liabilities, savings, saving_rate, investments and liquidity
+        between the months of start and end, like FinCashflow.calc_monthly_cashflow
+        but over any range of years. Liquidity starts from the opening balances of
+        the first year and restarts from the init file of the years that have one.
+        """
+        start = pd.Timestamp(start) + pd.offsets.MonthEnd(0)
+        end = pd.Timestamp(end) + pd.offsets.MonthEnd(0)
+        first_day = pd.Timestamp(f"{start.year}-01-01")
+        df = self.frame("cashflow", first_day, end)
+        months = pd.date_range(first_day, end, freq='ME')
+
+        not_transfer = (df["Category"] != "Transfer").to_numpy()
+        qty = df["Qty"].to_numpy(dtype="float64")
+        invest = ((df["Category"] == "Transfer") & (df["Subcategory"] == "Invest")).to_numpy()
+        month_ends = df.index + pd.offsets.MonthEnd(0)
+        def monthly(values):
+            return pd.Series(values, index=month_ends).groupby(level=0).sum().reindex(months, fill_value=0.0)
+
+        df_m = pd.DataFrame({
+            "incomes": monthly(np.where(not_transfer & (qty > 0), qty, 0.0)),
+            "liabilities": monthly(np.where(not_transfer & (qty <= 0), qty, 0.0)),
+            "investments": monthly(np.where(invest, qty, 0.0)),
+        })
+        df_m["savings"] = df_m.incomes + df_m.liabilities
+        df_m["saving_rate"] = saving_rate(df_m.savings, df_m.incomes)
+        flows = (df_m.savings - df_m.investments.abs()).to_numpy()
+        liquidity = np.empty(len(months))
+        for year in range(start.year, end.year + 1):
+            in_year = months.year == year
+            self.opening(year) # tells whether year has an init file
+            if year == start.year or year in self.init_years:
+                opening_liquidity = float(sum(self.opening_balances(year).values()))
+            else:
+                opening_liquidity = last_liquidity
+            liquidity[in_year] = opening_liquidity + np.cumsum(flows[in_year])
+            last_liquidity = liquidity[in_year][-1]
+        df_m["liquidity"] = liquidity
+        df_m.index.name = "Date"
+        return df_m.loc[start:end, ["incomes", "liabilities", "savings", "saving_rate", "investments", "liquidity"]]
@@ -0,0 +1,147 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .config_service import get_config, DATA_TYPES
+from .ledger_writer import LEDGER_COLUMNS
+from .month_table import read_month_table
+
+# Bulk validation of the month files against config.json.
+# The rows of all the month files of a data type are stacked and checked in one
+# vectorized pass: Category, Subcategory and Coin against the compiled config
+# (see config_service.py), Date parseable as YYYY-MM-DD and inside the month of
+# its file, Qty numeric. An issue points at the file and the line number of its
+# row, counted from 0 after the header like /view_database and /delete_row do.
+
+DATE_FORMAT = "%Y-%m-%d"
+ISSUE_COLUMNS = ["file", "line", "field", "value", "message"]
+PAIR_SEPARATOR = "\x1f" # joins a category and a subcategory into one key
+
+def month_file(path, year : int, typedata : str, month : int):
+    return f"{path}/{year}/{typedata}/{year}-{month:0=2}_{typedata}.csv"
+
+def stripped(series : pd.Series):
+    return series.astype(str).str.strip()
+
+def stack_months(typedata : str, months):
+    """
+    One frame with the rows of months, a list of (file, year, month, DataFrame),
+    plus file, year, month and line columns. Files missing a column are returned
+    apart as issues since their rows cannot be checked.
+    """
+    columns = LEDGER_COLUMNS[typedata]
+    arrays = {column: list() for column in columns + ["file", "year", "month", "line"]}
+    issues = list()
+    for file, year, month, df in months:
+        missing = [column for column in columns if column not in df.columns]
+        if missing:
+            issues.append({"file": file, "line": -1, "field": "columns", "value": ",".join(missing), "message": f"Missing columns {missing}"})
+            continue
+        for column in columns:
+            values = df[column].to_numpy()
+            if column == "Date" and np.issubdtype(values.dtype, np.datetime64):
+                values = np.datetime_as_string(values, unit="D") # parsed by load_month
+            arrays[column].append(values.astype(object))
+        arrays["file"].append(np.full(len(df), file, dtype=object))
+        arrays["year"].append(np.full(len(df), year))
+        arrays["month"].append(np.full(len(df), month))
+        arrays["line"].append(np.arange(len(df)))
+    rows = pd.DataFrame({column: np.concatenate(values) if values else np.array([], dtype=object)
+                         for column, values in arrays.items()})
+    return rows, pd.DataFrame(issues, columns=ISSUE_COLUMNS)
+
+def validate_rows(typedata : str, rows : pd.DataFrame, compiled=None):
+    """Issues (ISSUE_COLUMNS) of stacked month rows, see stack_months"""
+    compiled = compiled if compiled is not None else get_config()
+    found = list()
+
+    def issue(field, mask, values, message):
+        mask = np.asarray(mask, dtype=bool)
+        if mask.any():
+            found.append(pd.DataFrame({
+                "file": rows["file"].to_numpy()[mask],
+                "line": rows["line"].to_numpy()[mask],
+                "field": field,
+                "value": np.asarray(values)[mask],
+                "message": message if isinstance(message, str) else np.asarray(message)[mask],
+            }))
+
+    category = stripped(rows["Category"])
+    known_category = category.isin(compiled.categories[typedata])
+    issue("Category", ~known_category, category, "Unknown category")
+
+    # categories with a subcategory list only accept the listed ones
+    listed = compiled.subcategories[typedata]
+    subcategory = stripped(rows["Subcategory"])
+    pairs = [f"{c}{PAIR_SEPARATOR}{s}" for c, values in listed.items() for s in values]
+    valid_pair = (category + PAIR_SEPARATOR + subcategory).isin(pairs)
+    issue("Subcategory", known_category & category.isin(list(listed.keys())) & ~valid_pair, subcategory,
+          "Unknown subcategory for " + category)
+
+    if typedata == "cashflow":
+        coin = stripped(rows["Coin"])
+        issue("Coin", ~coin.isin(compiled.coins), coin, "Unknown coin")
+
+    dates = pd.to_datetime(stripped(rows["Date"]), format=DATE_FORMAT, errors="coerce")
+    bad_date = dates.isna()
+    issue("Date", bad_date, rows["Date"].astype(str), "Date is not YYYY-MM-DD")
+    other_month = ~bad_date & ((dates.dt.year != rows["year"]) | (dates.dt.month != rows["month"]))
+    issue("Date", other_month, rows["Date"].astype(str), "Date outside the month of the file")
+
+    qty = pd.to_numeric(stripped(rows["Qty"]), errors="coerce")
+    issue("Qty", qty.isna(), rows["Qty"].astype(str), "Qty is not a number")
+
+    if not found:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    return pd.concat(found, ignore_index=True).sort_values(["file", "line"], kind="stable").reset_index(drop=True)
+
+def validate_months(typedata : str, months, compiled=None):
+    """Issues of months, a list of (file, year, month, DataFrame) of typedata"""
+    rows, issues = stack_months(typedata, months)
+    found = validate_rows(typedata, rows, compiled)
+    if issues.empty:
+        return found
+    return pd.concat([issues, found], ignore_index=True)
+
+def validate_path(path, years=None, read=read_month_table):
+    """
+    Validate every month file of the years (all the year folders when None) of path.
+    read(csv_path) returns the rows of a file as written, e.g. MonthTableCache.get.
+    Returns {"files", "rows", "issues": [ISSUE_COLUMNS records]}
+    """
+    path = Path(path)
+    if years is None:
+        years = sorted(int(p.name) for p in path.iterdir() if p.is_dir() and p.name.isdigit() and len(p.name) == 4)
+    report = {"files": 0, "rows": 0, "issues": list()}
+    compiled = get_config()
+    for typedata in DATA_TYPES:
+        months = list()
+        for year in years:
+            for month in range(1, 13):
+                file = month_file(path, year, typedata, month)
+                if not Path(file).exists():
+                    continue
+                try:
+                    df = read(file)
+                except Exception as e:
+                    df = pd.DataFrame()
+                    report["issues"].append({"file": file, "line": -1, "field": "file", "value": "", "message": f"Could not read the file: {e}"})
+                if df is None: # removed meanwhile
+                    continue
+                report["files"] += 1
+                if not df.columns.empty:
+                    months.append((file, year, month, df))
+        report["rows"] += sum(len(df) for _, _, _, df in months)
+        report["issues"] += issue_records(validate_months(typedata, months, compiled))
+    return report
+
+def issue_records(issues : pd.DataFrame):
+    return [{"file": str(file), "line": int(line), "field": field, "value": str(value), "message": message}
+            for file, line, field, value, message in issues[ISSUE_COLUMNS].itertuples(index=False)]
+
+def load_errors(issues : pd.DataFrame, months : dict):
+    """Issues as load errors of kind "invalid", see load_data_report. months: file -> month"""
+    return [{"file": issue["file"], "month": months[issue["file"]], "kind": "invalid", "line": issue["line"],
+             "field": issue["field"], "value": issue["value"], "error": issue["message"]}
+            for issue in issue_records(issues)]
@@ -0,0 +1,119 @@
+import csv
+import io
+import os
+import threading
+from pathlib import Path
+
+# Append-only write path for the month csv files.
+# Rows are appended at the end of the file with a single write() on an O_APPEND
+# descriptor, so existing lines (and their hand made padding) are never rewritten
+# and the cost of an insert does not depend on the size of the file.
+# A deletion rewrites the file: the new content goes to a temporary file which
+# then replaces the month file, so a concurrent reader sees either version.
+
+LEDGER_COLUMNS = {
+    "cashflow": ["Date", "Type", "Coin", "Qty", "Category", "Subcategory", "Description"],
+    "investments": ["Date", "Type", "Symbol", "Qty", "Category", "Subcategory", "Description"],
+}
+
+_locks_guard = threading.Lock()
+_path_locks = dict()
+
+def _lock_for(csv_path):
+    key = os.path.abspath(csv_path)
+    with _locks_guard:
+        if key not in _path_locks:
+            _path_locks[key] = threading.Lock()
+        return _path_locks[key]
+
+def path_lock(csv_path):
+    """Lock of the writes to csv_path, hold it across a read-modify-rewrite with rewrite_rows"""
+    return _lock_for(csv_path)
+
+def read_header(csv_path):
+    """Return the stripped column names of an existing csv, None if the file is missing or empty"""
+    try:
+        with open(csv_path, "r", newline="") as f:
+            first_line = f.readline()
+    except FileNotFoundError:
+        return None
+    if not first_line.strip():
+        return None
+    return [col.strip() for col in next(csv.reader([first_line]))]
+
+def _ends_with_newline(csv_path):
+    with open(csv_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+def format_rows(rows, columns):
+    """Render rows (dicts) as csv lines following the column order"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for row in rows:
+        writer.writerow(["" if row.get(col) is None else row.get(col) for col in columns])
+    return buffer.getvalue()
+
+def append_rows(csv_path, rows, columns, fsync : bool = True):
+    """
+    Append rows to csv_path in one write, creating the file and its header if needed.
+
+    Args:
+        csv_path: month csv to append to
+        rows: list of dicts keyed by column name
+        columns: column order used when the file has to be created
+        fsync: flush the file to disk before returning
+    Returns:
+        Number of appended rows
+    """
+    if not rows:
+        return 0
+
+    with _lock_for(csv_path):
+        header = read_header(csv_path)
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+        if header is None:
+            # new (or blank) month file, start it with the header
+            Path(csv_path).parent.mkdir(parents=True, exist_ok=True)
+            payload = format_rows([{col: col for col in columns}], columns) + format_rows(rows, columns)
+            flags |= os.O_TRUNC
+        else:
+            # follow the column order of the existing file
+            payload = format_rows(rows, header)
+            if not _ends_with_newline(csv_path):
+                payload = "\n" + payload
+
+        data = payload.encode("utf-8")
+        fd = os.open(csv_path, flags, 0o644)
+        try:
+            written = 0
+            while written < len(data):
+                written += os.write(fd, data[written:])
+            if fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    return len(rows)
+
+def rewrite_rows(csv_path, df, fsync : bool = True):
+    """
+    Replace the content of csv_path with the rows of df (no index), atomically.
+    The caller holds path_lock(csv_path) since the rows were read.
+    """
+    tmp_path = f"{csv_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        df.to_csv(tmp_path, index=False)
+        if fsync:
+            fd = os.open(tmp_path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        os.replace(tmp_path, csv_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,60 @@
+# TESTING UTILITY FOR BALANCE_INDEX.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_balance_index --debug
+import sys # for debug flag
+
+import pandas as pd
+
+from ..common import load_data
+from ..balance_index import BalanceIndex
+
+from pathlib import Path
+
+def brute_force(df, opening, account, date):
+  rows = df.loc[(df["Type"] == account) & (df.index <= pd.Timestamp(date))]
+  return round(opening.get(account, 0.0) + float(rows["Qty"].sum()), 2)
+
+def test_balance_index(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing point in time balances against full scans")
+
+  df = load_data("cashflow", data_path, year)
+  opening = {"Hype": 1000.0, "Savings": 50.0}
+  index = BalanceIndex(df, opening)
+
+  dates = ["2025-01-01", "2025-02-14", "2025-06-07", "2025-06-30", "2025-12-31"]
+  accounts = df["Type"].astype(str).unique().tolist()
+  ok = all(round(index.balance_at(account, date), 2) == brute_force(df, opening, account, date) for account in accounts for date in dates)
+  ok = ok and index.balances()["Savings"] == 50.0
+  checkpoint = index.month_end_balances("2025-06-30")
+  ok = ok and all(round(checkpoint[account], 2) == brute_force(df, opening, account, "2025-06-30") for account in accounts)
+
+  # appended, back dated and removed rows
+  index.add("Hype", "2026-02-03", -10.0) # after the last checkpoint
+  index.add("Hype", "2025-03-15", 200.0)
+  removed = index.remove("Hype", "2025-03-15", 200.0)
+  index.add("Revolut", "2025-03-15", 5.0)
+  index.add("NewBank", "2025-04-01", 7.0)
+  removed = removed and index.remove("NewBank", "2025-04-01", 7.0) and not index.remove("Hype", "2025-03-15", 200.0)
+  after = index.month_end_balances("2026-01-31")
+  expected_revolut = brute_force(df, opening, "Revolut", "2025-12-31") + 5.0
+
+  if debug:
+    print(index.balances())
+    print(after)
+
+  ok = ok and removed and "NewBank" not in index.balances()
+  ok = ok and round(after["Revolut"], 2) == round(expected_revolut, 2)
+  ok = ok and round(index.balance_at("Hype", "2026-02-03"), 2) == round(brute_force(df, opening, "Hype", "2025-12-31") - 10.0, 2)
+  ok = ok and round(index.month_end_balances("2025-03-31")["Hype"], 2) == brute_force(df, opening, "Hype", "2025-03-31")
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_balance_index")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_balance_index")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+  year = 2025
+  data_path = Path("demo")
+
+  test_balance_index(year=year, data_path=data_path, debug=debug)
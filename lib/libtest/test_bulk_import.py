@@ -0,0 +1,104 @@
+# TESTING UTILITY FOR BULK_IMPORT.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_bulk_import --debug
+import sys # for debug flag
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from ..bulk_import import parse_import, validate_import, run_import, detect_format
+from ..common import load_data_report
+
+CSV_BODY = """date,TYPE,Coin,Qty,Category,Subcategory,Description
+2025-03-02,Hype,EUR,-10.5,Groceries,Diet,market
+2025-04-15,Revolut,EUR,-20,Leisure,Restaurant,dinner
+2025-13-01,Hype,EUR,-1,Groceries,Diet,bad date
+2025-03-03,,GBP,ten,Groceris,Diet,
+2025-05-20,Hype,EUR,+100,Groceries,Gym,
+2025-04-16,Hype,EUR,-5,Groceries,Diet,
+"""
+
+def test_parse_import(debug : bool = False):
+  if debug: print("Testing parsing of csv and ndjson bodies")
+
+  csv_rows, csv_bad = parse_import(CSV_BODY, detect_format(CSV_BODY, "text/csv"), "cashflow")
+  records = csv_rows.drop(columns="data_type").to_dict(orient="records")
+  ndjson = "\n".join(json.dumps(record) for record in records[:3]) + "\nnot json\n\n" + json.dumps(records[3])
+  nd_rows, nd_bad = parse_import(ndjson, detect_format(ndjson), "cashflow")
+  if debug: print(csv_rows.head(3)); print(nd_bad)
+
+  ok = len(csv_rows) == 6 and not csv_bad and csv_rows.loc[0, "Type"] == "Hype"
+  ok = ok and (csv_rows["data_type"] == "cashflow").all()
+  ok = ok and len(nd_rows) == 5 and nd_bad == {3: "Not a JSON object"}
+  ok = ok and nd_rows.loc[[0, 1, 2]].equals(csv_rows.loc[[0, 1, 2]])
+
+  try:
+    parse_import(CSV_BODY, "xml")
+    ok = False
+  except ValueError:
+    pass
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_parse_import")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_parse_import")
+
+def test_validate_import(debug : bool = False):
+  if debug: print("Testing the per row errors of an import")
+
+  rows, _ = parse_import(CSV_BODY, "csv", "cashflow")
+  rows, errors = validate_import(rows, "data")
+  if debug: print(errors)
+
+  ok = sorted(errors) == [2, 3, 4]
+  ok = ok and len(errors[3]) == 4 # type, category, coin and qty
+  ok = ok and rows.loc[0, "file"] == "data/2025/cashflow/2025-03_cashflow.csv" and rows.loc[2, "file"] is None
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_validate_import")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_validate_import")
+
+def count_rows(csv_path):
+  with open(csv_path) as f:
+    return len(f.readlines()) - 1
+
+def test_run_import(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing the import of rows into the month files")
+
+  with tempfile.TemporaryDirectory() as tmp:
+    shutil.copytree(f"{data_path}/{year}", f"{tmp}/{year}")
+    files = {month: f"{tmp}/{year}/cashflow/{year}-{month:0=2}_cashflow.csv" for month in [3, 4, 5]}
+    before = {month: count_rows(file) for month, file in files.items()}
+    df_before, _ = load_data_report("cashflow", tmp, year, use_snapshot=False, workers=1)
+
+    report, _ = run_import(CSV_BODY, "csv", tmp, "cashflow", dry_run=True, fsync=False)
+    ok = report["added"] == 0 and all(count_rows(file) == before[month] for month, file in files.items())
+    ok = ok and [r["status"] for r in report["results"]] == ["valid", "valid", "rejected", "rejected", "rejected", "valid"]
+
+    report, written = run_import(CSV_BODY, "csv", tmp, "cashflow", fsync=False)
+    if debug: print({k: v for k, v in report.items() if k != "results"})
+    ok = ok and report["added"] == 3 and report["rejected"] == 3
+    ok = ok and [f["rows"] for f in report["files"]] == [1, 2]
+    ok = ok and [len(rows) for rows in written.values()] == [3]
+    ok = ok and [count_rows(file) - before[month] for month, file in files.items()] == [1, 2, 0]
+
+    # the month files are still valid and load with the new rows
+    df_after, errors = load_data_report("cashflow", tmp, year, use_snapshot=False, workers=1)
+    ok = ok and len(df_after) == len(df_before) + 3
+    ok = ok and not [e for e in errors if e["kind"] == "invalid"]
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_run_import")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_run_import")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+  year = 2025
+  data_path = Path("demo")
+
+  test_parse_import(debug=debug)
+  test_validate_import(debug=debug)
+  test_run_import(year=year, data_path=data_path, debug=debug)
@@ -0,0 +1,55 @@
+# TESTING UTILITY FOR CASHFLOW_CUBE.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_cashflow_cube --debug
+import sys # for debug flag
+
+from ..fin_cashflow import FinCashflow
+from ..cashflow_cube import CashflowCube
+
+from pathlib import Path
+
+def test_cashflow_cube(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing cube aggregates against group-bys of the raw rows")
+
+  finCashflow = FinCashflow(data_path, year)
+  cube = CashflowCube(finCashflow.df_year_cashflow)
+
+  # yearly expenses by category
+  df_expenses = finCashflow.calc_expenses()
+  expected = df_expenses.groupby(df_expenses["Category"].astype(str))["Qty"].sum().round(2).sort_index()
+  result = cube.aggregate("expenses", ["Category"]).set_index("Category")["expenses"].round(2).sort_index()
+  ok = expected.to_dict() == result.to_dict()
+
+  # monthly incomes by subcategory and account
+  df_incomes = finCashflow.calc_incomes(month=3)
+  expected = df_incomes.groupby([df_incomes["Subcategory"].astype(str), df_incomes["Type"].astype(str)])["Qty"].agg(["sum", "count"])
+  result = cube.aggregate("incomes", ["Subcategory", "Type"], month=3).set_index(["Subcategory", "Type"])
+  ok = ok and all(round(result.loc[key, "incomes"], 2) == round(row["sum"], 2) and result.loc[key, "count"] == row["count"] for key, row in expected.iterrows())
+  ok = ok and len(result) == len(expected)
+
+  # filters and the grand total
+  df_month = finCashflow.calc_expenses(month=7)
+  category = str(df_month["Category"].iloc[0])
+  result = cube.aggregate("expenses", [], filters={"Month": 7, "Category": category})
+  ok = ok and round(result["expenses"].iloc[0], 2) == round(df_month.loc[df_month["Category"] == category, "Qty"].sum(), 2)
+
+  # writes
+  rows = finCashflow.df_year_cashflow.iloc[:3]
+  cube.add(rows)
+  cube.remove(rows)
+  ok = ok and cube.cells.round(6).equals(CashflowCube(finCashflow.df_year_cashflow).cells.round(6))
+
+  if debug:
+    print(cube.aggregate("expenses", ["Month", "Category"]).head(10))
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_cashflow_cube")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_cashflow_cube")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+  year = 2025
+  data_path = Path("demo")
+
+  test_cashflow_cube(year=year, data_path=data_path, debug=debug)
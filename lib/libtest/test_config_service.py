@@ -0,0 +1,81 @@
+# TESTING UTILITY FOR CONFIG_SERVICE.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_config_service --debug
+import sys # for debug flag
+import os
+import json
+import shutil
+import tempfile
+
+from ..config_service import ConfigService
+from ..common import validate_data, load_config
+
+def test_validate(debug : bool = False):
+  if debug: print("Testing validation against the compiled config")
+
+  cases = [
+    (("cashflow", "Groceries", "Diet", "EUR"), True),
+    (("cashflow", "Transfer", "ToHype", "EUR"), True), # expanded template
+    (("cashflow", "Transfer", "To{Acc1}", "EUR"), False),
+    (("cashflow", "Groceries", "Gym", "EUR"), False),
+    (("cashflow", "Groceries", "Diet", "GBP"), False),
+    (("cashflow", "Nope", "Diet", "EUR"), False),
+    (("investments", "Buy", "Holdings", None), True),
+    (("bonds", "Buy", "Holdings", None), False),
+  ]
+  ok = True
+  for args, expected in cases:
+    valid, message = validate_data(*args)
+    ok = ok and valid == expected
+    if debug: print(args, valid, message)
+
+  # callers get their own copy of the config
+  config = load_config()
+  config["cashflow"]["Category"].append("Scratch")
+  ok = ok and not validate_data("cashflow", "Scratch", "", "EUR")[0]
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_validate")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_validate")
+
+def test_reload(debug : bool = False):
+  if debug: print("Testing reload of the config when the files change")
+
+  with tempfile.TemporaryDirectory() as tmp:
+    config_path, mappings_path = f"{tmp}/config.json", f"{tmp}/mappings.json"
+    shutil.copy("config.json", config_path)
+    shutil.copy("mappings.json", mappings_path)
+
+    service = ConfigService(config_path, mappings_path, check_interval=0.0)
+    first = service.get()
+    ok = service.get() is first and "ToHype" in first.subcategories["cashflow"]["Transfer"]
+
+    # a new provider in mappings.json
+    with open(mappings_path) as f:
+      mappings = json.load(f)
+    mappings["Acc1"] = "N26" # also changes the size of the file
+    with open(mappings_path, "w") as f:
+      json.dump(mappings, f)
+
+    second = service.get()
+    ok = ok and second is not first and "ToN26" in second.subcategories["cashflow"]["Transfer"]
+    ok = ok and second.validate("cashflow", "Transfer", "ToN26", "EUR")[0]
+
+    # within the check interval the files are not even stat-ed
+    service.check_interval = 60.0
+    os.remove(config_path)
+    ok = ok and service.get() is second and service.get_stats()["loads"] == 2
+
+    if debug: print(service.get_stats())
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_reload")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_reload")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+
+  test_validate(debug=debug)
+  test_reload(debug=debug)
@@ -0,0 +1,66 @@
+# TESTING UTILITY FOR DAILY_NW.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_daily_nw --debug
+import sys # for debug flag
+
+import pandas as pd
+
+from ..daily_nw import daily_networth, slice_asof
+
+def test_daily_networth(debug : bool = False):
+  if debug: print("Testing the daily networth with as-of prices")
+
+  df_cashflow = pd.DataFrame({
+    "Date": pd.to_datetime(["2025-01-03", "2025-01-04", "2025-01-10", "2025-02-01"]), # 01-04 and 02-01 are saturdays
+    "Type": ["Hype", "Hype", "Hype", "Revolut"],
+    "Qty": [1000.0, -50.0, -300.0, 20.0],
+    "Category": ["Employment", "Groceries", "Transfer", "Gift"],
+    "Subcategory": ["Salary", "Food", "Invest", "Gift"],
+  }).set_index("Date")
+  df_investments = pd.DataFrame({
+    "Date": pd.to_datetime(["2024-12-31", "2025-01-11"]),
+    "Type": ["Cryptocurrencies", "Cryptocurrencies"],
+    "Symbol": ["SOL", "SOL"],
+    "Qty": [1.0, 2.0],
+  }).set_index("Date")
+  prices = {("Cryptocurrencies", "SOL"): pd.Series(
+    [100.0, 120.0, 130.0],
+    index=pd.to_datetime(["2024-12-31", "2025-01-08", "2025-01-31"])
+  )}
+
+  nw_daily = daily_networth(
+    df_cashflow, {"Hype": 500.0, "Revolut": 0.0}, df_investments, prices, "2024-12-31", "2025-02-05"
+  )
+  saturday = slice_asof(nw_daily, "2025-01-04") # not a business day, friday row
+  monday = nw_daily.loc["2025-01-13"] # weekend buy valued at the last close
+
+  if debug:
+    print(nw_daily)
+
+  ok = nw_daily.loc["2024-12-31", "networth"] == 600.0
+  ok = ok and "2025-01-04" not in nw_daily.index and saturday.name == pd.Timestamp("2025-01-03")
+  ok = ok and monday["investments"] == 360.0 and monday["liquidity"] == 1150.0
+  ok = ok and nw_daily.loc["2025-01-31", "investments"] == 390.0
+  ok = ok and nw_daily.iloc[-1]["liquidity"] == 1170.0
+  ok = ok and slice_asof(nw_daily, "2024-01-01") is None
+
+  # after a write only the days from its date on are computed again
+  df_cashflow.loc[pd.Timestamp("2025-01-18")] = ["Revolut", -40.0, "Groceries", "Food"] # a saturday
+  df_investments.loc[pd.Timestamp("2025-01-20")] = ["Cryptocurrencies", "SOL", 1.0]
+  updated = daily_networth(
+    df_cashflow, {"Hype": 500.0, "Revolut": 0.0}, df_investments, prices, "2024-12-31", "2025-02-05",
+    previous=nw_daily, since="2025-01-18"
+  )
+  full = daily_networth(df_cashflow, {"Hype": 500.0, "Revolut": 0.0}, df_investments, prices, "2024-12-31", "2025-02-05")
+  ok = ok and updated.equals(full) and updated.loc["2025-01-17"].equals(nw_daily.loc["2025-01-17"])
+  ok = ok and updated.iloc[-1]["liquidity"] == 1130.0 and updated.loc["2025-01-31", "investments"] == 520.0
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_daily_networth")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_daily_networth")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+
+  test_daily_networth(debug=debug)
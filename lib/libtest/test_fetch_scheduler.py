@@ -0,0 +1,57 @@
+# TESTING UTILITY FOR FETCH_SCHEDULER.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_fetch_scheduler --debug
+import sys # for debug flag
+import threading
+import time
+
+from ..errors import FetchError
+from ..fetch_scheduler import FetchScheduler, FetchTask
+
+def test_rate_limit_and_retry(debug : bool = False):
+  if debug: print("Testing per host rate limit, concurrency across hosts and retries")
+
+  calls = dict()
+  lock = threading.Lock()
+  def fake_fetch(symbol, fail_times=0, status=429):
+    with lock:
+      calls.setdefault(symbol, []).append(time.monotonic())
+      attempts = len(calls[symbol])
+    if attempts <= fail_times:
+      raise FetchError(f"{symbol} failed", status=status)
+    return f"{symbol}-price"
+
+  limits = {"a.test": (20, 1), "b.test": (20, 1)} # one request every 50ms per host
+  scheduler = FetchScheduler(max_workers=4, host_limits=limits, max_retries=2, backoff_base=0.01)
+  tasks = [FetchTask(("Cryptocurrencies", f"A{i}"), "https://a.test/x", fake_fetch, f"A{i}") for i in range(4)]
+  tasks += [FetchTask(("ETFs", f"B{i}"), "https://b.test/x", fake_fetch, f"B{i}") for i in range(4)]
+  tasks.append(FetchTask(("ETFs", "RETRY"), "https://b.test/x", fake_fetch, "RETRY", fail_times=2))
+  tasks.append(FetchTask(("ETFs", "GONE"), "https://b.test/x", fake_fetch, "GONE", fail_times=9, status=404))
+
+  progress = list()
+  start = time.monotonic()
+  results, errors = scheduler.run(tasks, on_done=lambda key, done, total: progress.append(done))
+  elapsed = time.monotonic() - start
+
+  a_times = sorted(t for s, ts in calls.items() if s.startswith("A") for t in ts)
+  min_gap = min(b - a for a, b in zip(a_times, a_times[1:]))
+
+  if debug:
+    print(results, errors, progress)
+    print(f"elapsed {elapsed:.2f}s, min gap on a.test {min_gap:.3f}s")
+
+  ok = len(results) == 9 and results[("ETFs", "RETRY")] == "RETRY-price"
+  ok = ok and list(errors.keys()) == [("ETFs", "GONE")] and len(calls["GONE"]) == 1 # 404 is not retried
+  ok = ok and len(calls["RETRY"]) == 3
+  ok = ok and min_gap >= 0.04
+  ok = ok and progress == list(range(1, len(tasks) + 1))
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_rate_limit_and_retry")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_rate_limit_and_retry")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+
+  test_rate_limit_and_retry(debug=debug)
@@ -0,0 +1,122 @@
+# TESTING UTILITY FOR FIN_FETCH.PY METHODS
+# Runs FinFetch against a local stub http server, no network needed
+# Run this test with: $ python3 -m lib.libtest.test_fin_fetch --debug
+import sys # for debug flag
+import gzip
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from .. import fin_fetch
+from ..fin_fetch import FinFetch
+from ..errors import FetchError
+
+CHART = {"chart": {"result": [{
+  "timestamp": [1735689600, 1738368000, 1740787200], # 2025-01-01, 2025-02-01, 2025-03-01
+  "indicators": {"quote": [{"open": [1.0, 2.0, 3.0], "close": [10.0, 20.0, 30.0]}]},
+}]}}
+
+class StubHandler(BaseHTTPRequestHandler):
+  protocol_version = "HTTP/1.1" # keep-alive
+  stats = {"requests": 0, "ports": set(), "not_modified": 0, "gzip": 0}
+
+  def do_GET(self):
+    StubHandler.stats["requests"] += 1
+    StubHandler.stats["ports"].add(self.client_address[1])
+    if self.path.startswith("/slow"):
+      time.sleep(1)
+    if self.headers.get("If-None-Match") == '"v1"':
+      StubHandler.stats["not_modified"] += 1
+      self.send_response(304)
+      self.send_header("Content-Length", "0")
+      self.end_headers()
+      return
+    body = json.dumps(CHART).encode()
+    self.send_response(200)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("ETag", '"v1"')
+    if "gzip" in self.headers.get("Accept-Encoding", ""):
+      StubHandler.stats["gzip"] += 1
+      body = gzip.compress(body)
+      self.send_header("Content-Encoding", "gzip")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+def test_pooled_session(debug : bool = False):
+  if debug: print("Testing keep-alive, compression, conditional requests and timeouts")
+
+  server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  yahoo_url, http_settings = fin_fetch.YAHOO_URL, fin_fetch.http_settings
+  fin_fetch.YAHOO_URL = f"http://127.0.0.1:{server.server_address[1]}"
+  fin_fetch.http_settings = lambda: ((1.0, 0.3), 4)
+  try:
+    fin_fetch.close_sessions()
+    first, _ = FinFetch.fetch_crypto_data("BTC", "EUR", 1)
+    second, _ = FinFetch.fetch_crypto_data("BTC", "EUR", 1) # same url, answered with 304
+    FinFetch.fetch_crypto_data("ETH", "EUR", 1)
+    try:
+      fin_fetch._get_json(f"{fin_fetch.YAHOO_URL}/slow")
+      timed_out = False
+    except FetchError as e:
+      timed_out = e.retryable
+  finally:
+    fin_fetch.YAHOO_URL, fin_fetch.http_settings = yahoo_url, http_settings
+    fin_fetch.close_sessions()
+    server.shutdown()
+
+  stats = StubHandler.stats
+  if debug:
+    print(first)
+    print(stats)
+
+  ok = first.equals(second) and list(first["Close"]) == [10.0, 20.0, 30.0]
+  ok = ok and stats["not_modified"] == 1 and stats["gzip"] >= 2
+  ok = ok and len(stats["ports"]) <= 2 # the three chart requests share one connection, the timed out one may open another
+  ok = ok and timed_out
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_pooled_session")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_pooled_session")
+
+def test_bounded_validators(debug : bool = False):
+  if debug: print("Testing that the validators of past urls are dropped")
+
+  server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  yahoo_url, max_validators = fin_fetch.YAHOO_URL, fin_fetch.MAX_VALIDATORS
+  fin_fetch.YAHOO_URL = f"http://127.0.0.1:{server.server_address[1]}"
+  fin_fetch.MAX_VALIDATORS = 2
+  try:
+    fin_fetch.close_sessions()
+    for symbol in ["BTC", "ETH", "SOL"]:
+      FinFetch.fetch_crypto_data(symbol, "EUR", 1)
+    kept = [url.split("/")[-1].split("-")[0] for url in fin_fetch._validators]
+    not_modified = StubHandler.stats["not_modified"]
+    FinFetch.fetch_crypto_data("ETH", "EUR", 1) # still known, answered with 304
+    FinFetch.fetch_crypto_data("BTC", "EUR", 1) # dropped, full answer
+    revalidated = StubHandler.stats["not_modified"] - not_modified
+    order = [url.split("/")[-1].split("-")[0] for url in fin_fetch._validators]
+  finally:
+    fin_fetch.YAHOO_URL, fin_fetch.MAX_VALIDATORS = yahoo_url, max_validators
+    fin_fetch.close_sessions()
+    server.shutdown()
+  if debug: print(kept, order, revalidated)
+
+  if kept == ["ETH", "SOL"] and revalidated == 1 and order == ["ETH", "BTC"]:
+    print(f"[OK] - {sys.argv[0]} test_bounded_validators")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_bounded_validators")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+
+  test_pooled_session(debug=debug)
+  test_bounded_validators(debug=debug)
@@ -0,0 +1,75 @@
+# TESTING UTILITY FOR HOLDINGS_ENGINE.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_holdings_engine --debug
+import sys # for debug flag
+
+import pandas as pd
+
+import numpy as np
+
+from ..holdings_engine import quantity_matrix, per_symbol_views, HoldingsArrays
+
+def test_quantity_matrix(debug : bool = False):
+  if debug: print("Testing the dense date x symbol quantity matrix")
+
+  df = pd.DataFrame({
+    "Date": pd.to_datetime(["2024-12-31", "2025-01-10", "2025-01-20", "2025-03-05", "2025-03-05", "2025-04-02"]),
+    "Type": ["ETFs", "Cryptocurrencies", "ETFs", "Cryptocurrencies", "Cryptocurrencies", "ETFs"],
+    "Symbol": ["IE00BK5BQT80", "SOL", "IE00BK5BQT80", "SOL", "ETH", "IE00BK5BQT80"],
+    "Qty": [10.0, 2.0, 1.5, -1.0, 0.5, 3.0],
+  }).set_index("Date")
+  complete_index = pd.date_range(start="2024-12-31", end="2025-03-31", freq="ME")
+
+  qty = quantity_matrix(df, complete_index, 'ME')
+  views = per_symbol_views(qty, qty.cumsum())
+
+  if debug:
+    print(qty)
+    print(views["Cryptocurrencies"]["SOL"])
+
+  ok = list(qty.columns) == [("ETFs", "IE00BK5BQT80"), ("Cryptocurrencies", "SOL"), ("Cryptocurrencies", "ETH")]
+  ok = ok and list(views.keys()) == ["ETFs", "Cryptocurrencies"]
+  ok = ok and list(views["ETFs"]["IE00BK5BQT80"]["Qty"]) == [10.0, 1.5, 0.0, 0.0] # april is out of range
+  ok = ok and list(views["Cryptocurrencies"]["SOL"]["CumQty"]) == [0.0, 2.0, 2.0, 1.0]
+  ok = ok and list(views["Cryptocurrencies"]["ETH"]["CumQty"]) == [0.0, 0.0, 0.0, 0.5]
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_quantity_matrix")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_quantity_matrix")
+
+def test_holdings_arrays(debug : bool = False):
+  if debug: print("Testing the array backed holdings, valuation and totals")
+
+  dates = pd.date_range(start="2024-12-31", periods=3, freq="ME")
+  columns = pd.MultiIndex.from_tuples([("Cryptocurrencies", "SOL"), ("Cryptocurrencies", "ETH"), ("ETFs", "IE00BK5BQT80")], names=["Type", "Symbol"])
+  qty = pd.DataFrame([[1.0, 2.0, 10.0], [1.0, 0.0, 0.0], [0.0, 0.0, 5.0]], index=dates, columns=columns)
+  close = pd.DataFrame([[100.0, 10.0, 50.0], [110.0, np.nan, 55.0], [120.0, 12.0, 60.0]], index=dates, columns=columns)
+
+  holdings = HoldingsArrays.from_quantities(qty)
+  holdings.set_close(close)
+  df_holdings, df_holdings_class = holdings.totals()
+  view = holdings.frame("Holdings")
+  holdings.apply_qty_delta(holdings.symbol_index[("ETFs", "IE00BK5BQT80")], 1, 1.0)
+
+  if debug:
+    print(df_holdings)
+    print(df_holdings_class)
+    print(holdings.symbol_frame("ETFs", "IE00BK5BQT80"))
+
+  ok = list(df_holdings["Total"]) == [620.0, 770.0, 1164.0] # missing ETH price skipped
+  ok = ok and np.isnan(df_holdings_class["Cryptocurrencies"].iloc[1]) and df_holdings_class["Total"].iloc[1] == 550.0
+  ok = ok and np.shares_memory(view.to_numpy(), holdings.arrays["Holdings"]) # zero-copy view
+  ok = ok and list(view[("ETFs", "IE00BK5BQT80")]) == [500.0, 605.0, 960.0]
+  ok = ok and list(holdings.symbol_frame("ETFs", "IE00BK5BQT80")["CumQty"]) == [10.0, 11.0, 16.0]
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_holdings_arrays")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_holdings_arrays")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+
+  test_quantity_matrix(debug=debug)
+  test_holdings_arrays(debug=debug)
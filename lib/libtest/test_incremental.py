@@ -0,0 +1,171 @@
+# TESTING UTILITY FOR INCREMENTAL UPDATES OF FIN_CASHFLOW.PY AND FIN_INVESTMENTS.PY
+# Run this test with: $ python3 -m lib.libtest.test_incremental --debug
+import sys # for debug flag
+import shutil
+import tempfile
+
+import pandas as pd
+
+from ..fin_cashflow import FinCashflow
+from .. import fin_investments
+from ..fin_investments import FinInvestments
+from ..fetch_scheduler import FetchScheduler
+from ..fin_fetch import FinFetch
+from ..flaskwrapper import FlaskWrapper
+from ..ledger_writer import LEDGER_COLUMNS, append_rows
+from ..common import rows_to_frame
+from ..common import insert_rows
+from ..balance_index import BalanceIndex
+from ..cashflow_cube import CashflowCube
+
+from pathlib import Path
+
+def test_cashflow_add_remove(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing incremental cashflow updates against a full recompute")
+
+  rows = [
+    {"Date": f"{year}-03-04", "Type": "Hype", "Coin": "EUR", "Qty": -50.0, "Category": "Groceries", "Subcategory": "Food", "Description": "market"},
+    {"Date": f"{year}-07-09", "Type": "NewBank", "Coin": "EUR", "Qty": 500.0, "Category": "Income", "Subcategory": "Gift", "Description": ""},
+  ]
+
+  finCashflow = FinCashflow(data_path, year)
+  finCashflow.run()
+  finCashflow.add_rows(rows_to_frame(rows, "cashflow"))
+  removed = finCashflow.remove_row(rows[1])
+
+  expected = FinCashflow(data_path, year)
+  expected.df_year_cashflow = insert_rows(expected.df_year_cashflow, rows_to_frame(rows[:1], "cashflow"), "cashflow")
+  expected.balance_index = BalanceIndex(expected.df_year_cashflow, expected.init_holdings['liquidity_eur'])
+  expected.cube = CashflowCube(expected.df_year_cashflow)
+  expected.run()
+
+  if debug:
+    print(finCashflow.df_m_cashflow)
+    print(expected.df_m_cashflow)
+
+  ok = removed and finCashflow.df_m_cashflow.astype(str).equals(expected.df_m_cashflow.astype(str))
+  ok = ok and finCashflow.get_all_balances() == expected.get_all_balances()
+  ok = ok and finCashflow.cube.cells.round(6).equals(expected.cube.cells.round(6))
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_cashflow_add_remove")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_cashflow_add_remove")
+
+def test_cashflow_expenses_only(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing months left with expenses only against a full rebuild")
+
+  finCashflow = FinCashflow(data_path, year)
+  finCashflow.run()
+  def incomes_mask(df):
+    # the first month too: the full rebuild must keep incomes and liabilities aligned
+    return ((df["Category"] != "Transfer") & (df["Qty"] > 0) & (df.index.month.isin([1, 3]))).to_numpy()
+  incomes = finCashflow.df_year_cashflow[incomes_mask(finCashflow.df_year_cashflow)]
+  rows = [dict(row, Date=date.strftime("%Y-%m-%d")) for date, row in incomes.astype(object).iterrows()]
+  removed = all([finCashflow.remove_row(row) for row in rows])
+
+  expected = FinCashflow(data_path, year)
+  expected.df_year_cashflow = expected.df_year_cashflow[~incomes_mask(expected.df_year_cashflow)]
+  expected.balance_index = BalanceIndex(expected.df_year_cashflow, expected.init_holdings['liquidity_eur'])
+  expected.cube = CashflowCube(expected.df_year_cashflow)
+  expected.run()
+
+  if debug:
+    print(finCashflow.df_m_cashflow)
+    print(expected.df_m_cashflow)
+
+  saving_rates = finCashflow.df_m_cashflow.loc[[f"{year}-01-31", f"{year}-03-31"], "saving_rate"]
+  ok = removed and len(rows) > 0 and saving_rates.isna().all()
+  ok = ok and finCashflow.df_m_cashflow.astype(str).equals(expected.df_m_cashflow.astype(str))
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_cashflow_expenses_only")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_cashflow_expenses_only")
+
+# Market data without network: a fixed close per symbol, rising every month
+def fake_history(symbol, currency="EUR", years_watchback=3):
+  dates = pd.date_range(end=pd.Timestamp.now().normalize(), periods=12*years_watchback, freq="ME")
+  closes = [10.0 + len(symbol) + i for i in range(len(dates))]
+  return pd.DataFrame({"Close": closes}, index=pd.Index(dates, name="Date")), None
+
+def fake_today(symbol, currency="EUR", *args):
+  return pd.DataFrame({"Close": [100.0 + len(symbol)]}, index=pd.Index([pd.Timestamp.now().normalize()], name="Date")), None
+
+FAST_HOSTS = {"query1.finance.yahoo.com": (1000, 10), "www.justetf.com": (1000, 10)}
+FAKE_FETCHERS = {
+  "fetch_crypto_data": fake_history, "fetch_etf_data": fake_history,
+  "fetch_crypto_data_today": fake_today, "fetch_etf_data_today": fake_today,
+}
+
+def same_holdings(fin : FinInvestments, expected : FinInvestments):
+  return all(
+    pd.DataFrame(getattr(fin, name)).round(6).equals(pd.DataFrame(getattr(expected, name)).round(6))
+    for name in ["df_year_holdings", "df_year_holdings_class", "df_today_holdings", "df_today_holdings_class"]
+  )
+
+def test_investments_add_remove(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing incremental investments updates against a fresh load")
+
+  rows = [
+    {"Date": f"{year}-05-06", "Type": "ETFs", "Symbol": "IE00BK5BQT80", "Qty": 2.5, "Category": "Buy", "Subcategory": "Holdings", "Description": ""},
+    {"Date": f"{year}-03-10", "Type": "ETFs", "Symbol": "JE00B1VS3770", "Qty": 1.0, "Category": "Buy", "Subcategory": "Holdings", "Description": ""},
+  ]
+  originals = {name: FinFetch.__dict__[name] for name in FAKE_FETCHERS}
+  for name, fake in FAKE_FETCHERS.items():
+    setattr(FinFetch, name, fake)
+  build_scheduler = fin_investments.build_scheduler
+  fin_investments.build_scheduler = lambda: FetchScheduler(host_limits=FAST_HOSTS) # no rate limit on fakes
+  try:
+    with tempfile.TemporaryDirectory() as tmp:
+      shutil.copytree(data_path, f"{tmp}/data")
+      path = f"{tmp}/data"
+
+      # FinInvestments: add both rows, remove the second one
+      finInvestments = FinInvestments(path, year)
+      finInvestments.run()
+      applied = finInvestments.add_rows(rows_to_frame(rows, "investments"))
+      applied = finInvestments.remove_row(rows[1]) and applied
+
+      # FlaskWrapper: the same writes on the files, applied to the loaded session
+      wrapper = FlaskWrapper()
+      wrapper.initialize(year, path)
+      for row in rows:
+        append_rows(f"{path}/{year}/investments/{row['Date'][:7]}_investments.csv", [row], LEDGER_COLUMNS["investments"], fsync=False)
+        applied = wrapper.apply_added_rows("investments", year, path, [row]) and applied
+      df = pd.read_csv(f"{path}/{year}/investments/{year}-03_investments.csv")
+      df.iloc[:-1].to_csv(f"{path}/{year}/investments/{year}-03_investments.csv", index=False)
+      applied = wrapper.apply_deleted_row("investments", year, path, rows[1]) and applied
+      nw_global = wrapper.calc_global_nw()
+
+      # fresh load of the written files
+      expected = FinInvestments(path, year)
+      expected.run()
+      fresh = FlaskWrapper()
+      fresh.initialize(year, path, reload=True)
+
+      ok = applied and same_holdings(finInvestments, expected) and same_holdings(wrapper.finInvestments, expected)
+      ok = ok and nw_global.round(6).equals(fresh.calc_global_nw().round(6))
+      ok = ok and wrapper.get_nw_status().equals(fresh.get_nw_status())
+      if debug:
+        print(finInvestments.df_year_holdings_class)
+        print(expected.df_year_holdings_class)
+  finally:
+    for name, original in originals.items():
+      setattr(FinFetch, name, original)
+    fin_investments.build_scheduler = build_scheduler
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_investments_add_remove")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_investments_add_remove")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+  year = 2025
+  data_path = Path("demo")
+
+  test_cashflow_add_remove(year=year, data_path=data_path, debug=debug)
+  test_cashflow_expenses_only(year=year, data_path=data_path, debug=debug)
+  test_investments_add_remove(year=year, data_path=data_path, debug=debug)
@@ -0,0 +1,152 @@
+# TESTING UTILITY FOR INIT_JOB.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_init_job --debug
+import sys # for debug flag
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ..init_job import InitJob, InitJobManager, STAGES
+from ..flaskwrapper import FlaskWrapper
+from ..session_cache import Session, session_key
+from ..errors import InitCancelled
+
+TIMEOUT = 5 # seconds
+
+def make_session(year, data_path):
+  session = Session(year, data_path)
+  session.nw_global = pd.DataFrame({"networth": np.zeros(10)})
+  return session
+
+class SteppedInit:
+  """Fake initialize going through the stages one step() at a time"""
+  def __init__(self, fail_at=None):
+    self.fail_at = fail_at
+    self.steps = threading.Semaphore(0)
+    self.reached = threading.Semaphore(0)
+
+  def __call__(self, year, data_path, progress, reload):
+    for stage in STAGES[1:-1]:
+      progress(stage, 0, 1)
+      self.reached.release()
+      if not self.steps.acquire(timeout=TIMEOUT):
+        raise TimeoutError("Not stepped")
+      if stage == self.fail_at:
+        raise ValueError(f"failed at {stage}")
+
+  def step(self):
+    self.steps.release()
+
+  def run_to_end(self, *jobs):
+    while any(job.thread.is_alive() for job in jobs):
+      self.step()
+      time.sleep(0.01)
+
+def test_progress(data_path : Path, debug : bool = False):
+  if debug: print("Testing the stages reported by a job")
+
+  init = SteppedInit()
+  manager = InitJobManager(init)
+  job = manager.start(2025, data_path)
+  ok = True
+  stages = list()
+  for _ in STAGES[1:-1]:
+    ok = ok and init.reached.acquire(timeout=TIMEOUT)
+    stages.append(job.to_dict()["stage"])
+    init.step()
+  job.thread.join(TIMEOUT)
+  if debug: print(stages, job.to_dict())
+
+  ok = ok and stages == STAGES[1:-1]
+  ok = ok and job.status == "done" and job.stage == "done" and job.to_dict()["stage_index"] == len(STAGES) - 1
+  ok = ok and manager.get() is job and manager.get(job.job_id) is job
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_progress")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_progress")
+
+def test_cancel_supersede(data_path : Path, debug : bool = False):
+  if debug: print("Testing cancel, supersede and error of jobs")
+
+  # cancel: raised at the next progress report
+  init = SteppedInit()
+  manager = InitJobManager(init)
+  job = manager.start(2025, data_path)
+  ok = init.reached.acquire(timeout=TIMEOUT)
+  ok = ok and manager.start(2025, data_path) is job # same dataset, same job
+  manager.cancel(job.job_id)
+  init.step()
+  job.thread.join(TIMEOUT)
+  ok = ok and job.status == "cancelled"
+
+  # supersede: a job for another dataset cancels the running one
+  init = SteppedInit()
+  manager = InitJobManager(init)
+  first = manager.start(2024, data_path)
+  ok = ok and init.reached.acquire(timeout=TIMEOUT)
+  second = manager.start(2025, data_path)
+  ok = ok and first.superseded() and not second.superseded() and manager.get() is second
+  init.run_to_end(first, second)
+  ok = ok and first.status == "cancelled" and second.status == "done"
+
+  # error
+  init = SteppedInit(fail_at="holdings")
+  manager = InitJobManager(init)
+  job = manager.start(2025, data_path)
+  init.run_to_end(job)
+  ok = ok and job.status == "error" and job.error == "failed at holdings" and job.finished_at is not None
+  if debug: print(job.to_dict())
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_cancel_supersede")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_cancel_supersede")
+
+def test_no_late_activation(data_path : Path, debug : bool = False):
+  if debug: print("Testing that a cancelled or superseded job does not activate its session")
+
+  wrapper = FlaskWrapper()
+  wrapper.sessions.put(make_session(2024, data_path))
+  wrapper.sessions.put(make_session(2025, data_path))
+
+  # cancelled while running, the switch back to 2024 does not happen
+  job = InitJob(2024, data_path)
+  job.cancel()
+  try:
+    wrapper.initialize(2024, data_path, job.report)
+    ok = False
+  except InitCancelled:
+    ok = True
+  ok = ok and wrapper.sessions.active_key == session_key(data_path, 2025)
+
+  # superseded: no longer the latest job of the manager
+  job = InitJob(2024, data_path, manager=wrapper.init_jobs)
+  wrapper.init_jobs.latest_id = "newer"
+  try:
+    wrapper.initialize(2024, data_path, job.report)
+    ok = False
+  except InitCancelled:
+    pass
+  ok = ok and wrapper.sessions.active_key == session_key(data_path, 2025)
+
+  # the latest job switches
+  wrapper.init_jobs.latest_id = job.job_id
+  wrapper.initialize(2024, data_path, job.report)
+  ok = ok and wrapper.sessions.active_key == session_key(data_path, 2024)
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_no_late_activation")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_no_late_activation")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+  data_path = Path("demo")
+
+  test_progress(data_path=data_path, debug=debug)
+  test_cancel_supersede(data_path=data_path, debug=debug)
+  test_no_late_activation(data_path=data_path, debug=debug)
@@ -0,0 +1,101 @@
+# TESTING UTILITY FOR THE INTERNED (CATEGORICAL) COLUMNS OF COMMON.PY
+# Run this test with: $ python3 -m lib.libtest.test_interning --debug
+import sys # for debug flag
+from pathlib import Path
+
+import pandas as pd
+
+from ..common import load_data_report, load_month, intern_columns, build_vocabularies, concat_interned
+from ..common import insert_rows, rows_to_frame, INTERNED_COLUMNS
+
+def object_frame(df : pd.DataFrame):
+  """df with the interned columns back to python strings"""
+  return df.astype({col: object for col, dtype in df.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)})
+
+def test_interned_dtypes(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing the dtypes and values of the interned columns after load_data_report")
+
+  ok = True
+  for typedata in ["cashflow", "investments"]:
+    df_year, _ = load_data_report(typedata, data_path, year, use_snapshot=False, workers=1)
+    months = [load_month(typedata, data_path, year, month, use_snapshot=False) for month in range(1,13)
+              if Path(f"{data_path}/{year}/{typedata}/{year}-{month:0=2}_{typedata}.csv").exists()]
+    raw = pd.concat([df for df in months if not df.empty]).set_index("Date")
+    vocabularies = build_vocabularies(typedata)
+    if debug: print(df_year.dtypes)
+
+    for col in INTERNED_COLUMNS[typedata]:
+      dtype = df_year[col].dtype
+      ok = ok and isinstance(dtype, pd.CategoricalDtype)
+      # the vocabulary first, in config order, then the values only found in the files
+      known = vocabularies.get(col, [])
+      ok = ok and list(dtype.categories[:len(known)]) == known
+      ok = ok and set(dtype.categories[len(known):]) <= set(raw[col])
+    ok = ok and df_year["Qty"].dtype == "float64" and df_year["Description"].dtype == object
+    ok = ok and object_frame(df_year).equals(raw.astype({"Qty": "float64"}).reindex(columns=df_year.columns))
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_interned_dtypes")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_interned_dtypes")
+
+def test_consistent_categories(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing the categories of concatenated months and of inserted unseen values")
+
+  df_year, _ = load_data_report("cashflow", data_path, year, use_snapshot=False, workers=1)
+
+  # months interned one by one: their categories differ by the values out of the vocabulary
+  months = [intern_columns(load_month("cashflow", data_path, year, month, use_snapshot=False).set_index("Date"), "cashflow")
+            for month in range(1,13) if Path(f"{data_path}/{year}/cashflow/{year}-{month:0=2}_cashflow.csv").exists()]
+  months = [df for df in months if not df.empty]
+  concatenated = concat_interned(months, "cashflow")
+  if debug: print(concatenated.dtypes)
+  ok = all(isinstance(concatenated[col].dtype, pd.CategoricalDtype) for col in INTERNED_COLUMNS["cashflow"])
+  ok = ok and object_frame(concatenated).equals(object_frame(df_year))
+  ok = ok and all(set(concatenated[col].cat.categories) == set(df_year[col].cat.categories) for col in INTERNED_COLUMNS["cashflow"])
+
+  # an unseen value is added to the categories, the existing codes do not move
+  rows = [{"Date": f"{year}-03-02", "Type": "Hype", "Coin": "EUR", "Qty": -10.0, "Category": "Groceries", "Subcategory": "Unseen", "Description": ""}]
+  inserted = insert_rows(df_year.copy(), rows_to_frame(rows, "cashflow"), "cashflow")
+  subcategory = inserted["Subcategory"]
+  ok = ok and isinstance(subcategory.dtype, pd.CategoricalDtype)
+  ok = ok and list(subcategory.cat.categories) == list(df_year["Subcategory"].cat.categories) + ["Unseen"]
+  ok = ok and (subcategory == "Unseen").sum() == 1 and len(inserted) == len(df_year) + 1
+  ok = ok and object_frame(inserted[subcategory != "Unseen"]).equals(object_frame(df_year))
+  ok = ok and isinstance(concat_interned([inserted, df_year], "cashflow")["Subcategory"].dtype, pd.CategoricalDtype)
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_consistent_categories")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_consistent_categories")
+
+def test_observed_groupby(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing observed=True groupbys against the object dtype results")
+
+  ok = True
+  for typedata, keys in [("cashflow", ["Type", "Category", ["Category", "Subcategory"]]), ("investments", ["Symbol", ["Category", "Symbol"]])]:
+    df_year, _ = load_data_report(typedata, data_path, year, use_snapshot=False, workers=1)
+    df_object = object_frame(df_year)
+    for key in keys:
+      interned = df_year.groupby(key, observed=True)["Qty"].sum()
+      expected = df_object.groupby(key)["Qty"].sum()
+      interned.index = interned.index.set_levels([level.astype(object) for level in interned.index.levels]) \
+        if isinstance(interned.index, pd.MultiIndex) else interned.index.astype(object)
+      same = interned.sort_index().round(6).equals(expected.sort_index().round(6))
+      if debug and not same: print(key, interned, expected)
+      ok = ok and same
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_observed_groupby")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_observed_groupby")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+  year = 2025
+  data_path = Path("demo")
+
+  test_interned_dtypes(year=year, data_path=data_path, debug=debug)
+  test_consistent_categories(year=year, data_path=data_path, debug=debug)
+  test_observed_groupby(year=year, data_path=data_path, debug=debug)
@@ -0,0 +1,89 @@
+# TESTING UTILITY FOR LEDGER.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_ledger --debug
+import sys # for debug flag
+import shutil
+import tempfile
+
+import pandas as pd
+
+from ..fin_cashflow import FinCashflow
+from ..common import load_data
+from ..ledger import Ledger
+
+from pathlib import Path
+
+def test_ledger(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing multi-year ledger against the single year engine")
+
+  with tempfile.TemporaryDirectory() as tmp:
+    shutil.copytree(f"{data_path}/{year}", f"{tmp}/{year}")
+    # next year without init file, one month of data
+    Path(f"{tmp}/{year+1}/cashflow").mkdir(parents=True)
+    with open(f"{data_path}/{year}/cashflow/{year}-01_cashflow.csv") as file:
+      content = file.read().replace(f"{year}-01-", f"{year+1}-01-")
+    with open(f"{tmp}/{year+1}/cashflow/{year+1}-01_cashflow.csv", "w") as file:
+      file.write(content)
+    # an older year that no query touches, it is never parsed
+    Path(f"{tmp}/{year-2}/cashflow").mkdir(parents=True)
+    with open(f"{tmp}/{year-2}/cashflow/{year-2}-01_cashflow.csv", "w") as file:
+      file.write("not a csv file")
+
+    ledger = Ledger(tmp)
+    ok = ledger.years == [year-2, year, year+1]
+
+    finCashflow = FinCashflow(tmp, year)
+    finCashflow.run()
+    expected = finCashflow.df_m_cashflow.iloc[1:]
+    df_m = ledger.monthly_cashflow(f"{year}-01", f"{year}-12")
+    columns = ["incomes", "liabilities", "savings", "investments", "liquidity"]
+    ok = ok and (df_m[columns].astype("float64").round(2).values == expected[columns].astype("float64").round(2).values).all()
+    ok = ok and ledger.loaded_years("cashflow") == [year] and ledger.loaded_years("investments") == []
+
+    # opening balances of the next year are chained from this one
+    df_year = load_data("cashflow", data_path, year)
+    opening = ledger.opening_balances(year+1)
+    ok = ok and all(round(opening[account], 2) == round(finCashflow.init_holdings["liquidity_eur"].get(account, 0.0) + qty, 2)
+                    for account, qty in df_year.groupby(df_year["Type"].astype(str))["Qty"].sum().items())
+    holdings = ledger.opening_holdings(year+1)
+    ok = ok and ledger.loaded_years("investments") == [year] and "SOL" in holdings["Cryptocurrencies"]
+
+    # ranges across years keep the liquidity running
+    df_span = ledger.monthly_cashflow(f"{year}-11", f"{year+1}-02")
+    next_jan = df_span.loc[f"{year+1}-01-31"]
+    ok = ok and len(df_span) == 4 and round(next_jan.liquidity, 2) == round(df_m.liquidity.iloc[-1] + next_jan.savings - abs(next_jan.investments), 2)
+    ok = ok and df_span.loc[f"{year+1}-02-28"].incomes == 0.0
+    ok = ok and ledger.loaded_years("cashflow") == [year, year+1]
+
+    # a year without folder in between: its opening and the one of the year after it
+    # are carried from the last discovered year, and move like the running liquidity
+    Path(f"{tmp}/{year+3}/cashflow").mkdir(parents=True)
+    with open(f"{tmp}/{year+3}/cashflow/{year+3}-01_cashflow.csv", "w") as file:
+      file.write(content.replace(f"{year+1}-01-", f"{year+3}-01-"))
+    ledger = Ledger(tmp)
+    df_gap = ledger.monthly_cashflow(f"{year}-01", f"{year+3}-01")
+    gap_opening = ledger.opening_balances(year+2)
+    def closing(y):
+      return df_gap.loc[f"{y}-12-31"].liquidity
+    ok = ok and ledger.years == [year-2, year, year+1, year+3]
+    ok = ok and gap_opening == ledger.opening_balances(year+3) and len(gap_opening) > 0
+    ok = ok and round(sum(gap_opening.values()) - sum(ledger.opening_balances(year+1).values()), 2) == round(closing(year+1) - closing(year), 2)
+    ok = ok and closing(year+2) == closing(year+1)
+    ok = ok and ledger.opening_holdings(year+3) == ledger.opening_holdings(year+2) == holdings
+
+    if debug:
+      print(df_m)
+      print(df_span)
+      print(opening)
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_ledger")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_ledger")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+  year = 2025
+  data_path = Path("demo")
+
+  test_ledger(year=year, data_path=data_path, debug=debug)
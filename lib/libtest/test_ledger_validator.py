@@ -0,0 +1,88 @@
+# TESTING UTILITY FOR LEDGER_VALIDATOR.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_ledger_validator --debug
+import sys # for debug flag
+import shutil
+import tempfile
+from pathlib import Path
+
+from ..ledger_validator import validate_path
+from ..common import load_data_report
+from ..errors import LoadDataError
+
+def test_demo_ledger(year : int, data_path : Path, debug : bool = False):
+  if debug: print(f"Validating the month files of {data_path} against config.json")
+
+  report = validate_path(data_path, years=[year])
+  if debug:
+    print(f"{report['files']} files, {report['rows']} rows")
+    for issue in report["issues"]:
+      print(issue)
+
+  if report["files"] > 0 and not report["issues"]:
+    print(f"[OK] - {sys.argv[0]} test_demo_ledger")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_demo_ledger")
+
+def count_rows(csv_path):
+  with open(csv_path) as f:
+    return len(f.readlines()) - 1 # without the header
+
+def test_invalid_rows(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing the file and line of invalid rows")
+
+  with tempfile.TemporaryDirectory() as tmp:
+    shutil.copytree(f"{data_path}/{year}", f"{tmp}/{year}")
+    march = f"{tmp}/{year}/cashflow/{year}-03_cashflow.csv"
+    april = f"{tmp}/{year}/cashflow/{year}-04_cashflow.csv"
+    invest = f"{tmp}/{year}/investments/{year}-01_investments.csv"
+
+    lines = count_rows(march) # line of the first appended row
+    april_line = count_rows(april)
+    with open(march, "a") as f:
+      f.write(f"{year}-03-02,Hype,EUR,-10,Groceris,Diet,typo\n")
+      f.write(f"{year}-03-02,Hype,EUR,-10,Groceries,Gym,wrong subcategory\n")
+      f.write(f"{year}-03-02,Hype,GBP,-10,Groceries,Diet,wrong coin\n")
+      f.write(f"{year}-04-02,Hype,EUR,-10,Groceries,Diet,next month\n")
+      f.write(f"{year}-03-02,Hype,EUR,ten,Groceries,Diet,not a number\n")
+    with open(april, "a") as f:
+      f.write(f"02/04/{year},Hype,EUR,-10,Groceries,Diet,bad date\n")
+    with open(invest, "w") as f:
+      f.write("Date,Type,Qty,Category,Subcategory,Description\n")
+
+    expected = {
+      (march, lines, "Category"), (march, lines + 1, "Subcategory"), (march, lines + 2, "Coin"),
+      (march, lines + 3, "Date"), (march, lines + 4, "Qty"),
+      (april, april_line, "Date"), (invest, -1, "columns"),
+    }
+
+    report = validate_path(tmp, years=[year])
+    found = {(i["file"], i["line"], i["field"]) for i in report["issues"]}
+    ok = found == expected
+    if debug:
+      for issue in report["issues"]:
+        print(issue)
+
+    # also reported while loading, the april file which does not parse included
+    loaded = set()
+    for typedata in ["cashflow", "investments"]:
+      try:
+        _, errors = load_data_report(typedata, tmp, year, use_snapshot=False, workers=1)
+      except LoadDataError as e:
+        errors = e.errors
+      loaded |= {(e["file"], e["line"], e["field"]) for e in errors if e["kind"] == "invalid"}
+    ok = ok and loaded == expected
+    if debug: print(f"Load errors: {sorted(loaded - expected)} unexpected, {sorted(expected - loaded)} missing")
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_invalid_rows")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_invalid_rows")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+  year = 2025
+  data_path = Path("demo")
+
+  test_demo_ledger(year=year, data_path=data_path, debug=debug)
+  test_invalid_rows(year=year, data_path=data_path, debug=debug)
@@ -0,0 +1,60 @@
+# TESTING UTILITY FOR LEDGER_WRITER.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_ledger_writer --debug
+import sys # for debug flag
+import shutil
+import tempfile
+
+from ..common import load_data
+from ..ledger_writer import append_rows
+from ..ledger_writer import LEDGER_COLUMNS
+
+from pathlib import Path
+
+def test_append_rows(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing append only writes")
+
+  with tempfile.TemporaryDirectory() as tmp:
+    shutil.copytree(f"{data_path}/{year}", f"{tmp}/{year}")
+    csv_path = f"{tmp}/{year}/cashflow/{year}-03_cashflow.csv"
+    with open(csv_path) as f:
+      original = f.read()
+    rows_before = len(load_data("cashflow", tmp, year))
+
+    rows = [
+      {"Date": f"{year}-03-{day:02d}", "Type": "Hype", "Coin": "EUR", "Qty": -1.25, "Category": "Groceries", "Subcategory": "Food", "Description": "bread, milk"}
+      for day in range(1, 11)
+    ]
+    appended = append_rows(csv_path, rows[:1], LEDGER_COLUMNS["cashflow"], fsync=True)
+    appended += append_rows(csv_path, rows[1:], LEDGER_COLUMNS["cashflow"], fsync=False) # bulk variant
+
+    # new month file gets a header
+    new_path = f"{tmp}/{year+1}/cashflow/{year+1}-01_cashflow.csv"
+    append_rows(new_path, rows[:1], LEDGER_COLUMNS["cashflow"], fsync=False)
+
+    with open(csv_path) as f:
+      updated = f.read()
+    df = load_data("cashflow", tmp, year)
+    with open(new_path) as f:
+      new_lines = f.read().splitlines()
+
+  if debug:
+    print(updated[len(original):])
+    print(new_lines)
+
+  ok = appended == 10 and updated.startswith(original)
+  ok = ok and len(df) == rows_before + 10
+  ok = ok and (df["Description"] == "bread, milk").sum() == 10
+  ok = ok and new_lines[0] == ",".join(LEDGER_COLUMNS["cashflow"]) and len(new_lines) == 2
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_append_rows")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_append_rows")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+  year = 2025
+  data_path = Path("demo")
+
+  test_append_rows(year=year, data_path=data_path, debug=debug)
@@ -4,6 +4,7 @@ import sys # for debug flag
 
 from ..common import load_init_holdings
 from ..common import load_data
+from ..common import load_data_report
 from ..common import found_cache_files
 
 from pathlib import Path
@@ -34,10 +35,28 @@ def test_load_data(year : int, data_path : Path, debug : bool = False):
   else:
     print(f"[OK] - {sys.argv[0]} test_load_data")
 
+def test_parallel_load(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing parallel load against sequential load")
+
+  ok = True
+  for typedata in ["cashflow", "investments"]:
+    df_seq, errors_seq = load_data_report(typedata, data_path, year, use_snapshot=False, workers=1)
+    df_par, errors_par = load_data_report(typedata, data_path, year, use_snapshot=False, workers=4)
+    if debug: print(f"{typedata}: {len(df_seq)} rows, errors {[(e['month'], e['kind']) for e in errors_par]}")
+    ok = ok and df_seq.equals(df_par) and errors_seq == errors_par
+    ok = ok and all(isinstance(e, dict) and e["kind"] in ["missing", "parse", "invalid"] for e in errors_par)
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_parallel_load")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_parallel_load")
+
 
 if __name__ == "__main__":
   debug = "--debug" in sys.argv[1:]
   year = 2026
   data_path = Path("../data")
 
+  # on the demo data, first: test_load_data needs a ../data folder
+  test_parallel_load(year=2025, data_path=Path("demo"), debug=debug)
   test_load_data(year=year, data_path=data_path, debug=debug)
\ No newline at end of file
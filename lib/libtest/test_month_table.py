@@ -0,0 +1,97 @@
+# TESTING UTILITY FOR MONTH_TABLE.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_month_table --debug
+import sys # for debug flag
+import glob
+import shutil
+import tempfile
+
+from tabulate import tabulate
+
+from .. import month_table
+from ..month_table import MonthTableCache, read_month_table, parse_sort, select_rows, psql_lines, strip_cells
+
+from pathlib import Path
+
+def test_psql_lines(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing streamed tables against tabulate")
+
+  ok = True
+  for csv_path in sorted(glob.glob(f"{data_path}/{year}/*/*.csv")):
+    df = read_month_table(csv_path)
+    if df.empty:
+      continue
+    expected = tabulate(df, headers='keys', tablefmt='psql', showindex=True)
+    streamed = "".join(psql_lines(df, chunk_rows=3))
+    ok = ok and streamed == expected
+    if debug and streamed != expected:
+      print(expected)
+      print(streamed)
+
+  # the first rows go out before the others are formatted
+  df = read_month_table(f"{data_path}/{year}/cashflow/{year}-07_cashflow.csv")
+  formatted = list()
+  aligned_cells = month_table.aligned_cells
+  month_table.aligned_cells = lambda values, kind, layout: formatted.append(len(values)) or aligned_cells(values, kind, layout)
+  try:
+    lines = psql_lines(df, chunk_rows=3)
+    next(lines) # header
+    next(lines) # first chunk
+  finally:
+    month_table.aligned_cells = aligned_cells
+  ok = ok and len(df) > 3 and formatted == [3] * (len(df.columns) + 1)
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_psql_lines")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_psql_lines")
+
+def test_month_table(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing cached month files, filters, sorting and pages")
+
+  with tempfile.TemporaryDirectory() as tmp:
+    csv_path = f"{tmp}/{year}-07_cashflow.csv"
+    shutil.copy(f"{data_path}/{year}/cashflow/{year}-07_cashflow.csv", csv_path)
+    cache = MonthTableCache()
+    df = cache.get(csv_path)
+    ok = cache.get(csv_path) is df and cache.get_stats()["hits"] == 1
+
+    # filtered, sorted and paged rows keep their line number
+    page, total = select_rows(df, {"Type": ["revolut", "BBVA"]}, parse_sort("-Qty,Date"), offset=1, limit=3)
+    expected = df.loc[df["Type"].isin(["Revolut", "BBVA"])].sort_values(["Qty", "Date"], ascending=[False, True], kind="stable")
+    ok = ok and total == len(expected) and page.index.tolist() == expected.index[1:4].tolist()
+
+    # the rows of a filter match the filter once stripped, e.g. "EUR " -> "EUR"
+    page, _ = select_rows(df, {"Category": ["Groceries"]})
+    stripped = strip_cells(page)
+    ok = ok and not page.empty and (page["Coin"] != "EUR").all() # padded in the file
+    ok = ok and (stripped["Category"] == "Groceries").all() and (stripped["Coin"] == "EUR").all()
+    ok = ok and stripped.index.equals(page.index) and stripped["Qty"].equals(page["Qty"])
+
+    # a rewritten file is parsed again
+    with open(csv_path, "a") as file:
+      file.write(f"{year}-07-30,Hype,EUR,-1,Leisure,Food,\n")
+    ok = ok and len(cache.get(csv_path)) == len(df) + 1
+    ok = ok and cache.get(f"{tmp}/missing.csv") is None
+
+    try:
+      select_rows(df, sort=parse_sort("Foo"))
+      ok = False
+    except ValueError:
+      pass
+
+  if debug:
+    print(page)
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_month_table")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_month_table")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+  year = 2025
+  data_path = Path("demo")
+
+  test_psql_lines(year=year, data_path=data_path, debug=debug)
+  test_month_table(year=year, data_path=data_path, debug=debug)
@@ -0,0 +1,55 @@
+# TESTING UTILITY FOR PRICE_STORE.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_price_store --debug
+import sys # for debug flag
+import tempfile
+
+import pandas as pd
+
+from ..price_store import PriceStore
+
+def monthly(start, periods, first_close):
+  index = pd.date_range(start=start, periods=periods, freq="ME", name="Date")
+  return pd.DataFrame({"Close": [first_close + i for i in range(periods)]}, index=index)
+
+def test_append_and_range(debug : bool = False):
+  if debug: print("Testing append only updates, range reads and backfill")
+
+  with tempfile.TemporaryDirectory() as tmp:
+    store = PriceStore(tmp)
+    appended = store.append("SOL-EUR", monthly("2024-01-31", 12, 100.0))
+    appended_again = store.append("SOL-EUR", monthly("2024-06-30", 12, 500.0)) # 7 months overlap, 5 new ones
+    df_2025 = store.read("SOL-EUR", "2024-12-31", "2025-05-31")
+
+    # older history merged in front, stored rows are kept
+    merged = store.merge("SOL-EUR", monthly("2023-10-31", 6, 0.0))
+    first, last = store.date_range("SOL-EUR")
+    df_all = store.read("SOL-EUR")
+
+    # legacy per year csv file
+    legacy_csv = f"{tmp}/ETH-EUR.csv"
+    monthly("2024-12-31", 4, 7.0).to_csv(legacy_csv)
+    store.import_legacy_csv("ETH-EUR", legacy_csv)
+    store.mark_covered_from("ETH-EUR", "2020-01-01")
+    covered = store.covered_from("ETH-EUR")
+
+  if debug:
+    print(df_2025)
+    print(df_all)
+
+  ok = appended == 12 and appended_again == 5
+  ok = ok and list(df_2025["Close"]) == [111.0, 507.0, 508.0, 509.0, 510.0, 511.0]
+  ok = ok and merged == 20 and first == pd.Timestamp("2023-10-31") and last == pd.Timestamp("2025-05-31")
+  ok = ok and df_all.index.is_monotonic_increasing and df_all.loc["2024-01-31", "Close"] == 100.0
+  ok = ok and covered == pd.Timestamp("2020-01-01")
+  ok = ok and store.read("BTC-EUR").empty
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_append_and_range")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_append_and_range")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+
+  test_append_and_range(debug=debug)
@@ -0,0 +1,64 @@
+# TESTING UTILITY FOR QUERY_ENGINE.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_query_engine --debug
+import sys # for debug flag
+
+import pandas as pd
+
+from ..common import load_data
+from ..query_engine import parse_query, run_query
+
+from pathlib import Path
+
+def test_query_engine(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing generic queries against hand written filters")
+
+  df = load_data("cashflow", data_path, year)
+  default_start, default_end = f"{year}-01-01", f"{year}-12-31"
+
+  # weekly spend of a category on an account in Q2
+  args = {"start": [f"{year}-04-01"], "end": [f"{year}-06-30"], "Category": ["Groceries"], "Type": ["BBVA"], "sign": ["out"], "period": ["w"]}
+  query = parse_query(args, default_start, default_end)
+  result = run_query(df, query)
+  rows = df.loc[(df.index >= f"{year}-04-01") & (df.index <= f"{year}-06-30") & (df["Category"] == "Groceries") & (df["Type"] == "BBVA") & (df["Qty"] < 0)]
+  expected = rows["Qty"].resample("W").sum()
+  ok = query.period == "W" and result["Qty"].round(2).tolist() == expected.round(2).tolist()
+  ok = ok and result["Date"].tolist() == expected.index.strftime("%Y-%m-%d").tolist()
+
+  # the same question asked in another order is the same query
+  same = parse_query({"period": ["W"], "sign": ["OUT"], "Type": ["BBVA"], "Category": ["Groceries"], "end": [f"{year}-06-30"], "start": [f"{year}-04-01"]}, default_start, default_end)
+  ok = ok and same == query and hash(same) == hash(query)
+
+  # groups, lists of values and counts
+  query = parse_query({"Category": ["Groceries,Holiday"], "group": ["Category,Type"], "period": ["QE"], "agg": ["count"]}, default_start, default_end)
+  result = run_query(df, query)
+  rows = df.loc[df["Category"].isin(["Groceries", "Holiday"])]
+  ok = ok and int(result["Qty"].sum()) == len(rows) and set(result["Category"]) == {"Groceries", "Holiday"}
+
+  # grand total
+  query = parse_query({"sign": ["in"]}, default_start, default_end)
+  ok = ok and round(run_query(df, query)["Qty"].iloc[0], 2) == round(df.loc[df["Qty"] > 0, "Qty"].sum(), 2)
+
+  # bad arguments
+  bad = [{"period": ["X"]}, {"group": ["Symbol"]}, {"agg": ["median"]}, {"start": [f"{year}-05-01"], "end": [f"{year}-04-01"]}]
+  for args in bad:
+    try:
+      parse_query(args, default_start, default_end)
+      ok = False
+    except ValueError:
+      pass
+
+  if debug:
+    print(result)
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_query_engine")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_query_engine")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+  year = 2025
+  data_path = Path("demo")
+
+  test_query_engine(year=year, data_path=data_path, debug=debug)
@@ -0,0 +1,115 @@
+# TESTING UTILITY FOR QUOTE_CACHE.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_quote_cache --debug
+import sys # for debug flag
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from ..quote_cache import QuoteCache, DEFAULT_QUOTE_CONFIG, next_market_close, FRESH, STALE, MISSING
+from ..fetch_scheduler import FetchScheduler, FetchTask
+from ..errors import FetchError
+
+def quote(close):
+  return pd.DataFrame({"Close": [close]}, index=pd.Index([pd.Timestamp.now().normalize()], name="Date"))
+
+def wait_revalidation(cache):
+  for _ in range(200):
+    if not cache.revalidating:
+      return
+    time.sleep(0.01)
+
+def test_ttl_and_eviction(debug : bool = False):
+  if debug: print("Testing quote expiry, stale-while-revalidate and eviction")
+
+  settings = dict(DEFAULT_QUOTE_CONFIG, memory_entries=2, disk_entries=3)
+  with tempfile.TemporaryDirectory() as tmp:
+    cache = QuoteCache(tmp, settings)
+    cache.put("SOL", "EUR", quote(150.0))
+    now = datetime.now()
+    states = [
+      cache.lookup("Cryptocurrencies", "SOL", "EUR", now)[1],
+      cache.lookup("Cryptocurrencies", "SOL", "EUR", now + timedelta(seconds=120))[1],
+      cache.lookup("Cryptocurrencies", "SOL", "EUR", now + timedelta(hours=2))[1],
+      cache.lookup("Cryptocurrencies", "BTC", "EUR", now)[1],
+    ]
+
+    # stale quote refreshed in background
+    scheduler = FetchScheduler(host_limits={"q.test": (1000, 10)})
+    cache.revalidate("SOL", "EUR", scheduler, FetchTask(("Cryptocurrencies", "SOL"), "https://q.test/x", lambda: (quote(160.0), None)))
+    wait_revalidation(cache)
+    refreshed = float(cache.lookup("Cryptocurrencies", "SOL", "EUR")[0]["Close"].iloc[0])
+
+    # bounded memory and disk
+    for symbol in ["ETH", "USDT", "ADA", "DOT"]:
+      cache.put(symbol, "EUR", quote(1.0))
+      time.sleep(0.01) # distinct mtimes
+    memory_keys = list(cache.memory.keys())
+    disk_files = sorted(f.name for f in cache.cache_dir.glob("cache_*.csv"))
+
+    # a new instance reads the quotes of disk
+    disk_state = QuoteCache(tmp, settings).lookup("Cryptocurrencies", "DOT", "EUR")[1]
+
+  # friday 18:00 -> ETF quotes valid till monday close
+  friday = datetime(2025, 6, 6, 18, 0)
+  monday_close = next_market_close(friday, "17:35")
+
+  if debug:
+    print(states, refreshed, memory_keys, disk_files, disk_state, monday_close)
+
+  ok = states == [FRESH, STALE, MISSING, MISSING]
+  ok = ok and refreshed == 160.0
+  ok = ok and memory_keys == [("ADA", "EUR"), ("DOT", "EUR")]
+  ok = ok and disk_files == ["cache_ADA-EUR.csv", "cache_DOT-EUR.csv", "cache_USDT-EUR.csv"]
+  ok = ok and disk_state == FRESH
+  ok = ok and monday_close == datetime(2025, 6, 9, 17, 35)
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_ttl_and_eviction")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_ttl_and_eviction")
+
+def test_paced_revalidation(debug : bool = False):
+  if debug: print("Testing that background refreshes share the host bucket and the retries of the scheduler")
+
+  calls = list()
+  lock = threading.Lock()
+  def fake_fetch(symbol, fail_times=0):
+    with lock:
+      calls.append((symbol, time.monotonic()))
+      attempts = sum(1 for s, _ in calls if s == symbol)
+    if attempts <= fail_times:
+      raise FetchError(f"{symbol} failed", status=429)
+    return quote(200.0), None
+
+  limits = {"paced.test": (20, 1)} # one request every 50ms
+  with tempfile.TemporaryDirectory() as tmp:
+    cache = QuoteCache(tmp, dict(DEFAULT_QUOTE_CONFIG))
+    # a run empties the bucket, the refresh of another scheduler with the same limits waits for it
+    FetchScheduler(host_limits=limits).run([FetchTask(("ETFs", "RUN"), "https://paced.test/x", fake_fetch, "RUN")])
+    scheduler = FetchScheduler(host_limits=limits, backoff_base=0.01)
+    cache.revalidate("AAA", "EUR", scheduler, FetchTask(("ETFs", "AAA"), "https://paced.test/x", fake_fetch, "AAA", fail_times=1))
+    wait_revalidation(cache)
+    refreshed, state = cache.lookup("ETFs", "AAA", "EUR")
+
+  times = [t for _, t in calls]
+  min_gap = min(b - a for a, b in zip(times, times[1:]))
+  if debug: print([s for s, _ in calls], f"min gap {min_gap:.3f}s", state)
+
+  ok = [s for s, _ in calls] == ["RUN", "AAA", "AAA"] # retried after a 429
+  ok = ok and min_gap >= 0.04
+  ok = ok and state == FRESH and float(refreshed["Close"].iloc[0]) == 200.0
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_paced_revalidation")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_paced_revalidation")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+
+  test_ttl_and_eviction(debug=debug)
+  test_paced_revalidation(debug=debug)
@@ -0,0 +1,79 @@
+# TESTING UTILITY FOR RWLOCK.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_rwlock --debug
+import sys # for debug flag
+import time
+import threading
+
+from ..rwlock import RWLock
+
+def test_rwlock(debug : bool = False):
+  if debug: print("Testing concurrent readers and exclusive writers")
+
+  lock = RWLock()
+  events = list()
+  inside = {"readers": 0, "max_readers": 0, "writers": 0}
+  guard = threading.Lock()
+  ok = True
+
+  def reader(name):
+    with lock.read():
+      with lock.read(): # reentrant
+        with guard:
+          inside["readers"] += 1
+          inside["max_readers"] = max(inside["max_readers"], inside["readers"])
+        time.sleep(0.05)
+        with guard:
+          inside["readers"] -= 1
+          events.append((name, inside["writers"]))
+
+  def writer(name):
+    nonlocal ok
+    with lock.write():
+      with guard:
+        inside["writers"] += 1
+        ok = ok and inside["readers"] == 0
+      with lock.read(): # the writer reads what it writes
+        time.sleep(0.02)
+      with guard:
+        inside["writers"] -= 1
+        events.append((name, 0))
+
+  threads = [threading.Thread(target=reader, args=(f"r{i}",)) for i in range(4)]
+  for thread in threads:
+    thread.start()
+  time.sleep(0.01)
+  threads.append(threading.Thread(target=writer, args=("w",)))
+  threads[-1].start()
+  time.sleep(0.01)
+  # a reader arriving while the writer waits goes after it
+  threads.append(threading.Thread(target=reader, args=("late",)))
+  threads[-1].start()
+  for thread in threads:
+    thread.join()
+
+  names = [name for name, _ in events]
+  ok = ok and inside["max_readers"] == 4
+  ok = ok and all(writers == 0 for _, writers in events)
+  ok = ok and names.index("w") == 4 and names[-1] == "late"
+
+  try:
+    with lock.read():
+      with lock.write():
+        pass
+    ok = False
+  except RuntimeError:
+    pass
+
+  if debug:
+    print(names, inside)
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_rwlock")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_rwlock")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+
+  test_rwlock(debug=debug)
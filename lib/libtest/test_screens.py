@@ -0,0 +1,74 @@
+# TESTING UTILITY FOR SCREENS.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_screens --debug
+import sys # for debug flag
+
+from ..month_table import read_month_table, select_rows, parse_sort
+from ..screens import format_amount, dashboard_screen, month_screen, row_summary, parse_batch, MAX_BATCH_REQUESTS
+
+from pathlib import Path
+
+def test_screens(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing render-ready screens")
+
+  ok = [format_amount(v) for v in [1234.5, 12.0, -3874.19, 0.004]] == ["1234.50", "12", "-3874.19", "0"]
+
+  status = {"networth": 100.0, "liquidity": 40.0, "investments": 60.0, "nwch": -2.5, "ch%": -0.02}
+  screen = dashboard_screen(status, {"Revolut": 10.0, "BBVA": 30.0})
+  ok = ok and screen["summary"][0] == ["Net Worth", "€100"] and screen["summary"][4] == ["Percentage Change", "-0.02%"]
+  ok = ok and [account for account, _ in screen["accounts"]] == ["BBVA", "Revolut"]
+
+  # every table line of a sorted page points at the file line of its row
+  df = read_month_table(f"{data_path}/{year}/cashflow/{year}-07_cashflow.csv")
+  page, total = select_rows(df, sort=parse_sort("-Qty"), limit=5)
+  screen = month_screen(page, "cashflow", total, len(df))
+  rows = [entry for entry in screen["lines"] if entry["line"] >= 0]
+  ok = ok and screen["count"] == len(df) and len(screen["lines"]) == len(page) + 4
+  ok = ok and [entry["line"] for entry in rows] == page.index.tolist()
+  ok = ok and all(entry["text"].startswith(f"| {line:>2} |") for entry, line in zip(rows, page.index))
+  ok = ok and all(entry["summary"] == row_summary(df.loc[entry["line"]], "cashflow") for entry in rows)
+  # summaries without the padding of the file: "Groceries  " -> "Groceries"
+  ok = ok and all(entry["summary"] == ", ".join(str(value).strip() for value in df.loc[entry["line"], ["Date", "Type", "Coin", "Qty", "Category", "Subcategory"]])
+                  for entry in rows)
+
+  if debug:
+    for entry in screen["lines"]:
+      print(f"{entry['line']:3} {entry['text']}")
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_screens")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_screens")
+
+def test_parse_batch(debug : bool = False):
+  if debug: print("Testing batch requests parsing")
+
+  parsed = parse_batch({"session": "2025", "requests": [
+    {"path": "dashboard_status"},
+    {"method": "post", "path": "/delete_row", "args": {"line_number": 3, "session": "2024"}},
+    {"path": "/view_database?data_type=cashflow&month=3", "args": {"month": 4}},
+  ]})
+  ok = parsed == [("GET", "/dashboard_status", {"session": "2025"}), ("POST", "/delete_row", {"line_number": "3", "session": "2024"}),
+                  ("GET", "/view_database", {"data_type": "cashflow", "month": "4", "session": "2025"})]
+
+  for payload in [None, {"requests": "x"}, {"requests": [{"path": "/batch"}]}, {"requests": [{"path": "/shutdown"}]}, {"requests": [{"path": "/batch?x=1"}]},
+                  {"requests": [{"method": "PUT", "path": "/add_data"}]}, {"requests": [{}]},
+                  {"requests": [{"path": "/"}] * (MAX_BATCH_REQUESTS + 1)}]:
+    try:
+      parse_batch(payload)
+      ok = False
+    except ValueError as e:
+      if debug: print(e)
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_parse_batch")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_parse_batch")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+  year = 2025
+  data_path = Path("demo")
+
+  test_screens(year=year, data_path=data_path, debug=debug)
+  test_parse_batch(debug=debug)
@@ -0,0 +1,130 @@
+# TESTING UTILITY FOR SESSION_CACHE.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_session_cache --debug
+import sys # for debug flag
+
+import numpy as np
+import pandas as pd
+
+from ..session_cache import Session, SessionCache, session_key, parse_session_key
+from ..ledger import Ledger
+from ..flaskwrapper import FlaskWrapper
+from ..errors import SessionError
+
+from pathlib import Path
+
+def make_session(year, data_path, rows):
+  session = Session(year, data_path)
+  session.nw_global = pd.DataFrame({"networth": np.zeros(rows)})
+  return session
+
+def test_session_cache(data_path : Path, debug : bool = False):
+  if debug: print("Testing LRU and memory bound eviction of sessions")
+
+  # bounded by count, least recently used first
+  cache = SessionCache(max_sessions=2, max_memory_mb=10)
+  for year in [2023, 2024, 2025]:
+    cache.put(make_session(year, data_path, 10))
+  ok = list(cache.sessions.keys()) == [session_key(data_path, 2024), session_key(data_path, 2025)]
+  ok = ok and cache.active_key == session_key(data_path, 2025)
+
+  cache.activate(session_key(data_path, 2024)) # switching back is a lookup
+  cache.put(make_session(2026, data_path, 10), activate=False)
+  ok = ok and session_key(data_path, 2024) in cache.sessions and session_key(data_path, 2025) not in cache.sessions
+  ok = ok and cache.get().year == 2024
+
+  # bounded by memory, the active session is kept even when alone above the bound
+  cache = SessionCache(max_sessions=4, max_memory_mb=1)
+  cache.put(make_session(2024, data_path, 100000)) # 800 KB
+  cache.put(make_session(2025, data_path, 100000))
+  ok = ok and list(cache.sessions.keys()) == [session_key(data_path, 2025)]
+  cache.put(make_session(2023, data_path, 200000), activate=False)
+  ok = ok and list(cache.sessions.keys()) == [session_key(data_path, 2025)]
+
+  # keys
+  ok = ok and parse_session_key("2024", data_path) == session_key(data_path, 2024)
+  ok = ok and parse_session_key(f"{data_path}:2024") == session_key(data_path, 2024)
+  ok = ok and len(cache.of_path(data_path)) == 1
+
+  if debug:
+    print(cache.get_stats())
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_session_cache")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_session_cache")
+
+def test_remeasure(data_path : Path, debug : bool = False):
+  if debug: print("Testing the bounds after a session grew")
+
+  # a session which grew after put is measured again and evicted
+  cache = SessionCache(max_sessions=4, max_memory_mb=1)
+  grown = make_session(2024, data_path, 10)
+  cache.put(grown, activate=False)
+  cache.put(make_session(2025, data_path, 10))
+  grown.nw_global = pd.DataFrame({"networth": np.zeros(200000)}) # 1.6 MB
+  ok = session_key(data_path, 2024) in cache.sessions
+  cache.remeasure(grown)
+  ok = ok and list(cache.sessions.keys()) == [session_key(data_path, 2025)] and grown.nbytes > cache.max_bytes
+
+  # years parsed on demand by the ledger count
+  cache = SessionCache(max_sessions=4, max_memory_mb=64)
+  session = make_session(2025, data_path, 10)
+  session.ledger = Ledger(data_path, workers=1)
+  session.ledger.on_load = lambda: cache.remeasure(session)
+  cache.put(session)
+  before = session.nbytes
+  df = session.ledger.partition("cashflow", 2025)
+  ok = ok and session.nbytes >= before + df.memory_usage(deep=True).sum()
+  if debug: print(before, session.nbytes)
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_remeasure")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_remeasure")
+
+def test_memoized_views(data_path : Path, debug : bool = False):
+  if debug: print("Testing memoized views against the dataset version")
+
+  session = Session(2025, data_path)
+  calls = []
+  def compute(month):
+    calls.append(month)
+    return month * 10
+
+  values = [session.memo(("expenses", month), lambda: compute(month)) for month in [1, 2, 1, 1, 2]]
+  ok = values == [10, 20, 10, 10, 20] and calls == [1, 2]
+
+  session.bump() # a write
+  ok = ok and session.memo(("expenses", 1), lambda: compute(1)) == 10 and calls == [1, 2, 1]
+
+  # a write while a view is computed, the result is not kept
+  def compute_during_write():
+    session.bump()
+    return "stale"
+  session.memo(("status",), compute_during_write)
+  ok = ok and session.memo(("status",), lambda: "fresh") == "fresh"
+  ok = ok and session.view_stats == {"hits": 3, "misses": 5}
+
+  # before any initialize: a clear error, not an AttributeError of the missing session
+  try:
+    FlaskWrapper(SessionCache()).get_nw_status()
+    ok = False
+  except SessionError as e:
+    ok = ok and str(e) == "No session initialized"
+
+  if debug:
+    print(session.view_stats, calls)
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_memoized_views")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_memoized_views")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+  data_path = Path("demo")
+
+  test_session_cache(data_path=data_path, debug=debug)
+  test_remeasure(data_path=data_path, debug=debug)
+  test_memoized_views(data_path=data_path, debug=debug)
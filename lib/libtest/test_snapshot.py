@@ -0,0 +1,93 @@
+# TESTING UTILITY FOR SNAPSHOT.PY METHODS
+# Run this test with: $ python3 -m lib.libtest.test_snapshot --debug
+import sys # for debug flag
+import os
+import shutil
+import tempfile
+
+from .. import common
+from ..common import load_data, load_month
+from ..snapshot import get_snapshot_stats
+from ..snapshot import reset_snapshot_stats
+
+from pathlib import Path
+import pandas as pd
+
+def test_snapshot_hits(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing snapshot cache hits and invalidation")
+
+  with tempfile.TemporaryDirectory() as tmp:
+    shutil.copytree(f"{data_path}/{year}", f"{tmp}/{year}")
+    reset_snapshot_stats()
+
+    df_parsed = load_data("cashflow", tmp, year, use_snapshot=False)
+    df_first = load_data("cashflow", tmp, year) # builds the snapshots
+    stats_first = get_snapshot_stats()
+    df_second = load_data("cashflow", tmp, year) # served from snapshots
+    stats_second = get_snapshot_stats()
+
+    # touching a csv must invalidate only its own snapshot
+    csv_path = f"{tmp}/{year}/cashflow/{year}-01_cashflow.csv"
+    with open(csv_path, "a") as f:
+      f.write(f"{year}-01-31,Hype,EUR,-1.5,Groceries,Diet,appended\n")
+    df_third = load_data("cashflow", tmp, year)
+    stats_third = get_snapshot_stats()
+
+  if debug:
+    print(f"After first load: {stats_first}")
+    print(f"After second load: {stats_second}")
+    print(f"After editing one month: {stats_third}")
+
+  files = stats_first["misses"]
+  ok = stats_first["hits"] == 0 and stats_first["writes"] == files
+  ok = ok and stats_second["hits"] == files and stats_second["misses"] == files
+  ok = ok and stats_third["hits"] == 2*files - 1 and stats_third["misses"] == files + 1
+  ok = ok and df_first.equals(df_parsed) and df_second.equals(df_parsed)
+  ok = ok and len(df_third) == len(df_parsed) + 1
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_snapshot_hits")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_snapshot_hits")
+
+def test_write_during_parse(year : int, data_path : Path, debug : bool = False):
+  if debug: print("Testing a csv written between its parse and its snapshot")
+
+  with tempfile.TemporaryDirectory() as tmp:
+    shutil.copytree(f"{data_path}/{year}", f"{tmp}/{year}")
+    csv_path = f"{tmp}/{year}/cashflow/{year}-01_cashflow.csv"
+    parse_month_csv = common.parse_month_csv
+    def parse_then_append(typedata, filepath):
+      df = parse_month_csv(typedata, filepath)
+      with open(filepath, "a") as f:
+        f.write(f"{year}-01-31,Hype,EUR,-1.5,Groceries,Diet,appended\n")
+      return df
+    common.parse_month_csv = parse_then_append
+    try:
+      df_racing = load_month("cashflow", tmp, year, 1)
+    finally:
+      common.parse_month_csv = parse_month_csv
+    reset_snapshot_stats()
+    df_after = load_month("cashflow", tmp, year, 1)
+    stats = get_snapshot_stats()
+    df_parsed = load_month("cashflow", tmp, year, 1, use_snapshot=False)
+
+  if debug: print(len(df_racing), len(df_after), stats)
+
+  # the rows parsed before the append were not snapshotted as the appended file
+  ok = len(df_after) == len(df_racing) + 1 and df_after.equals(df_parsed)
+  ok = ok and stats["hits"] == 0 and stats["misses"] == 1
+
+  if ok:
+    print(f"[OK] - {sys.argv[0]} test_write_during_parse")
+  else:
+    print(f"[KO] - {sys.argv[0]} test_write_during_parse")
+
+
+if __name__ == "__main__":
+  debug = "--debug" in sys.argv[1:]
+  year = 2025
+  data_path = Path("demo")
+
+  test_snapshot_hits(year=year, data_path=data_path, debug=debug)
+  test_write_during_parse(year=year, data_path=data_path, debug=debug)
@@ -0,0 +1,163 @@
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Month files as the database views show them.
+# A month csv is parsed once and kept while its (mtime, size) does not change,
+# so browsing a month, counting its rows and reading one of them for the delete
+# confirmation share one parse. Rows keep their position in the file as index,
+# which is the line number /delete_row expects, also after filtering, sorting
+# and paging. Tables are rendered in the psql layout of tabulate chunk by chunk,
+# so a large page is streamed instead of built as one string.
+
+MAX_TABLES = 64
+STREAM_CHUNK_ROWS = 256
+
+def read_month_table(csv_path):
+    df = pd.read_csv(csv_path, skipinitialspace=True, na_filter=False)
+    df.columns = df.columns.str.strip()
+    # Strip whitespace from Date column if it exists
+    if 'Date' in df.columns:
+        df['Date'] = df['Date'].astype(str).str.strip()
+    return df
+
+class MonthTableCache:
+    def __init__(self, max_tables : int = MAX_TABLES):
+        self.max_tables = max_tables
+        self.tables = OrderedDict() # csv path -> ((mtime_ns, size), DataFrame)
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, csv_path):
+        """Parsed month file, None if it does not exist. Callers must not modify it"""
+        csv_path = str(csv_path)
+        try:
+            stat = os.stat(csv_path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self.tables.get(csv_path)
+            if entry is not None and entry[0] == signature:
+                self.tables.move_to_end(csv_path)
+                self.stats["hits"] += 1
+                return entry[1]
+            self.stats["misses"] += 1
+        df = read_month_table(csv_path)
+        with self.lock:
+            self.tables[csv_path] = (signature, df)
+            self.tables.move_to_end(csv_path)
+            while len(self.tables) > self.max_tables:
+                self.tables.popitem(last=False)
+        return df
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, tables=len(self.tables))
+
+def strip_value(value):
+    return value.strip() if isinstance(value, str) else value
+
+def strip_cells(df : pd.DataFrame):
+    """
+    Copy of df without the padding of its string cells, as the filters compare them.
+    For the JSON rows and the summaries, only the psql table keeps the file layout.
+    """
+    return df.apply(lambda column: column.map(strip_value) if column.dtype == object else column)
+
+def parse_sort(text : str):
+    """'Qty,-Date' -> [('Qty', True), ('Date', False)], a leading '-' sorts descending"""
+    keys = list()
+    for key in (text or "").split(","):
+        key = key.strip()
+        if key:
+            keys.append((key.lstrip("-"), not key.startswith("-")))
+    return keys
+
+def select_rows(df : pd.DataFrame, filters : dict = None, sort : list = None, offset : int = 0, limit : int = None):
+    """
+    Rows of df matching filters ({column: [values]}, stripped strings compared
+    case-insensitively), ordered by sort ([(column, ascending)]), then the page
+    [offset, offset + limit). Returns (page, number of matching rows).
+    """
+    mask = pd.Series(True, index=df.index)
+    for column, values in (filters or {}).items():
+        if column not in df.columns:
+            raise ValueError(f"Unknown column {column}, expected one of {list(df.columns)}")
+        wanted = [str(value).strip().lower() for value in values]
+        mask &= df[column].astype(str).str.strip().str.lower().isin(wanted)
+    selected = df.loc[mask]
+    if sort:
+        unknown = [column for column, _ in sort if column not in df.columns]
+        if unknown:
+            raise ValueError(f"Cannot sort by {unknown}, expected some of {list(df.columns)}")
+        selected = selected.sort_values([column for column, _ in sort], ascending=[ascending for _, ascending in sort], kind="stable")
+    total = len(selected)
+    end = None if limit is None else offset + limit
+    return selected.iloc[offset:end], total
+
+# Kinds of columns: floats are aligned on the decimal point, numbers on the right
+FLOAT = "float"
+NUMBER = "number"
+TEXT = "text"
+
+def column_kind(series : pd.Series):
+    if pd.api.types.is_float_dtype(series):
+        return FLOAT
+    if pd.api.types.is_integer_dtype(series):
+        return NUMBER
+    return TEXT
+
+def cell_texts(values, kind : str):
+    """Cell strings of a chunk of column values, before alignment"""
+    if kind == FLOAT:
+        return [format(value, "g") for value in values]
+    if kind == NUMBER:
+        return [str(value) for value in values]
+    return [str(value).strip() for value in values]
+
+def measure_column(values, kind : str, chunk_rows : int):
+    """(integer width, fraction width) of a column, the cells are formatted a chunk at a time and dropped"""
+    integer_width = fraction_width = 0
+    for start in range(0, len(values), chunk_rows):
+        texts = cell_texts(values[start:start + chunk_rows], kind)
+        if kind == FLOAT:
+            integer = [text.split(".")[0] for text in texts]
+            integer_width = max([integer_width] + [len(i) for i in integer])
+            fraction_width = max([fraction_width] + [len(text) - len(i) for text, i in zip(texts, integer)])
+        else:
+            integer_width = max([integer_width] + [len(text) for text in texts])
+    return integer_width, fraction_width
+
+def aligned_cells(values, kind : str, layout):
+    texts = cell_texts(values, kind)
+    if kind != FLOAT:
+        return texts
+    integer_width, fraction_width = layout
+    integer = [text.split(".")[0] for text in texts]
+    return [i.rjust(integer_width) + text[len(i):].ljust(fraction_width) for text, i in zip(texts, integer)]
+
+def psql_lines(df : pd.DataFrame, chunk_rows : int = STREAM_CHUNK_ROWS):
+    """
+    Generator of the tabulate psql rendering of df (index shown), chunk_rows rows at a time.
+    The column widths are measured in a first pass which keeps no cell, then every
+    chunk is formatted when it is yielded: the whole page is never held as text.
+    """
+    headers = [""] + [str(column) for column in df.columns]
+    columns = [(df.index.to_numpy(), NUMBER)] + [(df[column].to_numpy(), column_kind(df[column])) for column in df.columns]
+    layouts = [measure_column(values, kind, chunk_rows) for values, kind in columns]
+    # like tabulate, columns are at least two characters wider than their header
+    widths = [max(len(header) + 2, integer_width + fraction_width) for header, (integer_width, fraction_width) in zip(headers, layouts)]
+
+    def line(values, numeric):
+        return "| " + " | ".join(value.rjust(width) if right else value.ljust(width) for value, width, right in zip(values, widths, numeric)) + " |"
+
+    numeric = [kind != TEXT for _, kind in columns]
+    border = "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+    yield border + "\n" + line(headers, numeric) + "\n" + "|" + "+".join("-" * (width + 2) for width in widths) + "|\n"
+    for start in range(0, len(df), chunk_rows):
+        cells = [aligned_cells(values[start:start + chunk_rows], kind, layout) for (values, kind), layout in zip(columns, layouts)]
+        yield "".join(line(values, numeric) + "\n" for values in zip(*cells))
+    yield border
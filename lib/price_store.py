@@ -0,0 +1,141 @@
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .logger import Logger
+
+# Year independent store of market prices.
+# One binary segment per (symbol, resolution) under {path}/prices/{resolution}/,
+# made of fixed size (date, close) records sorted by date. Updates only append
+# records newer than the last one, and range reads memory map the segment and
+# binary search the dates, so a valuation reads only the rows of its period.
+#
+#   prices/1mo/SOL-EUR.bin    [(2021-01-31, 24.5), (2021-02-28, 52.1), ...]
+#   prices/1mo/SOL-EUR.from   2020-10-18 (optional, see mark_covered_from)
+
+PRICE_STORE_DIR = "prices"
+RESOLUTIONS = ("1mo", "1d")
+RECORD = np.dtype([("date", "<i8"), ("close", "<f8")]) # date as days since epoch
+
+_locks_guard = threading.Lock()
+_segment_locks = dict()
+
+def _lock_for(segment):
+    key = os.path.abspath(segment)
+    with _locks_guard:
+        if key not in _segment_locks:
+            _segment_locks[key] = threading.Lock()
+        return _segment_locks[key]
+
+def _to_days(index):
+    return pd.DatetimeIndex(index).values.astype("datetime64[D]").astype("<i8")
+
+def _to_records(df):
+    records = np.empty(len(df), dtype=RECORD)
+    records["date"] = _to_days(df.index)
+    records["close"] = df["Close"].to_numpy(dtype="<f8")
+    return records
+
+def _to_frame(records):
+    index = pd.DatetimeIndex(records["date"].astype("datetime64[D]").astype("datetime64[ns]"), name="Date")
+    return pd.DataFrame({"Close": np.asarray(records["close"])}, index=index)
+
+class PriceStore:
+    def __init__(self, path):
+        self.root = Path(path) / PRICE_STORE_DIR
+
+    def segment_path(self, symbol : str, resolution : str = "1mo"):
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution}, expected one of {RESOLUTIONS}")
+        return self.root / resolution / f"{symbol}.bin"
+
+    def _records(self, symbol, resolution):
+        segment = self.segment_path(symbol, resolution)
+        if not segment.exists() or segment.stat().st_size < RECORD.itemsize:
+            return None
+        count = segment.stat().st_size // RECORD.itemsize # ignores a torn trailing record
+        return np.memmap(segment, dtype=RECORD, mode="r", shape=(count,))
+
+    def has(self, symbol : str, resolution : str = "1mo"):
+        return self._records(symbol, resolution) is not None
+
+    def date_range(self, symbol : str, resolution : str = "1mo"):
+        """First and last stored date of symbol, (None, None) if not stored"""
+        records = self._records(symbol, resolution)
+        if records is None:
+            return None, None
+        first, last = _to_frame(records[[0, -1]]).index
+        return first, last
+
+    def read(self, symbol : str, start=None, end=None, resolution : str = "1mo"):
+        """Close prices of symbol between start and end (both included), indexed by Date"""
+        records = self._records(symbol, resolution)
+        if records is None:
+            return _to_frame(np.empty(0, dtype=RECORD))
+        dates = records["date"]
+        lo = 0 if start is None else int(np.searchsorted(dates, _to_days([pd.Timestamp(start)])[0], side="left"))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, _to_days([pd.Timestamp(end)])[0], side="right"))
+        return _to_frame(np.array(records[lo:hi]))
+
+    def append(self, symbol : str, df : pd.DataFrame, resolution : str = "1mo"):
+        """
+        Append the rows of df (Date index, Close column) newer than the last stored one.
+
+        Returns:
+            Number of appended rows
+        """
+        segment = self.segment_path(symbol, resolution)
+        with _lock_for(segment):
+            _, last = self.date_range(symbol, resolution)
+            df = df.sort_index()
+            if last is not None:
+                df = df.loc[df.index > last]
+            if df.empty:
+                return 0
+            segment.parent.mkdir(parents=True, exist_ok=True)
+            data = _to_records(df).tobytes()
+            fd = os.open(segment, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                written = 0
+                while written < len(data):
+                    written += os.write(fd, data[written:])
+            finally:
+                os.close(fd)
+        return len(df)
+
+    def merge(self, symbol : str, df : pd.DataFrame, resolution : str = "1mo"):
+        """Rewrite the segment with the union of stored and df rows, for history older than the stored one"""
+        segment = self.segment_path(symbol, resolution)
+        with _lock_for(segment):
+            merged = pd.concat([self.read(symbol, resolution=resolution), df.sort_index()[["Close"]]])
+            merged = merged[~merged.index.duplicated(keep="first")].sort_index() # stored rows win
+            segment.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = segment.with_name(f"{segment.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            _to_records(merged).tofile(tmp_path)
+            os.replace(tmp_path, segment)
+        return len(merged)
+
+    # A full download may start later than requested (symbol listed afterwards),
+    # the earliest requested date is kept beside the segment so that it is not
+    # downloaded again on every valuation of older years.
+    def mark_covered_from(self, symbol : str, since, resolution : str = "1mo"):
+        marker = self.segment_path(symbol, resolution).with_suffix(".from")
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.write_text(pd.Timestamp(since).strftime("%Y-%m-%d"))
+
+    def covered_from(self, symbol : str, resolution : str = "1mo"):
+        """Earliest date the stored history of symbol answers for, None if not stored"""
+        first, _ = self.date_range(symbol, resolution)
+        marker = self.segment_path(symbol, resolution).with_suffix(".from")
+        if first is None or not marker.exists():
+            return first
+        return min(first, pd.Timestamp(marker.read_text().strip()))
+
+    def import_legacy_csv(self, symbol : str, csv_path, resolution : str = "1mo"):
+        """Load a {YEAR}/investments/exchange/{symbol}.csv file of the older layout into the store"""
+        df = pd.read_csv(csv_path, index_col=0, parse_dates=True)
+        Logger.info(f"Importing {csv_path} into the price store")
+        return self.merge(symbol, df, resolution)
@@ -0,0 +1,118 @@
+from typing import NamedTuple
+
+import pandas as pd
+
+# Generic queries over the ledger rows.
+# A query is parsed from the request arguments into a normalized Query (sorted
+# filters, canonical period and dates), which is also the key its result is
+# memoized under: the same question asked with the arguments in another order
+# or case hits the same cache entry.
+#
+#   /query?data_type=cashflow&start=2025-04-01&end=2025-06-30&Category=Leisure&Type=Revolut&sign=out&period=W&agg=sum
+#
+#   Date        Qty
+#   2025-04-06  -25.0
+#   2025-04-13  -40.5
+
+PERIODS = ["D", "W", "ME", "QE", "YE"]
+PERIOD_ALIASES = {"M": "ME", "Q": "QE", "Y": "YE", "A": "YE"}
+AGGREGATIONS = ["sum", "mean", "count", "min", "max"]
+SIGNS = ["in", "out"] # Qty > 0, Qty < 0
+QUERY_COLUMNS = {
+    "cashflow": ["Type", "Coin", "Category", "Subcategory", "Description"],
+    "investments": ["Type", "Symbol", "Category", "Subcategory", "Description"],
+}
+
+class Query(NamedTuple):
+    data_type : str
+    start : str
+    end : str
+    filters : tuple # ((column, (value, ...)), ...) sorted by column
+    group : tuple # columns
+    period : str # one of PERIODS or None
+    agg : str
+    sign : str # one of SIGNS or None
+    search : str # lowercase substring of Description or None
+
+def parse_query(args, default_start, default_end):
+    """
+    Normalized Query from request arguments (a dict of lists, like MultiDict.to_dict(flat=False)).
+    Raises ValueError on unknown values.
+    """
+    def first(name, default=None):
+        values = args.get(name)
+        return values[0] if values else default
+
+    data_type = first("data_type", "cashflow")
+    if data_type not in QUERY_COLUMNS:
+        raise ValueError(f"Unknown data_type {data_type}, expected cashflow or investments")
+    columns = QUERY_COLUMNS[data_type]
+
+    start = pd.Timestamp(first("start", default_start)).normalize()
+    end = pd.Timestamp(first("end", default_end)).normalize()
+    if end < start:
+        raise ValueError(f"end {end.date()} is before start {start.date()}")
+
+    filters = list()
+    for column in columns:
+        values = [value.strip() for raw in args.get(column, []) for value in raw.split(",") if value.strip()]
+        if values:
+            filters.append((column, tuple(sorted(set(values)))))
+
+    group = tuple(column.strip() for raw in args.get("group", []) for column in raw.split(",") if column.strip())
+    unknown = [column for column in group if column not in columns]
+    if unknown:
+        raise ValueError(f"Cannot group by {unknown}, expected some of {columns}")
+
+    period = first("period")
+    if period:
+        period = PERIOD_ALIASES.get(period.upper(), period.upper())
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period {period}, expected one of {PERIODS}")
+
+    agg = first("agg", "sum").lower()
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation {agg}, expected one of {AGGREGATIONS}")
+
+    sign = first("sign")
+    if sign and sign.lower() not in SIGNS:
+        raise ValueError(f"Unknown sign {sign}, expected one of {SIGNS}")
+
+    search = first("search")
+    return Query(data_type, start.date().isoformat(), end.date().isoformat(), tuple(filters), group,
+                 period or None, agg, sign.lower() if sign else None, search.lower() if search else None)
+
+def run_query(df : pd.DataFrame, query : Query):
+    """Filter, group and resample the rows of df (Date index) as query says, the Qty column is aggregated"""
+    start, end = pd.Timestamp(query.start), pd.Timestamp(query.end) + pd.Timedelta(days=1)
+    mask = (df.index >= start) & (df.index < end)
+    for column, values in query.filters:
+        mask &= df[column].isin(values).to_numpy()
+    qty = df["Qty"].to_numpy(dtype="float64")
+    if query.sign == "in":
+        mask &= qty > 0
+    elif query.sign == "out":
+        mask &= qty < 0
+    if query.search:
+        mask &= df["Description"].astype(str).str.lower().str.contains(query.search, regex=False).to_numpy()
+    df = df.loc[mask]
+
+    keys = list()
+    if query.period:
+        keys.append(pd.Grouper(level=0, freq=query.period))
+    keys += [df[column].astype(str) for column in query.group]
+
+    if not keys:
+        value = df["Qty"].agg(query.agg)
+        return pd.DataFrame({"Qty": [float(value) if not pd.isna(value) else None]})
+
+    result = df["Qty"].groupby(keys, sort=True).agg(query.agg).reset_index()
+    if query.period:
+        result["Date"] = result["Date"].dt.strftime("%Y-%m-%d")
+    result["Qty"] = result["Qty"].astype("float64")
+    return result
+
+def query_records(result : pd.DataFrame):
+    """JSON ready rows, NaN as None"""
+    result = result.astype(object).where(result.notna(), None)
+    return result.to_dict(orient="records")
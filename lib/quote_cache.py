@@ -0,0 +1,181 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from .logger import Logger
+from .common import load_config
+
+# Cache of the "today" quotes (one row DataFrames) used for the real time holdings.
+# Quotes live in an in-memory LRU in front of the cache/cache_{symbol}-{currency}.csv
+# files, and expire per asset class:
+#   - crypto trades all day long, quotes are fresh for a few seconds (ttl)
+#   - ETF quotes only change during market hours, they are fresh until the next
+#     market close after the moment they were fetched
+# An expired quote younger than max_stale is still served while it is refreshed
+# in background (stale-while-revalidate), older ones are fetched again.
+
+DEFAULT_QUOTE_CONFIG = {
+    "ttl": {"Cryptocurrencies": 60},
+    "market_close": {"ETFs": "17:35"},
+    "max_stale": 900,
+    "memory_entries": 256,
+    "disk_entries": 512,
+}
+
+FRESH = "fresh"
+STALE = "stale"
+MISSING = "missing"
+
+def quote_config():
+    config = load_config() or {}
+    settings = dict(DEFAULT_QUOTE_CONFIG)
+    settings.update(config.get("quotes", {}))
+    return settings
+
+def next_market_close(moment : datetime, close_time : str):
+    """First weekday close time strictly after moment"""
+    hour, minute = (int(x) for x in close_time.split(":"))
+    close = moment.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if close <= moment:
+        close += timedelta(days=1)
+    while close.weekday() >= 5: # saturday, sunday
+        close += timedelta(days=1)
+    return close
+
+class QuoteCache:
+    def __init__(self, cache_dir, settings=None):
+        self.cache_dir = Path(cache_dir)
+        self.settings = settings or quote_config()
+        self.memory = OrderedDict() # (symbol, currency) -> (DataFrame, fetched_at)
+        self.lock = threading.Lock()
+        self.revalidating = set()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="quote")
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0}
+
+    def file_path(self, symbol, currency):
+        return self.cache_dir / f"cache_{symbol}-{currency}.csv"
+
+    def expires_at(self, asset_class, fetched_at : datetime):
+        close_time = self.settings["market_close"].get(asset_class)
+        if close_time is not None:
+            return next_market_close(fetched_at, close_time)
+        return fetched_at + timedelta(seconds=self.settings["ttl"].get(asset_class, 60))
+
+    def _remember(self, key, df, fetched_at):
+        with self.lock:
+            self.memory[key] = (df, fetched_at)
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.settings["memory_entries"]:
+                self.memory.popitem(last=False)
+
+    def _read_disk(self, key):
+        csv_path = self.file_path(*key)
+        try:
+            fetched_at = datetime.fromtimestamp(os.stat(csv_path).st_mtime)
+            df = pd.read_csv(csv_path)
+        except (OSError, ValueError):
+            return None
+        df['Date'] = pd.to_datetime(df['Date'])
+        df.set_index('Date', inplace=True)
+        return df, fetched_at
+
+    def lookup(self, asset_class, symbol, currency, now : datetime = None):
+        """
+        Return (DataFrame or None, state) with state one of FRESH, STALE, MISSING.
+        STALE quotes are expired but young enough to be served while revalidating.
+        """
+        now = now or datetime.now()
+        key = (symbol, currency)
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+        source = "memory_hits"
+        if entry is None:
+            entry = self._read_disk(key)
+            source = "disk_hits"
+            if entry is not None:
+                self._remember(key, *entry)
+
+        state = MISSING
+        if entry is not None:
+            expires_at = self.expires_at(asset_class, entry[1])
+            if now < expires_at:
+                state = FRESH
+            elif now < expires_at + timedelta(seconds=self.settings["max_stale"]):
+                state = STALE
+        with self.lock:
+            self.stats[{FRESH: source, STALE: "stale_hits", MISSING: "misses"}[state]] += 1
+        if state == MISSING:
+            return None, MISSING
+        return entry[0].copy(), state
+
+    def put(self, symbol, currency, df : pd.DataFrame):
+        """Store a freshly fetched quote in memory and on disk"""
+        fetched_at = datetime.now()
+        self._remember((symbol, currency), df.copy(), fetched_at)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        csv_path = self.file_path(symbol, currency)
+        tmp_path = csv_path.with_name(f"{csv_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        df[["Close"]].to_csv(tmp_path)
+        os.replace(tmp_path, csv_path)
+        self.evict_disk()
+
+    def evict_disk(self):
+        """Remove the least recently written quote files above disk_entries"""
+        files = sorted(self.cache_dir.glob("cache_*.csv"), key=lambda f: f.stat().st_mtime)
+        excess = len(files) - self.settings["disk_entries"]
+        for csv_path in files[:max(0, excess)]:
+            try:
+                csv_path.unlink()
+                with self.lock:
+                    self.stats["evictions"] += 1
+            except OSError:
+                pass
+
+    def revalidate(self, symbol, currency, scheduler, task):
+        """
+        Refresh a stale quote in background, at most one refresh per symbol at a time.
+        task (a FetchTask) goes through scheduler, sharing the token bucket of its
+        host and the retry backoff with the other fetches.
+        """
+        key = (symbol, currency)
+        with self.lock:
+            if key in self.revalidating:
+                return
+            self.revalidating.add(key)
+
+        def refresh():
+            try:
+                asset_today, _ = scheduler.execute(task)
+                self.put(symbol, currency, asset_today)
+            except Exception as e:
+                Logger.warning(f"Background refresh of {symbol} quote failed: {e}")
+            finally:
+                with self.lock:
+                    self.revalidating.discard(key)
+        self.executor.submit(refresh)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, memory_entries=len(self.memory))
+
+_caches = dict()
+_caches_lock = threading.Lock()
+
+def get_quote_cache(cache_dir):
+    """Shared QuoteCache of cache_dir, the memory layer survives a new initialize"""
+    key = os.path.abspath(cache_dir)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = QuoteCache(cache_dir)
+        return _caches[key]
+
+def get_quote_stats():
+    with _caches_lock:
+        return {path: cache.get_stats() for path, cache in _caches.items()}
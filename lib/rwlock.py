@@ -0,0 +1,77 @@
+import threading
+from contextlib import contextmanager
+
+# Readers-writer lock of a session.
+# Any number of threads can read at once (dashboard, breakdowns, tables), a
+# write waits for the readers to leave and then holds the session alone, so a
+# reader never sees a dataset halfway through a write. Waiting writers go
+# first: new readers queue behind them and a stream of reads cannot starve a
+# write. A thread holding the read lock can take it again (views computed from
+# other views), and the writer can read what it is writing.
+
+class RWLock:
+    def __init__(self):
+        self.cond = threading.Condition(threading.Lock())
+        self.readers : int = 0 # threads holding the read lock
+        self.writer : int = None # ident of the thread holding the write lock
+        self.waiting_writers : int = 0
+        self.local = threading.local() # per thread depth of reads and writes
+
+    def acquire_read(self):
+        depth = getattr(self.local, "reads", 0)
+        if depth == 0:
+            # the writer reads under its own write lock
+            self.local.counted = self.writer != threading.get_ident()
+            if self.local.counted:
+                with self.cond:
+                    while self.writer is not None or self.waiting_writers:
+                        self.cond.wait()
+                    self.readers += 1
+        self.local.reads = depth + 1
+
+    def release_read(self):
+        self.local.reads -= 1
+        if self.local.reads == 0 and self.local.counted:
+            with self.cond:
+                self.readers -= 1
+                if self.readers == 0:
+                    self.cond.notify_all()
+
+    def acquire_write(self):
+        if self.writer == threading.get_ident():
+            self.local.writes += 1
+            return
+        if getattr(self.local, "reads", 0):
+            raise RuntimeError("Cannot take the write lock while holding the read lock")
+        with self.cond:
+            self.waiting_writers += 1
+            try:
+                while self.writer is not None or self.readers:
+                    self.cond.wait()
+            finally:
+                self.waiting_writers -= 1
+            self.writer = threading.get_ident()
+        self.local.writes = 1
+
+    def release_write(self):
+        self.local.writes -= 1
+        if self.local.writes == 0:
+            with self.cond:
+                self.writer = None
+                self.cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
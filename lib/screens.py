@@ -0,0 +1,97 @@
+from urllib.parse import parse_qsl
+
+import pandas as pd
+
+from .month_table import psql_lines, strip_value
+
+# Render-ready payloads of the shell client screens.
+# budgetbash, db_add and db_delete draw each screen from one response: amounts
+# come already formatted and table lines already split, each with the file
+# line number of its row, so a screen costs one HTTP call and one jq parse
+# instead of a curl and a jq per field.
+#
+# Several requests can also be sent at once to /batch, answered in order in a
+# single JSON document (e.g. delete a row and get the refreshed table).
+
+MAX_BATCH_REQUESTS = 32
+BATCH_METHODS = ["GET", "POST"]
+BATCH_EXCLUDED = ["/batch", "/shutdown"]
+
+def format_amount(value):
+    """Two decimals, without a trailing .00 (1234.5 -> 1234.50, 12.0 -> 12)"""
+    text = f"{float(value):.2f}"
+    return text[:-3] if text.endswith(".00") else text
+
+def dashboard_screen(nw_status, all_balances : dict):
+    """Lines of the dashboard: [label, value] pairs of the summary and of the account cards"""
+    summary = [
+        ["Net Worth", f"€{format_amount(nw_status['networth'])}"],
+        ["Liquidity", f"€{format_amount(nw_status['liquidity'])}"],
+        ["Investments", f"€{format_amount(nw_status['investments'])}"],
+        ["Net Worth Change", f"€{format_amount(nw_status['nwch'])}"],
+        ["Percentage Change", f"{format_amount(nw_status['ch%'])}%"],
+    ]
+    accounts = [[account, f"€{format_amount(balance)}"] for account, balance in sorted((all_balances or {}).items())]
+    return {"status": "success", "summary": summary, "accounts": accounts}
+
+def row_summary(row, data_type : str):
+    """One line description of a month file row, as the delete confirmation shows it"""
+    row = row.map(strip_value) # without the padding of the file
+    second = row['Coin'] if data_type == "cashflow" else row['Symbol']
+    return f"{row['Date']}, {row['Type']}, {second}, {row['Qty']}, {row['Category']}, {row['Subcategory']}"
+
+def month_screen(page : pd.DataFrame, data_type : str, total : int, count : int):
+    """
+    Table of a page of month rows for the view and delete screens.
+    Every table line comes with the file line number of its row (-1 for borders
+    and header) and the summary the delete confirmation shows.
+    """
+    lines = [{"line": -1, "text": text, "summary": ""} for text in "".join(psql_lines(page)).split("\n")]
+    for entry, (line, row) in zip(lines[3:-1], page.iterrows()):
+        entry["line"] = int(line)
+        entry["summary"] = row_summary(row, data_type)
+    return {"status": "success", "count": count, "total": total, "lines": lines}
+
+def add_form_screen(config : dict, data_type : str):
+    """Choices of the add form: categories, subcategories of each one and coins"""
+    section = config.get(data_type, {})
+    categories = list(section.get("Category", []))
+    subcategories = section.get("Subcategory", {})
+    return {
+        "status": "success",
+        "categories": [[category, ",".join(subcategories.get(category, []))] for category in categories],
+        "coins": list(section.get("Coin", [])) if data_type == "cashflow" else [],
+    }
+
+def parse_batch(payload):
+    """
+    Sub-requests of a /batch body, {"session": optional, "requests": [{"method", "path", "args"}]}.
+    Returns a list of (method, path, args), the query of a path moved into its args
+    (args win on a repeated key). Raises ValueError on a malformed body.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get("requests"), list):
+        raise ValueError("Expected a JSON object with a list of requests")
+    requests = payload["requests"]
+    if len(requests) > MAX_BATCH_REQUESTS:
+        raise ValueError(f"Too many requests in a batch: {len(requests)}, at most {MAX_BATCH_REQUESTS}")
+
+    session = payload.get("session")
+    parsed = list()
+    for i, sub in enumerate(requests):
+        if not isinstance(sub, dict) or not isinstance(sub.get("path"), str):
+            raise ValueError(f"Request {i} has no path")
+        method = str(sub.get("method", "GET")).upper()
+        if method not in BATCH_METHODS:
+            raise ValueError(f"Request {i}: method {method} not supported, expected one of {BATCH_METHODS}")
+        path, _, query = sub["path"].partition("?")
+        path = "/" + path.lstrip("/")
+        if path in BATCH_EXCLUDED:
+            raise ValueError(f"Request {i}: {path} cannot be batched")
+        args = sub.get("args", {})
+        if not isinstance(args, dict):
+            raise ValueError(f"Request {i}: args must be an object")
+        args = dict(parse_qsl(query, keep_blank_values=True), **{str(key): str(value) for key, value in args.items()})
+        if session is not None:
+            args.setdefault("session", str(session))
+        parsed.append((method, path, args))
+    return parsed
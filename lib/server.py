@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer
+
+from .logger import Logger
+
+# Serving mode of the backend.
+# Requests are handled by a fixed pool of threads, so reads run concurrently
+# while the number of threads (and of requests computing views at once) stays
+# bounded. One process only: the initialized sessions live in its memory, see
+# session_cache.py. The Flask development server (debug, reloader) is kept for
+# development with --dev.
+
+DEFAULT_SERVER_THREADS = 8
+DEFAULT_HOST = "127.0.0.1"
+
+class PooledWSGIServer(BaseWSGIServer):
+    multithread = True
+
+    def __init__(self, host : str, port : int, app, threads : int = DEFAULT_SERVER_THREADS):
+        super().__init__(host, port, app)
+        self.threads = threads
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="request")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+def serve(app, port : int, threads : int = DEFAULT_SERVER_THREADS, host : str = DEFAULT_HOST):
+    """Serve app on host:port with a pool of threads, until the process is stopped"""
+    server = PooledWSGIServer(host, port, app, threads)
+    Logger.info(f"Serving on http://{host}:{port} with {threads} threads")
+    server.serve_forever() # closes the server on exit
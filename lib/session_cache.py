@@ -0,0 +1,192 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .logger import Logger
+from .rwlock import RWLock
+
+# Initialized datasets kept in memory.
+# A session is everything FlaskWrapper computes for one (data_path, year):
+# the FinCashflow/FinInvestments pair, the net worth frames and the ledger.
+# Sessions are kept in LRU order, bounded by count and by an estimate of their
+# memory, so that switching back to a dataset initialized before is instant.
+# A session grows after it is put (writes, ledger years parsed on demand), it is
+# measured again then and the bounds enforced, see SessionCache.remeasure.
+# The active session is the one routes use when no session key is given, it is
+# never evicted.
+#
+# Derived views (net worth table, category breakdowns, balances...) are
+# memoized in their session under the dataset version they were computed at.
+# initialize starts a session at version 0 and every write bumps it, so a view
+# is computed once per version however many times the dashboard asks for it.
+#
+# Routes may run on several threads at once. Reads hold the read lock of their
+# session and writes its write lock, see rwlock.py; initialize builds a new
+# session aside and swaps it in, requests already running keep the one they
+# started with.
+
+DEFAULT_MAX_SESSIONS = 4
+DEFAULT_MAX_SESSION_MEMORY_MB = 512
+MAX_VIEWS = 256 # memoized views per session
+
+def session_key(data_path, year):
+    return f"{Path(data_path).resolve()}:{int(year)}"
+
+def parse_session_key(text : str, default_path=None):
+    """'2024' (year of the default data path), 'demo:2024' or a full session key"""
+    data_path, _, year = text.rpartition(":")
+    if not data_path:
+        if default_path is None:
+            raise ValueError(f"Session {text} has no data path and no dataset is active")
+        data_path = default_path
+    return session_key(data_path, int(year))
+
+def frame_bytes(obj):
+    if isinstance(obj, pd.DataFrame) or isinstance(obj, pd.Series):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sum(frame_bytes(value) for value in obj.values())
+    return 0
+
+class Session:
+    def __init__(self, year : int, data_path):
+        self.year = int(year)
+        self.data_path = Path(data_path)
+        self.finCashflow = None
+        self.finInvestments = None
+        self.nw_global : pd.DataFrame = None
+        self.nw_daily : pd.DataFrame = None
+        self.daily_prices : dict = None # closes of the holdings read for nw_daily
+        self.ledger = None
+        self.nbytes : int = 0
+        self.lock = RWLock()
+
+        self.version : int = 0
+        self.views = OrderedDict() # key -> (version, value), least recently used first
+        self.views_lock = threading.Lock()
+        self.view_stats = {"hits": 0, "misses": 0}
+
+    @property
+    def key(self):
+        return session_key(self.data_path, self.year)
+
+    def bump(self):
+        """The dataset changed, every memoized view is stale"""
+        with self.views_lock:
+            self.version += 1
+            self.views.clear()
+
+    def memo(self, key, compute):
+        """Value of the view key at the current version, compute() is only called on a miss"""
+        with self.views_lock:
+            version = self.version
+            entry = self.views.get(key)
+            if entry is not None and entry[0] == version:
+                self.views.move_to_end(key)
+                self.view_stats["hits"] += 1
+                return entry[1]
+            self.view_stats["misses"] += 1
+        value = compute()
+        with self.views_lock:
+            if self.version == version: # a write during compute makes the value stale already
+                self.views[key] = (version, value)
+                while len(self.views) > MAX_VIEWS:
+                    self.views.popitem(last=False)
+        return value
+
+    def measure(self):
+        """Estimate the memory held by the frames and arrays of the session"""
+        total = 0
+        for obj in [self.finCashflow, self.finInvestments]:
+            if obj is not None:
+                total += sum(frame_bytes(value) for value in vars(obj).values())
+        if self.ledger is not None:
+            with self.ledger.lock: # partitions are parsed on demand by the routes
+                total += sum(frame_bytes(value) for value in vars(self.ledger).values())
+        holdings = getattr(self.finInvestments, "holdings", None)
+        if holdings is not None:
+            total += frame_bytes(holdings.arrays)
+        total += sum(frame_bytes(df) for df in [self.nw_global, self.nw_daily, self.daily_prices])
+        self.nbytes = total
+        return total
+
+class SessionCache:
+    def __init__(self, max_sessions : int = DEFAULT_MAX_SESSIONS, max_memory_mb : float = DEFAULT_MAX_SESSION_MEMORY_MB):
+        self.max_sessions = max_sessions
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        self.sessions = OrderedDict() # key -> Session, least recently used first
+        self.active_key : str = None
+        self.lock = threading.RLock()
+
+    def get(self, key : str = None):
+        """Session by key, the active one when key is None"""
+        with self.lock:
+            key = key or self.active_key
+            session = self.sessions.get(key)
+            if session is not None:
+                self.sessions.move_to_end(key)
+            return session
+
+    def activate(self, key : str):
+        with self.lock:
+            if key not in self.sessions:
+                return None
+            self.active_key = key
+            return self.get(key)
+
+    def put(self, session : Session, activate : bool = True):
+        session.measure()
+        with self.lock:
+            self.sessions[session.key] = session
+            self.sessions.move_to_end(session.key)
+            if activate:
+                self.active_key = session.key
+            self.evict()
+
+    def remeasure(self, session : Session):
+        """Measure a session again after it grew or shrank, then evict above the bounds"""
+        session.measure()
+        with self.lock:
+            if self.sessions.get(session.key) is session:
+                self.evict()
+
+    def drop(self, key : str):
+        with self.lock:
+            self.sessions.pop(key, None)
+            if self.active_key == key:
+                self.active_key = None
+
+    def evict(self):
+        """Drop least recently used sessions above max_sessions or max_bytes, except the active one"""
+        with self.lock:
+            for key in list(self.sessions.keys()):
+                total = sum(session.nbytes for session in self.sessions.values())
+                if len(self.sessions) <= self.max_sessions and total <= self.max_bytes:
+                    break
+                if key == self.active_key:
+                    continue
+                session = self.sessions.pop(key)
+                Logger.info(f"Evicted session {key} ({session.nbytes / 1024 / 1024:.1f} MB)")
+
+    def of_path(self, data_path):
+        """Sessions of any year of data_path"""
+        path = Path(data_path).resolve()
+        with self.lock:
+            return [session for session in self.sessions.values() if session.data_path.resolve() == path]
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "active": self.active_key,
+                "sessions": [{"key": key, "year": session.year, "data_path": str(session.data_path), "bytes": session.nbytes,
+                              "version": session.version, "views": dict(session.view_stats, entries=len(session.views))}
+                             for key, session in self.sessions.items()],
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+            }
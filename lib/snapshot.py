@@ -0,0 +1,88 @@
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .logger import Logger
+
+# Binary snapshots of the month csv files.
+# Each {YEAR}-{MM}_{typedata}.csv gets an .npz sidecar under {path}/cache/snapshots
+# holding the already parsed and stripped columns. The sidecar also records
+# mtime and size of the source csv, so any edit of the csv invalidates it.
+# Those are read before the csv is parsed: a write landing during the parse must
+# not tag the old rows with the new file's mtime and size.
+
+SNAPSHOT_DIR = "snapshots"
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0}
+
+def _count(counter : str):
+    with _stats_lock:
+        _stats[counter] += 1
+
+def get_snapshot_stats():
+    """Return a copy of the snapshot hit/miss/write counters"""
+    with _stats_lock:
+        return dict(_stats)
+
+def reset_snapshot_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+def snapshot_path(path : Path, csv_path : str):
+    return Path(f"{path}/cache/{SNAPSHOT_DIR}/{Path(csv_path).stem}.npz")
+
+def read_snapshot(csv_path : str, snap_path : Path):
+    """Return the snapshotted DataFrame of csv_path, or None if missing or stale"""
+    stat = os.stat(csv_path) # a missing csv is an error for the caller, not a cache miss
+    try:
+        with np.load(snap_path, allow_pickle=False) as npz:
+            if int(npz["_mtime_ns"]) != stat.st_mtime_ns or int(npz["_size"]) != stat.st_size:
+                _count("misses")
+                return None
+            columns = [str(c) for c in npz["_columns"]]
+            data = dict()
+            for i, col in enumerate(columns):
+                values = npz[f"col_{i}"]
+                if values.dtype.kind == "U":
+                    values = values.astype(object)
+                data[col] = values
+        _count("hits")
+        return pd.DataFrame(data, columns=columns)
+    except (OSError, KeyError, ValueError):
+        _count("misses")
+        return None
+
+def write_snapshot(csv_path : str, snap_path : Path, df : pd.DataFrame, stat : os.stat_result):
+    """
+    Store df as npz sidecar of csv_path, stat is the one of the csv taken before df was parsed.
+    Skipped when the csv changed since. Failures are not fatal, the csv stays the source of truth
+    """
+    try:
+        now = os.stat(csv_path)
+        if (now.st_mtime_ns, now.st_size) != (stat.st_mtime_ns, stat.st_size):
+            Logger.debug(f"{csv_path} changed while parsed, no snapshot")
+            return None
+        arrays = {
+            "_mtime_ns": np.int64(stat.st_mtime_ns),
+            "_size": np.int64(stat.st_size),
+            "_columns": np.array(list(df.columns), dtype=str),
+        }
+        for i, col in enumerate(df.columns):
+            values = df[col].to_numpy()
+            if values.dtype == object:
+                values = values.astype(str)
+            arrays[f"col_{i}"] = values
+
+        snap_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = snap_path.with_name(f"{snap_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, snap_path) # atomic, readers never see half written snapshots
+        _count("writes")
+    except OSError as e:
+        Logger.debug(f"Could not write snapshot {snap_path}: {e}")
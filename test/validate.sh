@@ -4,4 +4,26 @@ printf "VALIDATION OF LIB FUNCTIONALITY\n"
 
 cd ..
 python3 -m lib.libtest.test_expansion
-python3 -m lib.libtest.test_load_data
\ No newline at end of file
+python3 -m lib.libtest.test_load_data
+python3 -m lib.libtest.test_snapshot
+python3 -m lib.libtest.test_ledger_writer
+python3 -m lib.libtest.test_incremental
+python3 -m lib.libtest.test_fetch_scheduler
+python3 -m lib.libtest.test_fin_fetch
+python3 -m lib.libtest.test_price_store
+python3 -m lib.libtest.test_quote_cache
+python3 -m lib.libtest.test_holdings_engine
+python3 -m lib.libtest.test_daily_nw
+python3 -m lib.libtest.test_balance_index
+python3 -m lib.libtest.test_ledger
+python3 -m lib.libtest.test_session_cache
+python3 -m lib.libtest.test_cashflow_cube
+python3 -m lib.libtest.test_query_engine
+python3 -m lib.libtest.test_month_table
+python3 -m lib.libtest.test_screens
+python3 -m lib.libtest.test_rwlock
+python3 -m lib.libtest.test_config_service
+python3 -m lib.libtest.test_ledger_validator
+python3 -m lib.libtest.test_bulk_import
+python3 -m lib.libtest.test_init_job
+python3 -m lib.libtest.test_interning
\ No newline at end of file